@@ -0,0 +1,278 @@
+"""
+Czech medical abbreviation matching
+
+AbbreviationExpander finds the abbreviations of data/medical_abbreviations.csv
+in a text in one linear pass over it with an Aho-Corasick automaton over the
+case-folded aliases. Matches follow the rules of the original regex
+expander (data/abbreviation_expander.py): case-insensitive, whole tokens
+only (no word character directly before or after), and at each position
+the longest alias wins, scanning left to right without overlaps.
+
+The automaton is built once per process (default_expander) and can be
+saved to and loaded from disk. annotate() is the prediction pipeline's
+stage: it leaves the text as written and returns the abbreviation spans
+plus a glossary of only the entries used, for the prompt.
+"""
+
+import csv
+import hashlib
+import pickle
+from collections import OrderedDict, defaultdict
+from dataclasses import dataclass, field
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple, Union
+
+DEFAULT_CSV_PATH = Path(__file__).parent.parent / "data" / "medical_abbreviations.csv"
+
+# Bumped when the pickled layout changes
+PICKLE_VERSION = 1
+
+# Annotations kept per process, by text hash
+ANNOTATION_CACHE_SIZE = 2048
+
+# Shorter aliases (C, P, ...) mostly match units and lab flags, e.g. "°C";
+# annotate() leaves them out
+MIN_ANNOTATED_LENGTH = 2
+
+
+class AbbreviationMatch(NamedTuple):
+    """One abbreviation found in a text"""
+    start: int
+    end: int
+    abbreviation: str  # spelling from the CSV
+    expansion: str  # all descriptions, joined with " / "
+
+
+def _fold(text: str) -> str:
+    """Lower-case per character, keeping positions aligned with `text`"""
+    folded = text.lower()
+    if len(folded) == len(text):
+        return folded
+    # Rare characters (e.g. "İ") lower-case to two; keep those as they are
+    return ''.join(c if len(c.lower()) != 1 else c.lower() for c in text)
+
+
+def _is_word(char: str) -> bool:
+    """Same as the regex \\w"""
+    return char.isalnum() or char == '_'
+
+
+class AbbreviationExpander:
+    """Aho-Corasick matcher for a fixed abbreviation list"""
+
+    def __init__(self, entries: List[Tuple[str, str]], source_hash: Optional[str] = None):
+        """
+        entries: (alias, description) pairs. An alias listed more than once
+        expands to all its descriptions; the first spelling is canonical.
+        """
+        descriptions: Dict[str, List[str]] = defaultdict(list)
+        self.canonical: Dict[str, str] = {}
+        for alias, description in entries:
+            key = _fold(alias)
+            descriptions[key].append(description)
+            self.canonical.setdefault(key, alias)
+        self.expansions = {key: ' / '.join(values) for key, values in descriptions.items()}
+        self.source_hash = source_hash
+        self._build()
+
+    def _build(self):
+        # goto[state][char] -> state; out[state] = lengths of the aliases
+        # ending in this state (own and via failure links), longest first
+        goto: List[Dict[str, int]] = [{}]
+        out: List[List[int]] = [[]]
+        for key in self.expansions:
+            state = 0
+            for char in key:
+                if char not in goto[state]:
+                    goto.append({})
+                    out.append([])
+                    goto[state][char] = len(goto) - 1
+                state = goto[state][char]
+            out[state].append(len(key))
+
+        # Breadth-first, so a state's failure target is finished before it
+        fail = [0] * len(goto)
+        queue = list(goto[0].values())
+        for state in queue:
+            for char, child in goto[state].items():
+                queue.append(child)
+                target = fail[state]
+                while target and char not in goto[target]:
+                    target = fail[target]
+                fail[child] = goto[target].get(char, 0) if state else 0
+                out[child] = out[child] + out[fail[child]]
+
+        self._goto = goto
+        self._fail = fail
+        self._out = [tuple(sorted(lengths, reverse=True)) for lengths in out]
+
+    @classmethod
+    def from_csv(cls, csv_path: Union[str, Path] = DEFAULT_CSV_PATH) -> "AbbreviationExpander":
+        """Build from a CSV with Abbreviation and Description columns"""
+        csv_path = Path(csv_path)
+        content = csv_path.read_bytes()
+        entries = []
+        reader = csv.DictReader(content.decode('utf-8-sig').splitlines())
+        for row in reader:
+            if not row['Abbreviation'] or not row['Description']:
+                continue
+            # "SONO, USG": several aliases for one description
+            for alias in row['Abbreviation'].split(','):
+                if alias.strip():
+                    entries.append((alias.strip(), row['Description'].strip()))
+        return cls(entries, source_hash=hashlib.sha256(content).hexdigest())
+
+    def save(self, path: Union[str, Path]):
+        with open(path, 'wb') as f:
+            pickle.dump((PICKLE_VERSION, self.__dict__), f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> "AbbreviationExpander":
+        """Load a saved expander; ValueError if it was saved by another layout version"""
+        with open(path, 'rb') as f:
+            version, state = pickle.load(f)
+        if version != PICKLE_VERSION:
+            raise ValueError(f"{path} has layout version {version}, expected {PICKLE_VERSION}")
+        expander = cls.__new__(cls)
+        expander.__dict__.update(state)
+        return expander
+
+    @classmethod
+    def cached(
+        cls,
+        csv_path: Union[str, Path] = DEFAULT_CSV_PATH,
+        cache_path: Optional[Union[str, Path]] = None,
+    ) -> "AbbreviationExpander":
+        """Load from `cache_path` if it was built from the current CSV, else build and save it"""
+        csv_path = Path(csv_path)
+        cache_path = Path(cache_path) if cache_path else csv_path.with_suffix('.automaton.pkl')
+        if cache_path.exists():
+            try:
+                expander = cls.load(cache_path)
+                if expander.source_hash == hashlib.sha256(csv_path.read_bytes()).hexdigest():
+                    return expander
+            except (ValueError, pickle.UnpicklingError, EOFError):
+                pass
+        expander = cls.from_csv(csv_path)
+        expander.save(cache_path)
+        return expander
+
+    def __len__(self) -> int:
+        return len(self.expansions)
+
+    def find(self, text: str) -> List[AbbreviationMatch]:
+        """All abbreviations in `text`, left to right, longest at each position, no overlaps"""
+        goto, fail, out = self._goto, self._fail, self._out
+        folded = _fold(text)
+        size = len(text)
+
+        # Every whole-token occurrence, found in one pass over the text
+        candidates = []
+        state = 0
+        for position, char in enumerate(folded):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if not out[state]:
+                continue
+            end = position + 1
+            if end < size and _is_word(text[end]):
+                continue
+            for length in out[state]:
+                start = end - length
+                if not (start and _is_word(text[start - 1])):
+                    candidates.append((start, -end))
+
+        # Leftmost first, longest at each start, skipping overlaps
+        matches = []
+        taken_until = 0
+        for start, negative_end in sorted(candidates):
+            if start >= taken_until:
+                key = folded[start:-negative_end]
+                matches.append(AbbreviationMatch(start, -negative_end, self.canonical[key], self.expansions[key]))
+                taken_until = -negative_end
+        return matches
+
+    def expand(self, text: str) -> Tuple[str, Dict[str, str]]:
+        """
+        Replace every abbreviation with its expansion
+
+        Returns the expanded text and the abbreviations used (canonical
+        spelling -> expansion), as expand_medical_abbreviations does.
+        """
+        parts = []
+        used = {}
+        previous = 0
+        for match in self.find(text):
+            parts.append(text[previous:match.start])
+            parts.append(match.expansion)
+            used[match.abbreviation] = match.expansion
+            previous = match.end
+        parts.append(text[previous:])
+        return ''.join(parts), used
+
+
+@lru_cache(maxsize=1)
+def default_expander() -> AbbreviationExpander:
+    """Expander for data/medical_abbreviations.csv, built once per process"""
+    return AbbreviationExpander.from_csv(DEFAULT_CSV_PATH)
+
+
+@dataclass
+class AbbreviationAnnotation:
+    """Abbreviations found in one text, which itself is left unchanged"""
+    spans: List[AbbreviationMatch] = field(default_factory=list)
+    glossary: Dict[str, str] = field(default_factory=dict)  # used abbreviations only
+
+
+def annotate(text: str) -> AbbreviationAnnotation:
+    """Abbreviation spans and glossary of `text`"""
+    if not text:
+        return AbbreviationAnnotation()
+    spans = [match for match in default_expander().find(text) if match.end - match.start >= MIN_ANNOTATED_LENGTH]
+    return AbbreviationAnnotation(
+        spans=spans,
+        glossary={match.abbreviation: match.expansion for match in spans},
+    )
+
+
+def annotate_many(texts: List[str]) -> List[AbbreviationAnnotation]:
+    """annotate() for a batch, one call for run_cpu"""
+    return [annotate(text) for text in texts]
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+_annotation_cache: "OrderedDict[str, AbbreviationAnnotation]" = OrderedDict()
+
+
+def cached_annotation(key: str) -> Optional[AbbreviationAnnotation]:
+    """Annotation cached under text hash `key`, if any"""
+    annotation = _annotation_cache.get(key)
+    if annotation is not None:
+        _annotation_cache.move_to_end(key)
+    return annotation
+
+
+def cache_annotation(key: str, annotation: AbbreviationAnnotation):
+    _annotation_cache[key] = annotation
+    _annotation_cache.move_to_end(key)
+    while len(_annotation_cache) > ANNOTATION_CACHE_SIZE:
+        _annotation_cache.popitem(last=False)
+
+
+def merge_glossaries(annotations: List[AbbreviationAnnotation]) -> Dict[str, str]:
+    """Used abbreviations of several texts, in order of first use"""
+    glossary = {}
+    for annotation in annotations:
+        for abbreviation, expansion in annotation.glossary.items():
+            glossary.setdefault(abbreviation, expansion)
+    return glossary
+
+
+def format_glossary(glossary: Dict[str, str]) -> str:
+    """One prompt line per entry, e.g. "- FiS: fibrilace síní" """
+    return "\n".join(f"- {abbreviation}: {expansion}" for abbreviation, expansion in glossary.items())
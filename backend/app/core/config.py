@@ -1,5 +1,7 @@
 """Application configuration"""
 
+from typing import Optional
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -22,11 +24,55 @@ class Settings(BaseSettings):
     SUPABASE_KEY: str
     SUPABASE_SERVICE_KEY: str
     
+    # Read replica for read-only endpoints; unset means reads use DATABASE_URL.
+    # Records written by this process within READ_YOUR_WRITES_SECONDS are
+    # still read from the primary so replica lag never hides them.
+    READ_DATABASE_URL: Optional[str] = None
+    READ_YOUR_WRITES_SECONDS: float = 10.0
+    
+    # Serve the hot reads from an asyncpg pool; writes stay on Prisma
+    FAST_READS: bool = False
+    FAST_READS_POOL_SIZE: int = 10
+    
+    # Prediction listings cover this many days unless all_time is requested,
+    # so they only touch the newest monthly partitions
+    RECENT_PREDICTIONS_DAYS: int = 180
+    
     # LLM
     OPENROUTER_API_KEY: str
     DEFAULT_LLM_MODEL: str = "google/gemini-flash-2.0"
     FALLBACK_LLM_MODEL: str = "openai/gpt-4o-mini"
     
+    # XML uploads whose rule-based lab section split scores below this
+    # are separated by the LLM instead (above 1.0 = always use the LLM)
+    LAB_SEPARATOR_MIN_CONFIDENCE: float = 0.8
+    
+    # Multi-patient uploads: patient blocks ingested at once, and
+    # background predictions running at once per upload
+    INGEST_CONCURRENCY: int = 8
+    BATCH_PREDICTION_CONCURRENCY: int = 4
+    
+    # CPU-bound parsing runs on a worker pool off the event loop:
+    # "process", "thread" or "none" (inline). Calls beyond
+    # CPU_POOL_MAX_PENDING are rejected with 503, slower than the timeout 504.
+    CPU_POOL: str = "process"
+    CPU_POOL_WORKERS: int = 2
+    CPU_POOL_MAX_PENDING: int = 32
+    CPU_POOL_TIMEOUT_SECONDS: float = 30.0
+    CPU_POOL_MAX_TASKS_PER_CHILD: int = 500
+    
+    # XML uploads larger than this are rejected with 413
+    MAX_XML_BYTES: int = 20 * 1024 * 1024
+    
+    # Event loop lag sampling (0 disables); lag above the warning
+    # threshold is logged with the routes in flight
+    LOOP_LAG_INTERVAL_MS: int = 100
+    LOOP_LAG_WARN_MS: int = 250
+    
+    # Add a glossary of the abbreviations found in the clinical text and
+    # microbiology to the prompts (only the entries used)
+    ABBREVIATION_GLOSSARY: bool = True
+    
     # Embeddings (for future RAG if needed)
     EMBEDDING_MODEL: str = "google/gemini-embedding-001"
     EMBEDDING_DIMENSIONS: int = 3072
@@ -0,0 +1,93 @@
+"""Worker pool for CPU-bound parsing off the event loop
+
+XML parsing, lab section splitting and lab summaries are pure Python and
+hold the event loop for as long as they run, stalling every other request
+on the worker. run_cpu hands such a call to a process pool (or a thread
+pool, which only helps for code that releases the GIL) and awaits the
+result. The callable and its arguments must be picklable for the process
+pool, i.e. module-level functions with plain data.
+
+CPU_POOL selects the pool: "process", "thread" or "none". Until
+start_cpu_pool is called (scripts, tests) or with "none", calls run
+inline, as before.
+"""
+
+import asyncio
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Optional
+
+from loguru import logger
+
+from app.core.config import settings
+
+
+class CPUPoolBusy(RuntimeError):
+    """More than CPU_POOL_MAX_PENDING calls are queued"""
+
+
+# Set by start_cpu_pool; None means calls run inline
+executor: Optional[Executor] = None
+_pending = 0
+
+
+def start_cpu_pool():
+    """Create the configured pool"""
+    global executor
+    if executor is not None or settings.CPU_POOL == "none":
+        return
+
+    if settings.CPU_POOL == "process":
+        # spawn: forking a process that runs an event loop and DB clients
+        # copies their sockets and locks into the workers
+        executor = ProcessPoolExecutor(
+            max_workers=settings.CPU_POOL_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+            max_tasks_per_child=settings.CPU_POOL_MAX_TASKS_PER_CHILD,
+        )
+    elif settings.CPU_POOL == "thread":
+        executor = ThreadPoolExecutor(
+            max_workers=settings.CPU_POOL_WORKERS,
+            thread_name_prefix="cpu",
+        )
+    else:
+        raise ValueError(f"Unknown CPU_POOL {settings.CPU_POOL!r}, expected process, thread or none")
+
+    logger.info(f"CPU {settings.CPU_POOL} pool started ({settings.CPU_POOL_WORKERS} workers)")
+
+
+def stop_cpu_pool():
+    """Shut the pool down, dropping queued calls"""
+    global executor
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
+        executor = None
+        logger.info("CPU pool stopped")
+
+
+async def run_cpu(fn: Callable, *args, timeout: Optional[float] = None, **kwargs) -> Any:
+    """
+    Run fn(*args, **kwargs) on the pool and await its result
+
+    Raises CPUPoolBusy when CPU_POOL_MAX_PENDING calls are already queued
+    or running, and TimeoutError after `timeout` seconds (default
+    CPU_POOL_TIMEOUT_SECONDS). A timed-out call is abandoned, not killed:
+    its worker stays busy until the call returns.
+    """
+    global _pending
+    if executor is None:
+        return fn(*args, **kwargs)
+
+    if _pending >= settings.CPU_POOL_MAX_PENDING:
+        raise CPUPoolBusy(f"{_pending} CPU-bound calls pending")
+
+    _pending += 1
+    try:
+        future = asyncio.get_running_loop().run_in_executor(executor, partial(fn, *args, **kwargs))
+        return await asyncio.wait_for(future, timeout or settings.CPU_POOL_TIMEOUT_SECONDS)
+    except TimeoutError:
+        logger.warning(f"{getattr(fn, '__name__', fn)} exceeded {timeout or settings.CPU_POOL_TIMEOUT_SECONDS}s")
+        raise
+    finally:
+        _pending -= 1
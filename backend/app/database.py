@@ -1,12 +1,25 @@
 """Database operations using Prisma"""
 
-from typing import List, Dict, Optional
-from prisma import Prisma
+import base64
+import hashlib
+import json
+import re
+import time
+from datetime import datetime
+from typing import List, Dict, Optional, Tuple
+from prisma import Base64, Json, Prisma
+from prisma.models import Patient
 from loguru import logger
 
+from app import fast_db
+from app.core.config import settings
+from app.utils import compress_text, decompress_text
 
-# Global Prisma client
+
+# Global Prisma clients: db is the primary and takes all writes, read_db
+# serves read-only queries. Without READ_DATABASE_URL they are the same client.
 db = Prisma()
+read_db = Prisma(datasource={"url": settings.READ_DATABASE_URL}) if settings.READ_DATABASE_URL else db
 
 
 async def connect_db():
@@ -14,46 +27,279 @@ async def connect_db():
     if not db.is_connected():
         await db.connect()
         logger.info("Database connected")
+    if not read_db.is_connected():
+        await read_db.connect()
+        logger.info("Read replica connected")
+    await fast_db.connect_fast_db()
 
 
 async def disconnect_db():
     """Disconnect from database"""
+    await fast_db.disconnect_fast_db()
+    if read_db is not db and read_db.is_connected():
+        await read_db.disconnect()
+        logger.info("Read replica disconnected")
     if db.is_connected():
         await db.disconnect()
         logger.info("Database disconnected")
 
 
+# ===== READ ROUTING =====
+
+# Ids of records this process wrote recently -> monotonic write time
+_recent_writes: Dict[str, float] = {}
+_RECENT_WRITES_PRUNE_AT = 10_000
+
+
+def mark_written(*record_ids: Optional[str]):
+    """
+    Remember that records were just written, so reads of them skip the replica
+    
+    Only covers this process; lookups by id additionally fall back to the
+    primary when the replica doesn't have the record yet.
+    """
+    if read_db is db:
+        return
+    now = time.monotonic()
+    if len(_recent_writes) > _RECENT_WRITES_PRUNE_AT:
+        expired = [
+            record_id for record_id, written_at in _recent_writes.items()
+            if now - written_at >= settings.READ_YOUR_WRITES_SECONDS
+        ]
+        for record_id in expired:
+            del _recent_writes[record_id]
+    for record_id in record_ids:
+        if record_id:
+            _recent_writes[record_id] = now
+
+
+def _recently_written(record_id: Optional[str]) -> bool:
+    written_at = _recent_writes.get(record_id)
+    return written_at is not None and time.monotonic() - written_at < settings.READ_YOUR_WRITES_SECONDS
+
+
+def _reader(record_id: Optional[str] = None) -> Prisma:
+    """Client for a read: the replica, unless record_id was just written here"""
+    if read_db is db or _recently_written(record_id):
+        return db
+    return read_db
+
+
+async def _read(sql: str, *params, primary: bool = False, fast: bool = False) -> List[Dict]:
+    """
+    Run a read-only raw query
+    
+    Goes to the read replica, or to the primary if `primary` is set.
+    `fast` marks the hot paths (case listing, prediction detail, code
+    lookup and usage): with FAST_READS on they run on the asyncpg pool
+    instead of Prisma. Values differ only in representation: asyncpg
+    returns datetimes where Prisma returns ISO strings.
+    """
+    if primary:
+        return await db.query_raw(sql, *params)
+    if fast and fast_db.is_enabled():
+        return await fast_db.fetch(sql, *params)
+    return await read_db.query_raw(sql, *params)
+
+
+# ===== PAGINATION =====
+
+# Unfiltered listings report the planner's row estimate instead of count(*)
+# once a table grows past this size
+EXACT_COUNT_THRESHOLD = 10_000
+
+
+def encode_cursor(created_at, record_id: str) -> str:
+    """Encode the (createdAt, id) of the last row on a page as an opaque cursor"""
+    if isinstance(created_at, datetime):
+        created_at = created_at.isoformat()
+    payload = f"{created_at}|{record_id}"
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    """Decode a cursor into (ISO createdAt, id), raises ValueError if malformed"""
+    try:
+        payload = base64.urlsafe_b64decode(cursor.encode()).decode()
+        created_at, record_id = payload.split("|", 1)
+        datetime.fromisoformat(created_at)
+        return created_at, record_id
+    except Exception:
+        raise ValueError(f"Invalid cursor: {cursor}")
+
+
+def _bind(params: List, value) -> str:
+    """Append a query parameter and return its $n placeholder"""
+    params.append(value)
+    return f"${len(params)}"
+
+
+def _contains_pattern(search: str) -> str:
+    """ILIKE pattern matching `search` anywhere, with wildcards escaped"""
+    escaped = search.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def _where_sql(conditions: List[str]) -> str:
+    return f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+
+def _page_sql(
+    alias: str,
+    conditions: List[str],
+    params: List,
+    page: int,
+    limit: int,
+    cursor: Optional[str],
+) -> str:
+    """
+    WHERE/ORDER/LIMIT tail for a newest-first listing
+    
+    With a cursor, rows strictly after it in (createdAt, id) order are
+    selected via the composite index; otherwise page-number OFFSET is used.
+    One extra row is fetched to detect whether a next page exists.
+    """
+    conditions = list(conditions)
+    offset = 0
+    if cursor:
+        created_at, record_id = decode_cursor(cursor)
+        conditions.append(
+            f'({alias}."createdAt", {alias}.id) < '
+            f'({_bind(params, created_at)}::text::timestamp(3), {_bind(params, record_id)})'
+        )
+    else:
+        offset = (page - 1) * limit
+    
+    return (
+        f'{_where_sql(conditions)} '
+        f'ORDER BY {alias}."createdAt" DESC, {alias}.id DESC '
+        f'LIMIT {_bind(params, limit + 1)} OFFSET {_bind(params, offset)}'
+    )
+
+
+async def _count(
+    table: str,
+    from_sql: str,
+    conditions: List[str],
+    params: List,
+    fast: bool = False,
+) -> int:
+    """
+    Count rows matching a filter
+    
+    Filtered counts are exact. Unfiltered counts on large tables use
+    pg_class.reltuples (summed over partitions for partitioned tables),
+    which costs nothing but is only approximate. `fast` as for _read.
+    """
+    if not conditions:
+        rows = await _read(
+            """
+            SELECT coalesce(sum(greatest(c.reltuples, 0)), 0)::bigint AS estimate
+            FROM pg_class c
+            WHERE c.oid = $1::text::regclass
+               OR c.oid IN (SELECT inhrelid FROM pg_inherits WHERE inhparent = $1::text::regclass)
+            """,
+            table,
+            fast=fast,
+        )
+        estimate = rows[0]["estimate"] if rows else -1
+        if estimate >= EXACT_COUNT_THRESHOLD:
+            return estimate
+    
+    rows = await _read(
+        f"SELECT count(*) AS total {from_sql} {_where_sql(conditions)}",
+        *params,
+        fast=fast,
+    )
+    return rows[0]["total"]
+
+
+def _since_conditions(alias: str, params: List, since: Optional[datetime]) -> List[str]:
+    """
+    createdAt lower bound, empty when `since` is None
+    
+    On the monthly-partitioned predictions table this lets the planner
+    skip partitions older than `since`.
+    """
+    if since is None:
+        return []
+    return [f'{alias}."createdAt" >= {_bind(params, since.isoformat())}::text::timestamp(3)']
+
+
+def _paginate(rows: List[Dict], limit: int) -> Tuple[List[Dict], Optional[str]]:
+    """Trim a limit+1 fetch to one page and build the cursor for the next page"""
+    if len(rows) <= limit:
+        return rows, None
+    
+    rows = rows[:limit]
+    return rows, encode_cursor(rows[-1]["createdAt"], rows[-1]["id"])
+
+
+def _pages(total: Optional[int], limit: int) -> Optional[int]:
+    """Number of pages for a total, or None when the total was skipped"""
+    if total is None:
+        return None
+    return (total + limit - 1) // limit
+
+
 # ===== DIAGNOSIS CODES =====
 
+# How often cached catalog data re-checks catalog_versions
+CATALOG_VERSION_CHECK_SECONDS = 30
+
+# Cached 3-char codes, valid for one catalog version
+_three_char_cache: Dict = {"version": None, "checked_at": 0.0, "codes": []}
+
+
+async def get_catalog_version() -> int:
+    """Latest catalog version (0 before the first versioned load)"""
+    rows = await _read("SELECT coalesce(max(version), 0) AS version FROM catalog_versions")
+    return rows[0]["version"]
+
+
 async def get_all_three_char_codes() -> List[Dict]:
-    """Get all 3-character top-level ICD-10 codes (A00, I21, etc.)"""
-    codes = await db.diagnosiscode.find_many()
+    """
+    Get all active 3-character top-level ICD-10 codes (A00, I21, etc.)
     
-    three_char = []
-    for code in codes:
-        if len(code.code) == 3 and '.' not in code.code:
-            three_char.append({
-                "code": code.code,
-                "name": code.name,
-                "chapter": code.chapter,
-                "category": code.category or "General"
-            })
+    Served from memory; the catalog version is re-checked at most every
+    CATALOG_VERSION_CHECK_SECONDS and the list reloaded when it changed.
+    """
+    cache = _three_char_cache
+    now = time.monotonic()
+    if cache["version"] is not None and now - cache["checked_at"] < CATALOG_VERSION_CHECK_SECONDS:
+        return cache["codes"]
     
-    logger.info(f"Loaded {len(three_char)} 3-char codes")
-    return three_char
+    version = await get_catalog_version()
+    cache["checked_at"] = now
+    if version == cache["version"]:
+        return cache["codes"]
+    
+    rows = await _read(
+        """
+        SELECT code, name, chapter, coalesce(category, 'General') AS category
+        FROM diagnosis_codes
+        WHERE length(code) = 3 AND position('.' IN code) = 0 AND "retiredAt" IS NULL
+        ORDER BY code
+        """
+    )
+    cache["codes"] = rows
+    cache["version"] = version
+    
+    logger.info(f"Loaded {len(rows)} 3-char codes (catalog version {version})")
+    return rows
 
 
 async def get_codes_by_prefix(prefixes: List[str]) -> List[Dict]:
     """
-    Get all codes that start with given prefixes
+    Get all active codes that start with given prefixes
     Args:
         prefixes: List of 3-char codes like ["I46", "G93"]
     """
     all_codes = []
     
     for prefix in prefixes:
-        codes = await db.diagnosiscode.find_many(
-            where={"code": {"startswith": prefix}}
+        codes = await read_db.diagnosiscode.find_many(
+            where={"code": {"startswith": prefix}, "retiredAt": None}
         )
         for code in codes:
             all_codes.append({
@@ -68,17 +314,20 @@ async def get_codes_by_prefix(prefixes: List[str]) -> List[Dict]:
 
 
 async def get_code_by_code(code: str):
-    """Get a specific diagnosis code by its code"""
-    code_obj = await db.diagnosiscode.find_first(
-        where={"code": code}
+    """Get a specific diagnosis code by its code, as a dict"""
+    rows = await _read(
+        "SELECT code, name, chapter, category FROM diagnosis_codes WHERE code = $1 LIMIT 1",
+        code,
+        fast=True,
     )
-    return code_obj
+    return rows[0] if rows else None
 
 
 async def search_codes(query: str, limit: int = 50) -> List[Dict]:
     """Search diagnosis codes by query string"""
-    codes = await db.diagnosiscode.find_many(
+    codes = await read_db.diagnosiscode.find_many(
         where={
+            "retiredAt": None,
             "OR": [
                 {"code": {"contains": query}},
                 {"name": {"contains": query}},
@@ -112,11 +361,19 @@ async def validate_codes(codes: List[str]) -> List[Dict]:
     results = []
     
     for code in codes:
-        db_code = await db.diagnosiscode.find_unique(
+        db_code = await read_db.diagnosiscode.find_unique(
             where={"code": code}
         )
         
-        if db_code:
+        if db_code and db_code.retiredAt:
+            results.append({
+                "code": code,
+                "valid": False,
+                "name": db_code.name,
+                "error": "Code was retired from the catalog"
+            })
+            logger.warning(f"Retired code: {code}")
+        elif db_code:
             results.append({
                 "code": code,
                 "valid": True,
@@ -145,7 +402,7 @@ async def enrich_code(code: str) -> Dict:
     Returns:
         Dict with code and name, or None if not found
     """
-    db_code = await db.diagnosiscode.find_unique(
+    db_code = await read_db.diagnosiscode.find_unique(
         where={"code": code}
     )
     
@@ -156,43 +413,286 @@ async def enrich_code(code: str) -> Dict:
         return None
 
 
-async def get_predictions_by_code(code: str, page: int = 1, limit: int = 20):
-    """Get all predictions that use a specific diagnosis code (main or secondary)"""
-    skip = (page - 1) * limit
+# Columns shown in prediction listings - no reasoning texts, no case bodies
+PREDICTION_LIST_COLUMNS = """
+    p.id, p."caseId", p."mainCode", p."mainName", p."mainConfidence",
+    p."secondaryCodes", p.validated, p."feedbackType", p.corrected,
+    p.status, p."createdAt",
+    c."pacId",
+    pt.id AS "patientId", pt."firstName", pt."lastName",
+    pt."dateOfBirth", pt.sex
+"""
+
+PREDICTION_LIST_FROM = """
+    FROM predictions p
+    JOIN patient_cases c ON c.id = p."caseId"
+    JOIN patients pt ON pt.id = c."patientId"
+"""
+
+
+async def get_predictions_by_code(
+    code: str,
+    page: int = 1,
+    limit: int = 20,
+    cursor: Optional[str] = None,
+    with_total: bool = True,
+    since: Optional[datetime] = None,
+):
+    """
+    Get all predictions that use a specific diagnosis code (main or secondary)
     
-    # Search in both mainCode and secondaryCodes JSON
-    # For mainCode it's direct match
-    # For secondaryCodes we need to search in the JSON array
-    predictions = await db.prediction.find_many(
-        where={
-            "OR": [
-                {"mainCode": code},
-                {"secondaryCodes": {"string_contains": f'"{code}"'}},  # Search in JSON
-            ]
-        },
-        skip=skip,
-        take=limit,
-        order={"createdAt": "desc"},
-        include={"case": True}
-    )
+    Rows are slim dicts with PREDICTION_LIST_COLUMNS. Pass `cursor` (the
+    previous page's next_cursor) for keyset pagination; `page` is ignored then.
+    `since` limits the listing to predictions created from then on.
+    """
+    # Resolved through the prediction_codes (code, role, predictionId) index
+    params: List = []
+    conditions = [
+        f'p.id IN (SELECT pc."predictionId" FROM prediction_codes pc WHERE pc.code = {_bind(params, code)})'
+    ]
+    conditions += _since_conditions("p", params, since)
+    filter_params = list(params)
     
-    total = await db.prediction.count(
-        where={
-            "OR": [
-                {"mainCode": code},
-                {"secondaryCodes": {"string_contains": f'"{code}"'}},
-            ]
-        }
+    rows = await _read(
+        f"SELECT {PREDICTION_LIST_COLUMNS} {PREDICTION_LIST_FROM} "
+        + _page_sql("p", conditions, params, page, limit, cursor),
+        *params,
     )
+    predictions, next_cursor = _paginate(rows, limit)
+    
+    total = await _count("predictions", "FROM predictions p", conditions, filter_params) if with_total else None
     
     return {
         "predictions": predictions,
         "total": total,
         "page": page,
-        "pages": (total + limit - 1) // limit
+        "pages": _pages(total, limit),
+        "next_cursor": next_cursor,
     }
 
 
+# ===== PREDICTION CODES =====
+
+def _prediction_code_rows(
+    prediction_id: str,
+    main_code: Optional[str],
+    main_confidence: Optional[float],
+    secondary_codes: Optional[List[Dict]],
+) -> List[Dict]:
+    """One row per distinct code and role; empty placeholder codes are skipped"""
+    def as_confidence(value) -> Optional[float]:
+        return float(value) if isinstance(value, (int, float)) else None
+    
+    rows = []
+    if main_code:
+        rows.append({
+            "predictionId": prediction_id,
+            "code": main_code,
+            "role": "main",
+            "confidence": as_confidence(main_confidence),
+        })
+    
+    seen = set()
+    for diagnosis in secondary_codes or []:
+        code = diagnosis.get("code")
+        if not code or code in seen:
+            continue
+        seen.add(code)
+        rows.append({
+            "predictionId": prediction_id,
+            "code": code,
+            "role": "secondary",
+            "confidence": as_confidence(diagnosis.get("confidence")),
+        })
+    
+    return rows
+
+
+async def sync_prediction_codes(
+    prediction_id: str,
+    main_code: Optional[str],
+    main_confidence: Optional[float],
+    secondary_codes: Optional[List[Dict]],
+    client: Optional[Prisma] = None,
+):
+    """
+    Replace the prediction_codes rows of a prediction with its current codes
+    
+    Call inside the transaction that writes mainCode/secondaryCodes
+    (pass the transaction as `client`) so both stay consistent.
+    """
+    client = client or db
+    mark_written(prediction_id)
+    await client.predictioncode.delete_many(where={"predictionId": prediction_id})
+    
+    rows = _prediction_code_rows(prediction_id, main_code, main_confidence, secondary_codes)
+    if rows:
+        await client.predictioncode.create_many(data=rows, skip_duplicates=True)
+
+
+async def get_code_usage(code: str) -> Dict[str, int]:
+    """
+    Count predictions using a code: as main and as secondary diagnosis,
+    and in total ("predictions"), where a prediction with the code in both
+    roles counts once
+    """
+    rows = await _read(
+        """
+        SELECT
+            count(*) FILTER (WHERE role = 'main') AS main,
+            count(*) FILTER (WHERE role = 'secondary') AS secondary,
+            count(DISTINCT "predictionId") AS predictions
+        FROM prediction_codes
+        WHERE code = $1
+        """,
+        code,
+        fast=True,
+    )
+    
+    row = rows[0] if rows else {}
+    return {key: int(row.get(key) or 0) for key in ("main", "secondary", "predictions")}
+
+
+# ===== CODE STATS =====
+
+# code_stats counters, in column order
+CODE_STAT_FIELDS = ("predicted", "approved", "correctedAway", "addedByCoder")
+
+# Sort keys accepted by get_code_stats
+CODE_STAT_SORTS = {
+    "predicted": "predicted",
+    "approved": "approved",
+    "corrected_away": '"correctedAway"',
+    "added_by_coder": '"addedByCoder"',
+}
+
+
+def _code_keys(main_code: Optional[str], secondary_codes: Optional[List[Dict]]) -> set:
+    """(code, role) pairs of a prediction's diagnoses"""
+    keys = {(main_code, "main")} if main_code else set()
+    keys.update(
+        (diagnosis["code"], "secondary")
+        for diagnosis in secondary_codes or []
+        if diagnosis.get("code")
+    )
+    return keys
+
+
+def _stat_delta(key: Tuple[str, str], **counts) -> Dict:
+    code, role = key
+    return {"code": code, "role": role, **{field: counts.get(field, 0) for field in CODE_STAT_FIELDS}}
+
+
+def prediction_stat_deltas(main_code: Optional[str], secondary_codes: Optional[List[Dict]]) -> List[Dict]:
+    """code_stats increments for a completed prediction"""
+    return [_stat_delta(key, predicted=1) for key in _code_keys(main_code, secondary_codes)]
+
+
+def feedback_stat_deltas(
+    original_main: Optional[str],
+    original_secondary: Optional[List[Dict]],
+    final_main: Optional[str],
+    final_secondary: Optional[List[Dict]],
+    feedback_type: str,
+) -> List[Dict]:
+    """
+    code_stats increments for a coder's first review of a prediction
+    
+    Predicted codes the coder kept count as approved, ones they dropped or
+    replaced as corrected away, and codes only in the final version as
+    added by the coder. A rejection without corrections corrects away
+    every predicted code.
+    """
+    original = _code_keys(original_main, original_secondary)
+    final = _code_keys(final_main, final_secondary)
+    if feedback_type == "rejected" and original == final:
+        return [_stat_delta(key, correctedAway=1) for key in original]
+    
+    return (
+        [_stat_delta(key, approved=1) for key in original & final]
+        + [_stat_delta(key, correctedAway=1) for key in original - final]
+        + [_stat_delta(key, addedByCoder=1) for key in final - original]
+    )
+
+
+async def add_code_stats(model_used: str, deltas: List[Dict], client: Optional[Prisma] = None):
+    """
+    Add increments to the code_stats counters of `model_used`
+    
+    Pass the transaction that writes the prediction as `client` so the
+    counters move together with it.
+    """
+    if not deltas:
+        return
+    client = client or db
+    
+    params: List = []
+    model = _bind(params, model_used or "")
+    values = []
+    for delta in deltas:
+        counters = ", ".join(f"{_bind(params, delta[field])}::int" for field in CODE_STAT_FIELDS)
+        values.append(f"({_bind(params, delta['code'])}, {_bind(params, delta['role'])}, {model}, {counters})")
+    
+    columns = ", ".join(f'"{field}"' for field in CODE_STAT_FIELDS)
+    increments = ",\n            ".join(
+        f'"{field}" = code_stats."{field}" + EXCLUDED."{field}"' for field in CODE_STAT_FIELDS
+    )
+    await client.execute_raw(
+        f"""
+        INSERT INTO code_stats (code, role, "modelUsed", {columns})
+        VALUES {", ".join(values)}
+        ON CONFLICT (code, role, "modelUsed") DO UPDATE SET
+            {increments},
+            "updatedAt" = CURRENT_TIMESTAMP
+        """,
+        *params,
+    )
+
+
+async def get_code_stats(
+    model_used: Optional[str] = None,
+    code: Optional[str] = None,
+    role: Optional[str] = None,
+    sort: str = "corrected_away",
+    limit: int = 50,
+) -> List[Dict]:
+    """
+    Per-code prediction and review counters, highest `sort` first
+    
+    Reads only the code_stats aggregate, whose size depends on the catalog
+    and number of models, not on prediction history. Without `model_used`
+    the counters are summed over all models.
+    """
+    params: List = []
+    conditions = []
+    if model_used is not None:
+        conditions.append(f's."modelUsed" = {_bind(params, model_used)}')
+    if code:
+        conditions.append(f"s.code = {_bind(params, code)}")
+    if role:
+        conditions.append(f"s.role = {_bind(params, role)}")
+    
+    group_by = ["s.code", "dc.name", "s.role"]
+    if model_used is not None:
+        model_column = 's."modelUsed"'
+        group_by.append(model_column)
+    else:
+        model_column = "NULL::text"
+    sums = ", ".join(f'sum(s."{field}")::int AS "{field}"' for field in CODE_STAT_FIELDS)
+    return await _read(
+        f"""
+        SELECT s.code, dc.name, s.role, {model_column} AS "modelUsed", {sums}
+        FROM code_stats s
+        LEFT JOIN diagnosis_codes dc ON dc.code = s.code
+        {_where_sql(conditions)}
+        GROUP BY {", ".join(group_by)}
+        ORDER BY {CODE_STAT_SORTS[sort]} DESC, s.code
+        LIMIT {int(limit)}
+        """,
+        *params,
+    )
+
+
 # ===== PATIENTS =====
 
 async def find_or_create_patient(
@@ -240,7 +740,11 @@ async def find_or_create_patient(
                 where={"id": patient.id},
                 data=update_data
             )
+            mark_written(patient.id)
             logger.info(f"Updated patient demographics: {patient.id}")
+            
+            if "firstName" in update_data or "lastName" in update_data:
+                await refresh_case_search_documents(patient.id)
         
         return patient
     
@@ -255,16 +759,23 @@ async def find_or_create_patient(
             "countryOfResidence": country_of_residence,
         }
     )
+    mark_written(patient.id)
     logger.info(f"Created new patient: {patient.id} ({first_name} {last_name})")
     return patient
 
 
 async def get_patient(patient_id: str):
     """Get patient by ID with all their cases"""
-    patient = await db.patient.find_unique(
+    patient = await _reader(patient_id).patient.find_unique(
         where={"id": patient_id},
         include={"cases": True}
     )
+    if patient is None and read_db is not db:
+        # Possibly written by another process and not replicated yet
+        patient = await db.patient.find_unique(
+            where={"id": patient_id},
+            include={"cases": True}
+        )
     return patient
 
 
@@ -277,8 +788,137 @@ async def get_patient_by_birth_number(birth_number: str):
     return patient
 
 
+# ===== BLOBS =====
+
+# Lab and medication sections of a case, stored together as one JSON blob
+CASE_SECTION_FIELDS = ("biochemistry", "hematology", "microbiology", "medication")
+
+
+def _blob_row(content: str) -> Dict:
+    """Compressed blob row for `content`, keyed by the SHA-256 of the text"""
+    raw = content.encode("utf-8")
+    codec, data = compress_text(content)
+    return {
+        "hash": hashlib.sha256(raw).hexdigest(),
+        "codec": codec,
+        "size": len(raw),
+        "data": data,
+    }
+
+
+async def put_blob(content: str, client=None) -> str:
+    """
+    Store text compressed in the content-addressed blob table
+    
+    Returns the SHA-256 of the text, which is the blob's key. Storing
+    content that already exists is a no-op.
+    """
+    client = client or db
+    row = _blob_row(content)
+    await client.blob.create_many(
+        data=[{**row, "data": Base64.encode(row["data"])}],
+        skip_duplicates=True,
+    )
+    return row["hash"]
+
+
+async def get_blob(blob_hash: str) -> Optional[str]:
+    """Load and decompress a blob, None if it doesn't exist"""
+    blob = await read_db.blob.find_unique(where={"hash": blob_hash})
+    if blob is None and read_db is not db:
+        # Blobs are immutable, so only a blob the replica hasn't seen yet misses
+        blob = await db.blob.find_unique(where={"hash": blob_hash})
+    if not blob:
+        return None
+    return decompress_text(blob.codec, blob.data.decode())
+
+
+def _case_sections_content(sections: Dict[str, Optional[str]]) -> Optional[str]:
+    """JSON document of a case's lab/medication sections, None if all are empty"""
+    sections = {field: sections.get(field) for field in CASE_SECTION_FIELDS}
+    if not any(sections.values()):
+        return None
+    return json.dumps(sections, ensure_ascii=False)
+
+
+async def put_case_sections(sections: Dict[str, Optional[str]], client=None) -> Optional[str]:
+    """Store a case's lab/medication sections as one blob, None if all are empty"""
+    content = _case_sections_content(sections)
+    if content is None:
+        return None
+    return await put_blob(content, client=client)
+
+
+async def load_case_sections(case) -> Dict[str, Optional[str]]:
+    """
+    Lab and medication sections of a case, keyed by CASE_SECTION_FIELDS
+    
+    Accepts a case model or a raw row dict. Reads the sections blob; cases
+    stored before blobs existed still carry the sections inline and are
+    returned as-is.
+    """
+    if isinstance(case, dict):
+        get = case.get
+    else:
+        def get(field):
+            return getattr(case, field)
+    
+    if not get("sectionsBlob"):
+        return {field: get(field) for field in CASE_SECTION_FIELDS}
+    
+    content = await get_blob(get("sectionsBlob"))
+    sections = json.loads(content) if content else {}
+    return {field: sections.get(field) for field in CASE_SECTION_FIELDS}
+
+
+async def load_case_raw_xml(case) -> Optional[str]:
+    """Original uploaded XML of a case, if it was an XML upload"""
+    if not case.rawXmlBlob:
+        return case.rawXml
+    return await get_blob(case.rawXmlBlob)
+
+
 # ===== PATIENT CASES =====
 
+# Keep in sync with build_case_search_document
+CASE_SEARCH_DOCUMENT_SQL = """
+    lower(concat_ws(' ', c."pacId", pt."firstName", pt."lastName", pt."birthNumber", c."clinicalText"))
+"""
+
+# Searches that look like a PAC ID or birth number (e.g. 8001011234, 800101/1234)
+_IDENTIFIER_SEARCH = re.compile(r"^(?=.*\d)[0-9A-Za-z/]+$")
+
+
+def build_case_search_document(
+    patient,
+    clinical_text: str,
+    pac_id: Optional[str] = None,
+) -> str:
+    """
+    Lowercased text that list_cases search matches against
+    
+    Denormalizes the patient's name and birth number into the case row
+    so one trigram index covers every searchable field.
+    """
+    parts = [pac_id, patient.firstName, patient.lastName, patient.birthNumber, clinical_text]
+    return " ".join(part for part in parts if part is not None).lower()
+
+
+async def refresh_case_search_documents(patient_id: str) -> int:
+    """Rebuild search documents of a patient's cases, e.g. after a name change"""
+    updated = await db.execute_raw(
+        f"""
+        UPDATE patient_cases c
+        SET "searchDocument" = {CASE_SEARCH_DOCUMENT_SQL}
+        FROM patients pt
+        WHERE pt.id = c."patientId" AND c."patientId" = $1
+        """,
+        patient_id,
+    )
+    logger.info(f"Refreshed search documents of {updated} cases for patient: {patient_id}")
+    return updated
+
+
 async def create_case(
     patient_id: str,
     clinical_text: str,
@@ -291,8 +931,26 @@ async def create_case(
     microbiology: Optional[str] = None,
     medication: Optional[str] = None,
     raw_xml: Optional[str] = None,
+    content_hash: Optional[str] = None,
+    idempotency_key: Optional[str] = None,
+    search_document: Optional[str] = None,
 ) -> str:
-    """Create a new patient case, returns case ID"""
+    """
+    Create a new patient case, returns case ID
+    
+    Raw XML and the lab/medication sections go to compressed blobs; the
+    case row only keeps their hashes next to the hot columns. Build
+    `search_document` with build_case_search_document so the case is
+    findable by list_cases search.
+    """
+    raw_xml_blob = await put_blob(raw_xml) if raw_xml else None
+    sections_blob = await put_case_sections({
+        "biochemistry": biochemistry,
+        "hematology": hematology,
+        "microbiology": microbiology,
+        "medication": medication,
+    })
+    
     case = await db.patientcase.create(
         data={
             "patientId": patient_id,
@@ -301,74 +959,425 @@ async def create_case(
             "admissionDate": admission_date,
             "dischargeDate": discharge_date,
             "clinicalText": clinical_text,
-            "biochemistry": biochemistry,
-            "hematology": hematology,
-            "microbiology": microbiology,
-            "medication": medication,
-            "rawXml": raw_xml,
+            "sectionsBlob": sections_blob,
+            "rawXmlBlob": raw_xml_blob,
+            "contentHash": content_hash,
+            "idempotencyKey": idempotency_key,
+            "searchDocument": search_document,
         }
     )
+    mark_written(patient_id, case.id)
     logger.info(f"Created case: {case.id} for patient: {patient_id}")
     return case.id
 
 
+async def ingest_case(
+    birth_number: str,
+    first_name: str,
+    last_name: str,
+    date_of_birth,  # datetime
+    sex: str,
+    clinical_text: str,
+    country_of_residence: Optional[str] = None,
+    pac_id: Optional[str] = None,
+    hospital_patient_id: Optional[str] = None,
+    admission_date = None,
+    discharge_date = None,
+    biochemistry: Optional[str] = None,
+    hematology: Optional[str] = None,
+    microbiology: Optional[str] = None,
+    medication: Optional[str] = None,
+    raw_xml: Optional[str] = None,
+    content_hash: Optional[str] = None,
+    idempotency_key: Optional[str] = None,
+) -> Optional[Dict]:
+    """
+    Store an upload in one statement: blobs, patient upsert, case and a
+    placeholder prediction with status=processing
+    
+    The patient is upserted by birth number. The whole statement is one
+    implicit transaction, so either everything is written or nothing.
+    
+    Returns {"patient", "case_id", "prediction_id"}, or None when a case
+    with the same content hash or Idempotency-Key already exists (nothing
+    but the patient upsert and blobs is written then).
+    """
+    def timestamp(value) -> Optional[str]:
+        return value.isoformat() if isinstance(value, datetime) else value
+    
+    params: List = []
+    ctes = []
+    
+    def blob_ref(content: Optional[str]) -> str:
+        """Bind a blob insert for `content` and return the SQL for its hash"""
+        if content is None:
+            return "NULL::text"
+        row = _blob_row(content)
+        ctes.append(
+            f"""blob_{len(ctes)} AS (
+                INSERT INTO blobs (hash, codec, size, data)
+                VALUES ({_bind(params, row["hash"])}, {_bind(params, row["codec"])},
+                        {_bind(params, row["size"])},
+                        decode({_bind(params, base64.b64encode(row["data"]).decode())}, 'base64'))
+                ON CONFLICT (hash) DO NOTHING
+            )"""
+        )
+        return f'{_bind(params, row["hash"])}::text'
+    
+    sections_blob = blob_ref(_case_sections_content({
+        "biochemistry": biochemistry,
+        "hematology": hematology,
+        "microbiology": microbiology,
+        "medication": medication,
+    }))
+    raw_xml_blob = blob_ref(raw_xml)
+    
+    birth_number_ref = _bind(params, birth_number)
+    pac_id_ref = _bind(params, pac_id)
+    clinical_text_ref = _bind(params, clinical_text)
+    
+    ctes.append(
+        f"""previous AS (
+            SELECT "firstName", "lastName" FROM patients WHERE "birthNumber" = {birth_number_ref}
+        )"""
+    )
+    ctes.append(
+        f"""patient AS (
+            INSERT INTO patients (
+                id, "birthNumber", "firstName", "lastName", "dateOfBirth", sex,
+                "countryOfResidence", "createdAt", "updatedAt"
+            )
+            VALUES (
+                gen_random_uuid()::text, {birth_number_ref}, {_bind(params, first_name)},
+                {_bind(params, last_name)}, {_bind(params, timestamp(date_of_birth))}::text::timestamp(3),
+                {_bind(params, sex)}, {_bind(params, country_of_residence)}::text,
+                CURRENT_TIMESTAMP, CURRENT_TIMESTAMP
+            )
+            ON CONFLICT ("birthNumber") DO UPDATE SET
+                "firstName" = EXCLUDED."firstName",
+                "lastName" = EXCLUDED."lastName",
+                "dateOfBirth" = EXCLUDED."dateOfBirth",
+                sex = EXCLUDED.sex,
+                "countryOfResidence" = COALESCE(EXCLUDED."countryOfResidence", patients."countryOfResidence"),
+                "updatedAt" = CASE
+                    WHEN (patients."firstName", patients."lastName", patients."dateOfBirth", patients.sex,
+                          patients."countryOfResidence")
+                         IS DISTINCT FROM
+                         (EXCLUDED."firstName", EXCLUDED."lastName", EXCLUDED."dateOfBirth", EXCLUDED.sex,
+                          COALESCE(EXCLUDED."countryOfResidence", patients."countryOfResidence"))
+                    THEN CURRENT_TIMESTAMP
+                    ELSE patients."updatedAt"
+                END
+            RETURNING *
+        )"""
+    )
+    ctes.append(
+        f"""new_case AS (
+            INSERT INTO patient_cases (
+                id, "patientId", "pacId", "hospitalPatientId", "admissionDate", "dischargeDate",
+                "clinicalText", "sectionsBlob", "rawXmlBlob", "contentHash", "idempotencyKey",
+                "searchDocument", "createdAt", "updatedAt"
+            )
+            SELECT
+                gen_random_uuid()::text, patient.id, {pac_id_ref}::text,
+                {_bind(params, hospital_patient_id)}::text,
+                {_bind(params, timestamp(admission_date))}::text::timestamp(3),
+                {_bind(params, timestamp(discharge_date))}::text::timestamp(3),
+                {clinical_text_ref}, {sections_blob}, {raw_xml_blob},
+                {_bind(params, content_hash)}::text, {_bind(params, idempotency_key)}::text,
+                lower(concat_ws(' ', {pac_id_ref}::text, patient."firstName", patient."lastName",
+                                patient."birthNumber", {clinical_text_ref})),
+                CURRENT_TIMESTAMP, CURRENT_TIMESTAMP
+            FROM patient
+            ON CONFLICT DO NOTHING
+            RETURNING id
+        )"""
+    )
+    ctes.append(
+        """placeholder AS (
+            INSERT INTO predictions (
+                id, "caseId", "selectedCodes", "step1Reasoning", "mainCode", "mainName",
+                "mainConfidence", "mainReasoning", "secondaryCodes", "modelUsed",
+                "processingTime", status, "createdAt"
+            )
+            SELECT
+                gen_random_uuid()::text, new_case.id, '[]'::jsonb, '', '', 'Processing...',
+                0, '', '[]'::jsonb, '', 0, 'processing', CURRENT_TIMESTAMP
+            FROM new_case
+            RETURNING id
+        )"""
+    )
+    
+    rows = await db.query_raw(
+        f"""
+        WITH {", ".join(ctes)}
+        SELECT
+            row_to_json(patient) AS patient,
+            (SELECT id FROM new_case) AS "caseId",
+            (SELECT id FROM placeholder) AS "predictionId",
+            EXISTS (
+                SELECT 1 FROM previous
+                WHERE ("firstName", "lastName") IS DISTINCT FROM (patient."firstName", patient."lastName")
+            ) AS "namesChanged"
+        FROM patient
+        """,
+        *params,
+    )
+    row = rows[0]
+    patient = Patient.model_validate(row["patient"])
+    mark_written(patient.id, row["caseId"], row["predictionId"])
+    
+    if row["namesChanged"]:
+        # Cases stored before the rename still carry the old name in their search documents
+        await refresh_case_search_documents(patient.id)
+    
+    if not row["caseId"]:
+        logger.info(f"Upload for patient {patient.id} matches an existing case, nothing ingested")
+        return None
+    
+    logger.info(
+        f"Ingested case {row['caseId']} with placeholder prediction {row['predictionId']} "
+        f"for patient {patient.id}"
+    )
+    return {
+        "patient": patient,
+        "case_id": row["caseId"],
+        "prediction_id": row["predictionId"],
+    }
+
+
 async def get_case(case_id: str):
     """Get case by ID with patient and predictions"""
-    case = await db.patientcase.find_unique(
+    include = {"patient": True, "predictions": True}
+    case = await _reader(case_id).patientcase.find_unique(
         where={"id": case_id},
-        include={
-            "patient": True,
-            "predictions": True
-        }
+        include=include,
     )
+    if case is None and read_db is not db:
+        # Possibly written by another process and not replicated yet
+        case = await db.patientcase.find_unique(where={"id": case_id}, include=include)
     return case
 
 
-async def list_cases(
-    page: int = 1,
-    limit: int = 20,
-    search: Optional[str] = None
+async def find_case_by_fingerprint(
+    content_hash: str,
+    idempotency_key: Optional[str] = None,
 ):
-    """List cases with pagination and search"""
-    skip = (page - 1) * limit
+    """
+    Find an already ingested case by content hash or Idempotency-Key
     
-    where = {}
-    if search:
-        where = {
-            "OR": [
-                {"pacId": {"contains": search, "mode": "insensitive"}},
-                {"clinicalText": {"contains": search, "mode": "insensitive"}},
-                {"patient": {
-                    "OR": [
-                        {"firstName": {"contains": search, "mode": "insensitive"}},
-                        {"lastName": {"contains": search, "mode": "insensitive"}},
-                        {"birthNumber": {"contains": search}},
-                    ]
-                }},
-            ]
-        }
+    Both columns are uniquely indexed, so this is at most two index
+    lookups. A case holding the Idempotency-Key wins over one with the
+    same content, so callers can tell a key reused for another document
+    (its contentHash differs). Returns the case with its patient and
+    latest prediction, or None.
+    """
+    conditions = [{"contentHash": content_hash}]
+    if idempotency_key:
+        conditions.append({"idempotencyKey": idempotency_key})
     
     cases = await db.patientcase.find_many(
-        where=where,
-        skip=skip,
-        take=limit,
-        order={"createdAt": "desc"},
+        where={"OR": conditions},
         include={
             "patient": True,
-            "predictions": True
-        }
+            "predictions": {
+                "order_by": {"createdAt": "desc"},
+                "take": 1,
+            },
+        },
+        take=2,
     )
+    for case in cases:
+        if idempotency_key and case.idempotencyKey == idempotency_key:
+            return case
+    return cases[0] if cases else None
+
+
+async def claim_case_rerun(case_id: str) -> Tuple[Optional[str], Optional[object]]:
+    """
+    Create a placeholder prediction to re-run a case, unless its latest
+    prediction is completed or still processing
     
-    total = await db.patientcase.count(where=where)
+    The case row is locked first, so of concurrent duplicate uploads only
+    one claims the re-run; the others see its placeholder once it commits.
+    Returns (placeholder prediction id, None) when claimed, else
+    (None, latest prediction).
+    """
+    async with db.tx() as tx:
+        await tx.query_raw('SELECT id FROM patient_cases WHERE id = $1 FOR UPDATE', case_id)
+        latest = await tx.prediction.find_first(where={"caseId": case_id}, order={"createdAt": "desc"})
+        if latest and latest.status in ("completed", "processing"):
+            return None, latest
+        prediction = await tx.prediction.create(
+            data={
+                "caseId": case_id,
+                "selectedCodes": Json([]),
+                "step1Reasoning": "",
+                "mainCode": "",
+                "mainName": "Processing...",
+                "mainConfidence": 0.0,
+                "mainReasoning": "",
+                "secondaryCodes": Json([]),
+                "modelUsed": "",
+                "processingTime": 0,
+                "status": "processing",
+            }
+        )
+    mark_written(case_id, prediction.id)
+    logger.info(f"Claimed re-run of case {case_id} with placeholder prediction {prediction.id}")
+    return prediction.id, None
+
+
+# Characters of clinical text returned in case listings
+CASE_PREVIEW_LENGTH = 300
+
+
+CASE_LIST_COLUMNS = f"""
+    c.id, c."pacId", c."patientId", c."admissionDate", c."dischargeDate",
+    substr(c."clinicalText", 1, {CASE_PREVIEW_LENGTH}) AS "clinicalPreview",
+    c."createdAt",
+    pt."firstName", pt."lastName",
+    (SELECT count(*) FROM predictions p WHERE p."caseId" = c.id) AS "predictionsCount"
+"""
+
+CASE_LIST_FROM = """
+    FROM patient_cases c
+    JOIN patients pt ON pt.id = c."patientId"
+"""
+
+
+async def _list_cases_page(
+    conditions: List[str],
+    params: List,
+    page: int,
+    limit: int,
+    cursor: Optional[str],
+    with_total: bool,
+) -> Dict:
+    """One newest-first page of cases matching `conditions`"""
+    filter_params = list(params)
+    rows = await _read(
+        f"SELECT {CASE_LIST_COLUMNS} {CASE_LIST_FROM}"
+        + _page_sql("c", conditions, params, page, limit, cursor),
+        *params,
+        fast=True,
+    )
+    cases, next_cursor = _paginate(rows, limit)
+    
+    total = await _count("patient_cases", CASE_LIST_FROM, conditions, filter_params, fast=True) if with_total else None
     
     return {
         "cases": cases,
         "total": total,
         "page": page,
-        "pages": (total + limit - 1) // limit
+        "pages": _pages(total, limit),
+        "next_cursor": next_cursor,
+    }
+
+
+async def _search_cases_exact(
+    search: str,
+    page: int,
+    limit: int,
+    cursor: Optional[str],
+    with_total: bool,
+) -> Optional[Dict]:
+    """
+    Cases whose PAC ID or patient birth number equals `search`
+    
+    Both lookups are plain btree probes. The birth number is resolved to
+    a patient first so the planner can OR the pacId and patientId indexes.
+    Returns None when nothing matches on the first page.
+    """
+    params: List = []
+    identifier = _bind(params, search)
+    without_slash = _bind(params, search.replace("/", ""))
+    conditions = [
+        f'(c."pacId" = {identifier} OR c."patientId" = ANY(ARRAY('
+        f'SELECT id FROM patients WHERE "birthNumber" IN ({identifier}, {without_slash}))))'
+    ]
+    
+    result = await _list_cases_page(conditions, params, page, limit, cursor, with_total)
+    if not result["cases"] and page == 1 and not cursor:
+        return None
+    return result
+
+
+async def _search_cases_ranked(
+    search: str,
+    page: int,
+    limit: int,
+    with_total: bool,
+) -> Dict:
+    """
+    Substring search over case search documents, best matches first
+    
+    The ILIKE filter is served by the trigram GIN index on
+    "searchDocument" (terms of 3+ characters); word_similarity only ranks
+    the rows that matched. Ranked pages use page numbers, never cursors.
+    """
+    params: List = []
+    pattern = _bind(params, _contains_pattern(search.lower()))
+    conditions = [f'c."searchDocument" ILIKE {pattern}']
+    filter_params = list(params)
+    term = _bind(params, search.lower())
+    
+    rows = await _read(
+        f"""
+        SELECT {CASE_LIST_COLUMNS}
+        {CASE_LIST_FROM}
+        {_where_sql(conditions)}
+        ORDER BY word_similarity({term}, c."searchDocument") DESC, c."createdAt" DESC, c.id DESC
+        LIMIT {limit} OFFSET {(page - 1) * limit}
+        """,
+        *params,
+    )
+    
+    total = await _count("patient_cases", CASE_LIST_FROM, conditions, filter_params) if with_total else None
+    
+    return {
+        "cases": rows,
+        "total": total,
+        "page": page,
+        "pages": _pages(total, limit),
+        "next_cursor": None,
     }
 
 
+async def list_cases(
+    page: int = 1,
+    limit: int = 20,
+    search: Optional[str] = None,
+    cursor: Optional[str] = None,
+    with_total: bool = True,
+):
+    """
+    List cases with pagination and search
+    
+    Returns slim dicts: case identifiers and dates, patient name, a
+    clinical text preview and the prediction count computed in the DB.
+    Lab sections and raw XML are never read; use get_case for those.
+    
+    Pass `cursor` (the previous page's next_cursor) for keyset pagination;
+    `page` is ignored then.
+    
+    A search that looks like a PAC ID or birth number is first tried as an
+    exact match. Otherwise (or when nothing matches exactly) cases are
+    ranked by how well their search document matches; ranked results are
+    paged by `page` only and carry no next_cursor.
+    """
+    search = search.strip() if search else None
+    if not search:
+        return await _list_cases_page([], [], page, limit, cursor, with_total)
+    
+    if _IDENTIFIER_SEARCH.match(search):
+        result = await _search_cases_exact(search, page, limit, cursor, with_total)
+        if result is not None:
+            return result
+    
+    return await _search_cases_ranked(search, page, limit, with_total)
+
+
 # ===== PREDICTIONS =====
 
 async def create_prediction(
@@ -384,31 +1393,78 @@ async def create_prediction(
     processing_time: int,
     status: str = "completed",  # Default to completed for backward compatibility
 ) -> str:
-    """Create a new prediction, returns prediction ID"""
-    import json
-    
-    prediction = await db.prediction.create(
-        data={
-            "caseId": case_id,
-            "selectedCodes": json.dumps(selected_codes),  # Convert list to JSON string
-            "step1Reasoning": step1_reasoning,
-            "mainCode": main_code,
-            "mainName": main_name,
-            "mainConfidence": main_confidence,
-            "mainReasoning": main_reasoning,
-            "secondaryCodes": json.dumps(secondary_codes),  # Convert list to JSON string
-            "modelUsed": model_used,
-            "processingTime": processing_time,
-            "status": status,
-        }
-    )
+    """Create a new prediction and its prediction_codes rows, returns prediction ID"""
+    async with db.tx() as tx:
+        prediction = await tx.prediction.create(
+            data={
+                "caseId": case_id,
+                "selectedCodes": Json(selected_codes),
+                "step1Reasoning": step1_reasoning,
+                "mainCode": main_code,
+                "mainName": main_name,
+                "mainConfidence": main_confidence,
+                "mainReasoning": main_reasoning,
+                "secondaryCodes": Json(secondary_codes),
+                "modelUsed": model_used,
+                "processingTime": processing_time,
+                "status": status,
+            }
+        )
+        mark_written(case_id)
+        await sync_prediction_codes(
+            prediction.id, main_code, main_confidence, secondary_codes, client=tx
+        )
+        if status == "completed":
+            await add_code_stats(
+                model_used, prediction_stat_deltas(main_code, secondary_codes), client=tx
+            )
     logger.info(f"Created prediction: {prediction.id} with status: {status}")
     return prediction.id
 
 
+async def complete_prediction(
+    prediction_id: str,
+    selected_codes: List[str],
+    step1_reasoning: str,
+    main_code: str,
+    main_name: str,
+    main_confidence: float,
+    main_reasoning: Optional[str],
+    secondary_codes: List[Dict],
+    model_used: str,
+    processing_time: int,
+):
+    """Fill a placeholder prediction with pipeline results and mark it completed"""
+    async with db.tx() as tx:
+        prediction = await update_prediction(
+            prediction_id,
+            {
+                "selectedCodes": Json(selected_codes),
+                "step1Reasoning": step1_reasoning,
+                "mainCode": main_code,
+                "mainName": main_name,
+                "mainConfidence": main_confidence,
+                "mainReasoning": main_reasoning,
+                "secondaryCodes": Json(secondary_codes),
+                "modelUsed": model_used,
+                "processingTime": processing_time,
+                "status": "completed",
+            },
+            client=tx,
+        )
+        await sync_prediction_codes(
+            prediction_id, main_code, main_confidence, secondary_codes, client=tx
+        )
+        await add_code_stats(
+            model_used, prediction_stat_deltas(main_code, secondary_codes), client=tx
+        )
+    logger.info(f"Updated prediction {prediction_id} to status=completed")
+    return prediction
+
+
 async def get_prediction(prediction_id: str):
     """Get prediction by ID with full nested case and patient data"""
-    prediction = await db.prediction.find_unique(
+    prediction = await db.prediction.find_first(
         where={"id": prediction_id},
         include={
             "case": {
@@ -421,66 +1477,136 @@ async def get_prediction(prediction_id: str):
     return prediction
 
 
+async def get_prediction_with_case(prediction_id: str) -> Optional[Dict]:
+    """
+    Prediction with its case and patient as one flat row, for the detail view
+    
+    Case sections are not included; pass the row to load_case_sections.
+    """
+    sql = """
+        SELECT
+            p.id, p."caseId", p."selectedCodes", p."step1Reasoning",
+            p."mainCode", p."mainName", p."mainConfidence", p."mainReasoning", p."secondaryCodes",
+            p.original_main_code AS "originalMainCode",
+            p.original_main_name AS "originalMainName",
+            p.original_main_confidence AS "originalMainConfidence",
+            p.original_secondary_codes AS "originalSecondaryCodes",
+            p."modelUsed", p."processingTime", p.status,
+            p.validated, p."validatedAt", p."validatedBy", p."feedbackType",
+            p.corrected, p.corrected_at AS "correctedAt", p.corrections, p."feedbackComment",
+            p."createdAt",
+            c."pacId", c."clinicalText", c."sectionsBlob",
+            c.biochemistry, c.hematology, c.microbiology, c.medication,
+            pt.id AS "patientId", pt."firstName", pt."lastName", pt."dateOfBirth",
+            pt.sex, pt."birthNumber"
+        FROM predictions p
+        JOIN patient_cases c ON c.id = p."caseId"
+        JOIN patients pt ON pt.id = c."patientId"
+        WHERE p.id = $1
+    """
+    # Read-your-writes: the detail is usually fetched right after the
+    # prediction was created or reviewed
+    primary = _recently_written(prediction_id)
+    rows = await _read(sql, prediction_id, primary=primary, fast=True)
+    if not rows and not primary and read_db is not db:
+        rows = await _read(sql, prediction_id, primary=True)
+    return rows[0] if rows else None
+
+
 async def list_predictions(
     page: int = 1,
     limit: int = 20,
     case_id: Optional[str] = None,
     validated: Optional[bool] = None,
+    cursor: Optional[str] = None,
+    with_total: bool = True,
+    since: Optional[datetime] = None,
 ):
-    """List predictions with pagination and filters - includes nested case and patient data"""
-    skip = (page - 1) * limit
+    """
+    List predictions with pagination and filters
     
-    where = {}
+    Rows are slim dicts with PREDICTION_LIST_COLUMNS (prediction summary,
+    case pacId and patient demographics). Pass `cursor` (the previous
+    page's next_cursor) for keyset pagination; `page` is ignored then.
+    `since` limits the listing to predictions created from then on.
+    Served by the replica, except a case's listing right after a
+    prediction was added to it.
+    """
+    params: List = []
+    conditions = []
     if case_id:
-        where["caseId"] = case_id
+        conditions.append(f'p."caseId" = {_bind(params, case_id)}')
     if validated is not None:
-        where["validated"] = validated
+        conditions.append(f'p.validated = {_bind(params, validated)}')
+    conditions += _since_conditions("p", params, since)
+    filter_params = list(params)
     
-    predictions = await db.prediction.find_many(
-        where=where,
-        skip=skip,
-        take=limit,
-        order={"createdAt": "desc"},
-        include={
-            "case": {
-                "include": {
-                    "patient": True
-                }
-            }
-        }
+    rows = await _read(
+        f"SELECT {PREDICTION_LIST_COLUMNS} {PREDICTION_LIST_FROM} "
+        + _page_sql("p", conditions, params, page, limit, cursor),
+        *params,
+        primary=_recently_written(case_id),
     )
+    predictions, next_cursor = _paginate(rows, limit)
     
-    total = await db.prediction.count(where=where)
+    total = await _count("predictions", "FROM predictions p", conditions, filter_params) if with_total else None
     
     return {
         "predictions": predictions,
         "total": total,
         "page": page,
-        "pages": (total + limit - 1) // limit
+        "pages": _pages(total, limit),
+        "next_cursor": next_cursor,
     }
 
 
+async def update_prediction(prediction_id: str, data: Dict, client: Optional[Prisma] = None):
+    """
+    Update a prediction by id; the updated row, or None if there is none
+    
+    The primary key of the partitioned predictions table is (id, createdAt),
+    so update() would need both; ids are unique on their own.
+    """
+    client = client or db
+    updated = await client.prediction.update_many(where={"id": prediction_id}, data=data)
+    if not updated:
+        return None
+    return await client.prediction.find_first(where={"id": prediction_id})
+
+
 async def update_prediction_status(prediction_id: str, status: str):
     """Update prediction status (processing, completed, failed)"""
-    prediction = await db.prediction.update(
-        where={"id": prediction_id},
-        data={"status": status}
-    )
+    prediction = await update_prediction(prediction_id, {"status": status})
+    mark_written(prediction_id, prediction.caseId if prediction else None)
     logger.info(f"Updated prediction {prediction_id} status to: {status}")
     return prediction
 
 
+async def lock_for_first_review(prediction_id: str, client: Prisma) -> bool:
+    """
+    Lock a prediction for a review; True if it was not reviewed before
+    
+    Call first inside the review's transaction (`client`): a concurrent
+    review of the same prediction waits for it to commit and then sees
+    validated = true, so code statistics count one first review only.
+    """
+    rows = await client.query_raw(
+        'SELECT validated FROM predictions WHERE id = $1 FOR UPDATE',
+        prediction_id,
+    )
+    return bool(rows) and not rows[0]["validated"]
+
+
 async def submit_prediction_feedback(
     prediction_id: str,
     validated_by: str,
     feedback_type: str,
     corrections: Optional[Dict] = None,
     feedback_comment: Optional[str] = None,
+    client: Optional[Prisma] = None,
 ):
     """Submit feedback on a prediction (approve or reject with corrections)"""
-    from datetime import datetime
-    import json
-    
+    client = client or db
     update_data = {
         "validated": True,
         "validatedAt": datetime.utcnow(),
@@ -491,11 +1617,9 @@ async def submit_prediction_feedback(
     
     # Only set corrections if provided (allow null for approved)
     if corrections is not None:
-        update_data["corrections"] = json.dumps(corrections)
+        update_data["corrections"] = Json(corrections)
     
-    prediction = await db.prediction.update(
-        where={"id": prediction_id},
-        data=update_data
-    )
+    prediction = await update_prediction(prediction_id, update_data, client=client)
+    mark_written(prediction_id)
     logger.info(f"Feedback submitted for prediction {prediction_id}: {feedback_type}")
     return prediction
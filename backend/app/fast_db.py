@@ -0,0 +1,89 @@
+"""Optional asyncpg pool for hot read-only queries
+
+Prisma stays the client for writes and migrations. When FAST_READS is
+enabled, app.database routes its hottest raw SELECTs (case listing,
+prediction detail, code lookup and usage; those _read calls pass
+fast=True) through this pool instead; the SQL is shared, only the
+executor changes. Read-your-writes is unchanged: reads flagged for the
+primary never use the pool.
+asyncpg prepares and caches each statement per connection. The pool
+connects to READ_DATABASE_URL when a read replica is configured.
+"""
+
+import json
+from typing import Dict, List
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from loguru import logger
+
+from app.core.config import settings
+
+try:
+    import asyncpg
+except ImportError:
+    asyncpg = None
+
+
+# Connection string options understood by Prisma but not by libpq/asyncpg
+PRISMA_ONLY_PARAMS = {"pgbouncer", "connection_limit", "pool_timeout", "schema", "socket_timeout"}
+
+# Set by connect_fast_db; None means reads go through Prisma
+pool = None
+
+
+def asyncpg_dsn(url: str) -> str:
+    """Strip Prisma-specific query parameters from a connection string"""
+    parts = urlsplit(url)
+    query = [(k, v) for k, v in parse_qsl(parts.query) if k not in PRISMA_ONLY_PARAMS]
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+
+async def _init_connection(conn):
+    """Decode json/jsonb to Python objects, as Prisma's query_raw does"""
+    for type_name in ("json", "jsonb"):
+        await conn.set_type_codec(
+            type_name,
+            encoder=json.dumps,
+            decoder=json.loads,
+            schema="pg_catalog",
+        )
+
+
+async def connect_fast_db():
+    """Open the read pool if FAST_READS is enabled and asyncpg is installed"""
+    global pool
+    if not settings.FAST_READS or pool is not None:
+        return
+    if asyncpg is None:
+        logger.warning("FAST_READS is enabled but asyncpg is not installed, reads stay on Prisma")
+        return
+
+    # The direct URL bypasses pgbouncer, whose transaction pooling breaks
+    # prepared statements; a replica URL must likewise not go through pgbouncer
+    pool = await asyncpg.create_pool(
+        asyncpg_dsn(settings.READ_DATABASE_URL or settings.DIRECT_URL),
+        min_size=1,
+        max_size=settings.FAST_READS_POOL_SIZE,
+        init=_init_connection,
+    )
+    logger.info(f"asyncpg read pool connected (max {settings.FAST_READS_POOL_SIZE} connections)")
+
+
+async def disconnect_fast_db():
+    """Close the read pool"""
+    global pool
+    if pool is not None:
+        await pool.close()
+        pool = None
+        logger.info("asyncpg read pool disconnected")
+
+
+def is_enabled() -> bool:
+    return pool is not None
+
+
+async def fetch(sql: str, *params) -> List[Dict]:
+    """Run a read-only query on the pool, rows as dicts"""
+    async with pool.acquire() as conn:
+        rows = await conn.fetch(sql, *params)
+    return [dict(row) for row in rows]
@@ -0,0 +1,107 @@
+"""Event loop lag monitor
+
+A background task sleeps LOOP_LAG_INTERVAL_MS at a time and measures how
+late it wakes up. Lateness means something held the loop, so each tick's
+lag is charged to every route that had a request in flight during the
+tick (tracked by LoopLagMiddleware). Routes that keep collecting blocked time
+while others are cheap are the ones doing synchronous work in the
+handler. Lag above LOOP_LAG_WARN_MS is also logged with the routes.
+"""
+
+import asyncio
+import time
+from collections import Counter, defaultdict
+from typing import Dict, Optional
+
+from loguru import logger
+from starlette.routing import Match
+
+from app.core.config import settings
+
+# Requests in flight per route, and routes seen since the last tick (a
+# handler that blocked the loop has often finished by the time it wakes)
+_active: Counter = Counter()
+_seen = set()
+
+# Route -> blocked milliseconds, lagging ticks, worst single lag
+_blocked: Dict[str, Dict[str, float]] = defaultdict(lambda: {"blocked_ms": 0.0, "ticks": 0, "max_lag_ms": 0.0})
+
+_task: Optional[asyncio.Task] = None
+
+
+def _route_path(scope) -> str:
+    """Path template of the matching route, e.g. /api/cases/{case_id}"""
+    for route in scope["app"].router.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return f"{scope['method']} {route.path}"
+    return f"{scope['method']} (unmatched)"
+
+
+class LoopLagMiddleware:
+    """Track which routes have requests in flight"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        route = _route_path(scope)
+        _active[route] += 1
+        _seen.add(route)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _active[route] -= 1
+            if not _active[route]:
+                del _active[route]
+
+
+async def _monitor():
+    interval = settings.LOOP_LAG_INTERVAL_MS / 1000
+    while True:
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        lag_ms = (time.perf_counter() - started - interval) * 1000
+        routes = sorted(_seen) or ["(no request)"]
+        _seen.clear()
+        _seen.update(_active)
+        if lag_ms < 1:
+            continue
+
+        for route in routes:
+            stats = _blocked[route]
+            stats["blocked_ms"] += lag_ms
+            stats["ticks"] += 1
+            stats["max_lag_ms"] = max(stats["max_lag_ms"], lag_ms)
+
+        if lag_ms >= settings.LOOP_LAG_WARN_MS:
+            logger.warning(f"Event loop blocked {lag_ms:.0f} ms, in flight: {', '.join(routes)}")
+
+
+def start_loop_monitor():
+    """Start the monitor task on the running loop"""
+    global _task
+    if _task is None and settings.LOOP_LAG_INTERVAL_MS > 0:
+        _task = asyncio.create_task(_monitor())
+
+
+async def stop_loop_monitor():
+    global _task
+    if _task is not None:
+        _task.cancel()
+        try:
+            await _task
+        except asyncio.CancelledError:
+            pass
+        _task = None
+
+
+def loop_lag_stats() -> Dict[str, Dict[str, float]]:
+    """Blocked time per route since startup, worst first"""
+    return {
+        route: {key: round(value, 1) for key, value in stats.items()}
+        for route, stats in sorted(_blocked.items(), key=lambda item: -item[1]["blocked_ms"])
+    }
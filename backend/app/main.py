@@ -1,24 +1,31 @@
 """FastAPI main application"""
 
-from typing import List
-from fastapi import FastAPI, HTTPException, Query, Body
+import asyncio
+from datetime import datetime, timedelta
+from typing import Dict, List, Literal, Optional, Tuple
+from xml.etree.ElementTree import ParseError
+from fastapi import BackgroundTasks, FastAPI, HTTPException, Query, Body, Header
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 from loguru import logger
+from prisma import Json
 
 from app.models import (
     ClinicalInput,
     PredictionResponse,
-    CaseResponse,
-    CaseDetailResponse,
+    CaseListItem,
     PaginatedCases,
     PaginatedPredictions,
     PredictionListItem,
     CodeSearchResult,
     CodeDetailResponse,
+    CodeStatsItem,
     FeedbackInput,
     HealthResponse,
     DiagnosisCode,
+    BatchCaseItem,
+    BatchIngestError,
+    BatchIngestResponse,
 )
 from app.database import (
     connect_db,
@@ -26,23 +33,44 @@ from app.database import (
     find_or_create_patient,
     get_patient,
     create_case,
+    ingest_case,
+    build_case_search_document,
+    find_case_by_fingerprint,
+    claim_case_rerun,
     get_case,
+    load_case_sections,
     list_cases,
     create_prediction,
+    complete_prediction,
     get_prediction,
+    get_prediction_with_case,
     list_predictions,
     submit_prediction_feedback,
+    update_prediction,
     update_prediction_status,
     search_codes,
     validate_codes,
     enrich_code,
     get_code_by_code,
     get_predictions_by_code,
+    get_code_usage,
+    sync_prediction_codes,
+    add_code_stats,
+    feedback_stat_deltas,
+    lock_for_first_review,
+    get_code_stats,
     db,
 )
-from app.services import predict_diagnosis
-from app.parsers import parse_medical_xml
-from app.utils import calculate_age
+from app.services import abbreviation_texts, annotate_abbreviations, predict_diagnosis
+from app.parsers import (
+    ParsedMedicalData,
+    build_parsed_data,
+    extract_patient_records,
+    parse_medical_xml,
+)
+from app.cpu_pool import CPUPoolBusy, run_cpu, start_cpu_pool, stop_cpu_pool
+from app.loop_monitor import LoopLagMiddleware, loop_lag_stats, start_loop_monitor, stop_loop_monitor
+from app.utils import calculate_age, compute_content_hash
 from app.core.config import settings
 
 
@@ -54,9 +82,13 @@ async def lifespan(app: FastAPI):
     # Startup
     logger.info("Starting AutoCode AI API...")
     await connect_db()
+    start_cpu_pool()
+    start_loop_monitor()
     yield
     # Shutdown
     logger.info("Shutting down...")
+    await stop_loop_monitor()
+    stop_cpu_pool()
     await disconnect_db()
 
 
@@ -78,6 +110,42 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Charge event loop lag to the routes in flight
+app.add_middleware(LoopLagMiddleware)
+
+
+# ===== HELPERS =====
+
+def _recent_since(all_time: bool) -> Optional[datetime]:
+    """Default lower bound for prediction listings, None when all_time is requested"""
+    if all_time:
+        return None
+    return datetime.utcnow() - timedelta(days=settings.RECENT_PREDICTIONS_DAYS)
+
+
+def _check_xml_size(xml_content: str):
+    """413 for uploads above MAX_XML_BYTES"""
+    size = len(xml_content.encode("utf-8"))
+    if size > settings.MAX_XML_BYTES:
+        raise HTTPException(
+            status_code=413,
+            detail=f"XML is {size} bytes, the limit is {settings.MAX_XML_BYTES}",
+        )
+
+
+def _cpu_pool_error(e: Exception) -> HTTPException:
+    """503 when the CPU pool is saturated, 504 when parsing timed out"""
+    if isinstance(e, CPUPoolBusy):
+        return HTTPException(status_code=503, detail="Server busy parsing other uploads, retry later")
+    return HTTPException(status_code=504, detail="Parsing took too long")
+
+
+def _with_total(include_total: Optional[bool], cursor: Optional[str]) -> bool:
+    """Totals are counted for page-number requests unless explicitly disabled, skipped for cursors"""
+    if include_total is not None:
+        return include_total
+    return cursor is None
+
 
 # ===== ROUTES =====
 
@@ -103,54 +171,49 @@ async def health():
 
 # ===== PREDICTION =====
 
-@app.post("/api/predict/xml")
-async def create_prediction_from_xml(xml_content: str = Body(..., media_type="text/plain")):
+def _prediction_response(pred) -> PredictionResponse:
+    """Build a PredictionResponse from a stored prediction"""
+    return PredictionResponse(
+        prediction_id=pred.id,
+        case_id=pred.caseId,
+        selected_codes=pred.selectedCodes or [],
+        step1_reasoning=pred.step1Reasoning or "",
+        main_diagnosis=DiagnosisCode(
+            code=pred.mainCode,
+            name=pred.mainName,
+            confidence=pred.mainConfidence,
+            reasoning=pred.mainReasoning,
+        ),
+        secondary_diagnoses=[DiagnosisCode(**d) for d in pred.secondaryCodes or []],
+        model_used=pred.modelUsed,
+        processing_time=pred.processingTime,
+        created_at=pred.createdAt,
+    )
+
+
+async def _run_case_prediction(
+    case_id: str,
+    patient,
+    clinical_text: str,
+    pac_id: Optional[str] = None,
+    biochemistry: Optional[str] = None,
+    hematology: Optional[str] = None,
+    microbiology: Optional[str] = None,
+    medication: Optional[str] = None,
+    prediction_id: Optional[str] = None,
+) -> PredictionResponse:
     """
-    Create prediction from XML file
+    Run the 2-step pipeline for a stored case
     
-    Expects raw XML content as text/plain in request body
-    
-    1. Parses XML to extract demographics and clinical data
-    2. Finds or creates patient
-    3. Creates case linked to patient
-    4. Runs 2-step prediction pipeline with patient context
-    5. Saves prediction
+    Fills in the placeholder prediction `prediction_id` (status=processing),
+    creating one first if none is given, and marks it failed if the
+    pipeline raises.
     """
-    try:
-        logger.info("Received XML upload")
-        
-        # Step 1: Parse XML
-        parsed = await parse_medical_xml(xml_content)
-        logger.info(f"Parsed XML for patient: {parsed.first_name} {parsed.last_name}")
-        
-        # Step 2: Find or create patient
-        patient = await find_or_create_patient(
-            birth_number=parsed.birth_number,
-            first_name=parsed.first_name,
-            last_name=parsed.last_name,
-            date_of_birth=parsed.date_of_birth,
-            sex=parsed.sex,
-            country_of_residence=parsed.country_of_residence,
-        )
-        
-        # Calculate patient age
-        patient_age = calculate_age(patient.dateOfBirth)
-        logger.info(f"Patient: {patient.id}, Age: {patient_age}, Sex: {patient.sex}")
-        
-        # Step 3: Create case linked to patient
-        case_id = await create_case(
-            patient_id=patient.id,
-            pac_id=parsed.pac_id,
-            hospital_patient_id=parsed.patient_id,
-            clinical_text=parsed.clinical_text,
-            biochemistry=parsed.biochemistry,
-            hematology=parsed.hematology,
-            microbiology=parsed.microbiology,
-            medication=parsed.medication,
-            raw_xml=parsed.raw_xml,
-        )
-        
-        # Step 3.5: Create placeholder prediction with "processing" status
+    patient_age = calculate_age(patient.dateOfBirth)
+    logger.info(f"Patient: {patient.id}, Age: {patient_age}, Sex: {patient.sex}")
+    
+    if not prediction_id:
+        # Create placeholder prediction with "processing" status
         prediction_id = await create_prediction(
             case_id=case_id,
             selected_codes=[],
@@ -165,65 +228,203 @@ async def create_prediction_from_xml(xml_content: str = Body(..., media_type="te
             status="processing",
         )
         logger.info(f"Created placeholder prediction {prediction_id} with status=processing")
+    
+    # Run prediction with patient context
+    try:
+        result = await predict_diagnosis(
+            clinical_text=clinical_text,
+            patient_age=patient_age,
+            patient_sex=patient.sex,
+            pac_id=pac_id,
+            biochemistry=biochemistry,
+            hematology=hematology,
+            microbiology=microbiology,
+            medication=medication,
+        )
+        
+        # Update prediction with actual results and status=completed
+        main_diag = result["step2"]["main_diagnosis"]
+        secondary_diags = result["step2"].get("secondary_diagnoses", [])
+        
+        pred = await complete_prediction(
+            prediction_id=prediction_id,
+            selected_codes=result["step1"]["selected_codes"],
+            step1_reasoning=result["step1"]["reasoning"],
+            main_code=main_diag["code"],
+            main_name=main_diag["name"],
+            main_confidence=main_diag["confidence"],
+            main_reasoning=main_diag.get("reasoning"),
+            secondary_codes=secondary_diags,
+            model_used=result["model_used"],
+            processing_time=result["processing_time"],
+        )
         
-        # Step 4: Run prediction with patient context
+        return PredictionResponse(
+            prediction_id=prediction_id,
+            case_id=case_id,
+            selected_codes=result["step1"]["selected_codes"],
+            step1_reasoning=result["step1"]["reasoning"],
+            main_diagnosis=DiagnosisCode(**main_diag),
+            secondary_diagnoses=[DiagnosisCode(**d) for d in secondary_diags],
+            model_used=result["model_used"],
+            processing_time=result["processing_time"],
+            created_at=pred.createdAt,
+        )
+    except Exception as prediction_error:
+        # Mark prediction as failed
+        await update_prediction_status(prediction_id, "failed")
+        logger.error(f"Prediction generation failed: {prediction_error}")
+        raise
+
+
+def _check_same_document(case, content_hash: str):
+    """422 when the matched case holds the Idempotency-Key but another document"""
+    if case.contentHash != content_hash:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Idempotency-Key was already used for a different document (case {case.id})",
+        )
+
+
+async def _claim_rerun(case) -> Tuple[Optional[str], object]:
+    """
+    Claim the re-run of a duplicate whose latest prediction failed or is missing
+    
+    Returns (placeholder prediction id, None), or (None, latest prediction)
+    when it is completed or processing, also when a concurrent duplicate
+    claimed the re-run first.
+    """
+    latest = case.predictions[0] if case.predictions else None
+    if latest and latest.status in ("completed", "processing"):
+        return None, latest
+    return await claim_case_rerun(case.id)
+
+
+async def _resume_existing_case(case, content_hash: str) -> PredictionResponse:
+    """
+    Answer a duplicate upload from an already ingested case
+    
+    - Idempotency-Key of another document: 422
+    - completed prediction: returned as-is, no parsing or LLM calls
+    - processing prediction: 409, the original request is still running
+    - failed or missing prediction: pipeline re-runs on the stored case,
+      for only one of concurrent duplicates (the others get 409)
+    """
+    _check_same_document(case, content_hash)
+    prediction_id, latest = await _claim_rerun(case)
+    
+    if latest and latest.status == "completed":
+        logger.info(f"Duplicate upload matched case {case.id}, returning prediction {latest.id}")
+        return _prediction_response(latest)
+    
+    if prediction_id is None:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Case {case.id} is already being processed (prediction {latest.id})",
+        )
+    
+    logger.info(f"Duplicate upload matched case {case.id} without a completed prediction, re-running")
+    sections = await load_case_sections(case)
+    return await _run_case_prediction(
+        case_id=case.id,
+        patient=case.patient,
+        clinical_text=case.clinicalText,
+        pac_id=case.pacId,
+        prediction_id=prediction_id,
+        **sections,
+    )
+
+
+async def _ingest_parsed(
+    parsed: ParsedMedicalData,
+    content_hash: str,
+    idempotency_key: Optional[str],
+) -> Optional[Dict]:
+    """Upsert patient, create case and placeholder prediction; None if the fingerprint exists"""
+    return await ingest_case(
+        birth_number=parsed.birth_number,
+        first_name=parsed.first_name,
+        last_name=parsed.last_name,
+        date_of_birth=parsed.date_of_birth,
+        sex=parsed.sex,
+        country_of_residence=parsed.country_of_residence,
+        clinical_text=parsed.clinical_text,
+        pac_id=parsed.pac_id,
+        hospital_patient_id=parsed.patient_id,
+        biochemistry=parsed.biochemistry,
+        hematology=parsed.hematology,
+        microbiology=parsed.microbiology,
+        medication=parsed.medication,
+        raw_xml=parsed.raw_xml,
+        content_hash=content_hash,
+        idempotency_key=idempotency_key,
+    )
+
+
+def _prediction_job(parsed: ParsedMedicalData, ingested: Dict) -> Dict:
+    """_run_case_prediction arguments for a freshly ingested case"""
+    return dict(
+        case_id=ingested["case_id"],
+        patient=ingested["patient"],
+        clinical_text=parsed.clinical_text,
+        pac_id=parsed.pac_id,
+        biochemistry=parsed.biochemistry,
+        hematology=parsed.hematology,
+        microbiology=parsed.microbiology,
+        medication=parsed.medication,
+        prediction_id=ingested["prediction_id"],
+    )
+
+
+@app.post("/api/predict/xml")
+async def create_prediction_from_xml(
+    xml_content: str = Body(..., media_type="text/plain"),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+):
+    """
+    Create prediction from XML file
+    
+    Expects raw XML content as text/plain in request body
+    
+    0. Fingerprints the upload; duplicates (same normalized content or
+       same Idempotency-Key header) return the existing prediction
+    1. Parses XML to extract demographics and clinical data
+    2-4. Upserts patient, creates case and a placeholder prediction
+       (single transactional statement)
+    5. Runs 2-step prediction pipeline with patient context and saves it
+    """
+    try:
+        logger.info("Received XML upload")
+        _check_xml_size(xml_content)
+        
+        # Step 0: Skip parsing and prediction for documents we already have
+        content_hash = compute_content_hash(xml_content)
+        existing_case = await find_case_by_fingerprint(content_hash, idempotency_key)
+        if existing_case:
+            return await _resume_existing_case(existing_case, content_hash)
+        
+        # Step 1: Parse XML; pool saturation and parse timeouts only, the
+        # prediction's own timeouts are prediction errors
         try:
-            result = await predict_diagnosis(
-                clinical_text=parsed.clinical_text,
-                patient_age=patient_age,
-                patient_sex=patient.sex,
-                pac_id=parsed.pac_id,
-                biochemistry=parsed.biochemistry,
-                hematology=parsed.hematology,
-                microbiology=parsed.microbiology,
-                medication=parsed.medication,
-            )
-            
-            # Step 5: Update prediction with actual results and status=completed
-            main_diag = result["step2"]["main_diagnosis"]
-            secondary_diags = result["step2"].get("secondary_diagnoses", [])
-            
-            # Update the prediction with actual data using the connected db  
-            from app.database import db
-            import json
-            
-            await db.prediction.update(
-                where={"id": prediction_id},
-                data={
-                    "selectedCodes": json.dumps(result["step1"]["selected_codes"]),
-                    "step1Reasoning": result["step1"]["reasoning"],
-                    "mainCode": main_diag["code"],
-                    "mainName": main_diag["name"],
-                    "mainConfidence": main_diag["confidence"],
-                    "mainReasoning": main_diag.get("reasoning"),
-                    "secondaryCodes": json.dumps(secondary_diags),
-                    "modelUsed": result["model_used"],
-                    "processingTime": result["processing_time"],
-                    "status": "completed",
-                }
-            )
-            logger.info(f"Updated prediction {prediction_id} to status=completed")
-            
-            # Get updated prediction with created_at
-            pred = await get_prediction(prediction_id)
-            
-            return PredictionResponse(
-                prediction_id=prediction_id,
-                case_id=case_id,
-                selected_codes=result["step1"]["selected_codes"],
-                step1_reasoning=result["step1"]["reasoning"],
-                main_diagnosis=DiagnosisCode(**main_diag),
-                secondary_diagnoses=[DiagnosisCode(**d) for d in secondary_diags],
-                model_used=result["model_used"],
-                processing_time=result["processing_time"],
-                created_at=pred.createdAt,
-            )
-        except Exception as prediction_error:
-            # Mark prediction as failed
-            await update_prediction_status(prediction_id, "failed")
-            logger.error(f"Prediction generation failed: {prediction_error}")
-            raise
+            parsed = await parse_medical_xml(xml_content)
+        except (CPUPoolBusy, TimeoutError) as e:
+            raise _cpu_pool_error(e)
+        logger.info(f"Parsed XML for patient: {parsed.first_name} {parsed.last_name}")
+        
+        # Steps 2-4: Upsert patient, create case and placeholder prediction in one round-trip
+        ingested = await _ingest_parsed(parsed, content_hash, idempotency_key)
+        if ingested is None:
+            # A concurrent upload of the same document won the race
+            existing_case = await find_case_by_fingerprint(content_hash, idempotency_key)
+            if not existing_case:
+                raise HTTPException(status_code=409, detail="Upload conflicts with an existing case")
+            return await _resume_existing_case(existing_case, content_hash)
+        
+        # Step 5: Run prediction and save results
+        return await _run_case_prediction(**_prediction_job(parsed, ingested))
         
+    except HTTPException:
+        raise
     except ValueError as e:
         logger.error(f"XML parsing error: {e}")
         raise HTTPException(status_code=400, detail=f"Invalid XML: {str(e)}")
@@ -232,6 +433,153 @@ async def create_prediction_from_xml(xml_content: str = Body(..., media_type="te
         raise HTTPException(status_code=500, detail=str(e))
 
 
+async def _ingest_patient_block(
+    index: int,
+    record: Dict,
+    idempotency_key: Optional[str],
+) -> Tuple[BatchCaseItem, Optional[Dict]]:
+    """
+    Ingest one patient block of a multi-patient upload
+    
+    Returns the block's item and the _run_case_prediction arguments, or
+    None for those when the block is a duplicate whose prediction is
+    completed or still running. Duplicates without a completed prediction
+    are queued for a re-run like single uploads; a block key already used
+    for another document raises the 422 HTTPException.
+    """
+    block_key = f"{idempotency_key}:{index}" if idempotency_key else None
+    content_hash = compute_content_hash(record["raw_xml"])
+    
+    case = await find_case_by_fingerprint(content_hash, block_key)
+    if case is None:
+        parsed = await build_parsed_data(record, record["raw_xml"])
+        ingested = await _ingest_parsed(parsed, content_hash, block_key)
+        if ingested is not None:
+            item = BatchCaseItem(
+                index=index,
+                pac_id=parsed.pac_id,
+                case_id=ingested["case_id"],
+                prediction_id=ingested["prediction_id"],
+                status="queued",
+            )
+            return item, _prediction_job(parsed, ingested)
+        
+        # A concurrent upload of the same block won the race
+        case = await find_case_by_fingerprint(content_hash, block_key)
+        if case is None:
+            raise ValueError("Upload conflicts with an existing case")
+    
+    _check_same_document(case, content_hash)
+    prediction_id, latest = await _claim_rerun(case)
+    if prediction_id is None:
+        item = BatchCaseItem(
+            index=index, pac_id=case.pacId, case_id=case.id,
+            prediction_id=latest.id, status=latest.status,
+        )
+        return item, None
+    
+    sections = await load_case_sections(case)
+    item = BatchCaseItem(
+        index=index, pac_id=case.pacId, case_id=case.id, prediction_id=prediction_id, status="queued",
+    )
+    job = dict(
+        case_id=case.id,
+        patient=case.patient,
+        clinical_text=case.clinicalText,
+        pac_id=case.pacId,
+        prediction_id=prediction_id,
+        **sections,
+    )
+    return item, job
+
+
+async def _run_batch_predictions(jobs: List[Dict]):
+    """Run queued predictions, at most BATCH_PREDICTION_CONCURRENCY at once"""
+    limit = asyncio.Semaphore(settings.BATCH_PREDICTION_CONCURRENCY)
+    
+    # Annotate the whole batch in one pool call; the predictions hit the cache
+    if settings.ABBREVIATION_GLOSSARY:
+        await annotate_abbreviations([
+            text for job in jobs
+            for text in abbreviation_texts(job["clinical_text"], job.get("microbiology"))
+        ])
+    
+    async def run(job: Dict):
+        async with limit:
+            await _run_case_prediction(**job)
+    
+    # Failures are already logged and marked on the prediction
+    results = await asyncio.gather(*(run(job) for job in jobs), return_exceptions=True)
+    failed = sum(isinstance(result, Exception) for result in results)
+    logger.info(f"Batch predictions finished: {len(jobs) - failed} completed, {failed} failed")
+
+
+@app.post("/api/predict/xml/batch", response_model=BatchIngestResponse, status_code=202)
+async def create_predictions_from_xml_batch(
+    background_tasks: BackgroundTasks,
+    xml_content: str = Body(..., media_type="text/plain"),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+):
+    """
+    Create predictions for every patient in a multi-patient XML document
+    
+    Expects raw XML content as text/plain in request body
+    
+    1. Extracts one record per patient block (dsip:ip) on the CPU pool
+    2. Fingerprints, parses and ingests each block like a single upload,
+       up to INGEST_CONCURRENCY blocks at once; an Idempotency-Key
+       applies per block as "<key>:<block index>"
+    3. Answers 202 with one item per case and runs the predictions in the
+       background, BATCH_PREDICTION_CONCURRENCY at once; poll
+       /api/predictions/{id} for their status
+    
+    Blocks that fail (e.g. no clinical text) are listed in `errors` and
+    do not stop the others.
+    """
+    logger.info("Received multi-patient XML upload")
+    _check_xml_size(xml_content)
+    
+    try:
+        records = await run_cpu(extract_patient_records, xml_content, True)
+    except ParseError as e:
+        logger.error(f"XML parsing error: {e}")
+        raise HTTPException(status_code=400, detail=f"Invalid XML: {str(e)}")
+    except (CPUPoolBusy, TimeoutError) as e:
+        raise _cpu_pool_error(e)
+    if not records:
+        raise HTTPException(status_code=400, detail="Invalid XML: no patient blocks found")
+    
+    limit = asyncio.Semaphore(settings.INGEST_CONCURRENCY)
+    
+    async def ingest(index: int, record: Dict):
+        async with limit:
+            return await _ingest_patient_block(index, record, idempotency_key)
+    
+    results = await asyncio.gather(
+        *(ingest(index, record) for index, record in enumerate(records)),
+        return_exceptions=True,
+    )
+    
+    cases = []
+    jobs = []
+    errors = []
+    for index, result in enumerate(results):
+        if isinstance(result, Exception):
+            logger.error(f"Patient block {index} failed: {result}")
+            detail = result.detail if isinstance(result, HTTPException) else str(result)
+            errors.append(BatchIngestError(index=index, detail=detail))
+            continue
+        item, job = result
+        cases.append(item)
+        if job:
+            jobs.append(job)
+    
+    if jobs:
+        background_tasks.add_task(_run_batch_predictions, jobs)
+    logger.info(f"Ingested {len(cases)} of {len(records)} patient blocks, {len(jobs)} predictions queued")
+    return BatchIngestResponse(cases=cases, errors=errors)
+
+
 @app.post("/api/predict", response_model=PredictionResponse)
 async def create_prediction_endpoint(input: ClinicalInput):
     """
@@ -263,6 +611,9 @@ async def create_prediction_endpoint(input: ClinicalInput):
             hematology=input.hematology,
             microbiology=input.microbiology,
             medication=input.medication,
+            search_document=build_case_search_document(
+                patient, input.clinical_text, input.pac_id
+            ),
         )
         
         # Run prediction (without patient context)
@@ -360,22 +711,31 @@ async def get_cases(
     page: int = Query(1, ge=1),
     limit: int = Query(20, ge=1, le=100),
     search: str = Query(None),
+    cursor: str = Query(None, description="next_cursor of the previous page (keyset pagination)"),
+    include_total: bool = Query(None, description="Count all matches; defaults to true for page numbers, false for cursors"),
 ):
     """List all cases with pagination and search"""
     try:
-        result = await list_cases(page=page, limit=limit, search=search)
+        result = await list_cases(
+            page=page,
+            limit=limit,
+            search=search,
+            cursor=cursor,
+            with_total=_with_total(include_total, cursor),
+        )
         
         cases = [
-            CaseResponse(
-                id=case.id,
-                pac_id=case.pacId,
-                clinical_text=case.clinicalText,
-                biochemistry=case.biochemistry,
-                hematology=case.hematology,
-                microbiology=case.microbiology,
-                medication=case.medication,
-                created_at=case.createdAt,
-                predictions_count=len(case.predictions),
+            CaseListItem(
+                id=case["id"],
+                pac_id=case["pacId"],
+                patient_id=case["patientId"],
+                first_name=case["firstName"],
+                last_name=case["lastName"],
+                admission_date=case["admissionDate"],
+                discharge_date=case["dischargeDate"],
+                clinical_text_preview=case["clinicalPreview"] or "",
+                created_at=case["createdAt"],
+                predictions_count=case["predictionsCount"],
             )
             for case in result["cases"]
         ]
@@ -385,8 +745,11 @@ async def get_cases(
             total=result["total"],
             page=result["page"],
             pages=result["pages"],
+            next_cursor=result["next_cursor"],
         )
         
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error listing cases: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -401,6 +764,8 @@ async def get_case_detail(case_id: str):
         if not case:
             raise HTTPException(status_code=404, detail="Case not found")
         
+        sections = await load_case_sections(case)
+        
         predictions = [
             {
                 "id": pred.id,
@@ -421,10 +786,7 @@ async def get_case_detail(case_id: str):
             "admission_date": case.admissionDate,
             "discharge_date": case.dischargeDate,
             "clinical_text": case.clinicalText,
-            "biochemistry": case.biochemistry,
-            "hematology": case.hematology,
-            "microbiology": case.microbiology,
-            "medication": case.medication,
+            **sections,
             "created_at": case.createdAt,
             "predictions_count": len(predictions),
             "predictions": predictions,
@@ -453,40 +815,51 @@ async def get_predictions(
     limit: int = Query(20, ge=1, le=100),
     case_id: str = Query(None),
     validated: bool = Query(None),
+    cursor: str = Query(None, description="next_cursor of the previous page (keyset pagination)"),
+    include_total: bool = Query(None, description="Count all matches; defaults to true for page numbers, false for cursors"),
+    all_time: bool = Query(False, description="Include predictions older than RECENT_PREDICTIONS_DAYS"),
 ):
-    """List predictions with filters and nested case/patient data"""
+    """
+    List predictions with filters and nested patient summary
+    
+    Only recent predictions are listed unless all_time is set or the
+    listing is for one case.
+    """
     try:
         result = await list_predictions(
             page=page,
             limit=limit,
             case_id=case_id,
             validated=validated,
+            cursor=cursor,
+            with_total=_with_total(include_total, cursor),
+            since=_recent_since(all_time or bool(case_id)),
         )
         
         predictions = [
             {
-                "id": pred.id,
-                "case_id": pred.caseId,
-                "pac_id": pred.case.pacId if pred.case else None,
-                "main_code": pred.mainCode,
-                "main_name": pred.mainName,
-                "main_confidence": pred.mainConfidence,
-                "secondary_codes": pred.secondaryCodes if pred.secondaryCodes else [],
-                "validated": pred.validated,
-                "feedback_type": pred.feedbackType,
-                "corrected": pred.corrected,  # Include corrected flag for badge
-                "status": pred.status,  # Include status field
-                "created_at": pred.createdAt,
+                "id": pred["id"],
+                "case_id": pred["caseId"],
+                "pac_id": pred["pacId"],
+                "main_code": pred["mainCode"],
+                "main_name": pred["mainName"],
+                "main_confidence": pred["mainConfidence"],
+                "secondary_codes": pred["secondaryCodes"] if pred["secondaryCodes"] else [],
+                "validated": pred["validated"],
+                "feedback_type": pred["feedbackType"],
+                "corrected": pred["corrected"],  # Include corrected flag for badge
+                "status": pred["status"],  # Include status field
+                "created_at": pred["createdAt"],
                 "case": {
-                    "id": pred.case.id if pred.case else None,
+                    "id": pred["caseId"],
                     "patient": {
-                        "id": pred.case.patient.id,
-                        "first_name": pred.case.patient.firstName,
-                        "last_name": pred.case.patient.lastName,
-                        "date_of_birth": pred.case.patient.dateOfBirth,
-                        "sex": pred.case.patient.sex,
-                    } if pred.case and pred.case.patient else None
-                } if pred.case else None
+                        "id": pred["patientId"],
+                        "first_name": pred["firstName"],
+                        "last_name": pred["lastName"],
+                        "date_of_birth": pred["dateOfBirth"],
+                        "sex": pred["sex"],
+                    },
+                },
             }
             for pred in result["predictions"]
         ]
@@ -496,8 +869,11 @@ async def get_predictions(
             "total": result["total"],
             "page": result["page"],
             "pages": result["pages"],
+            "next_cursor": result["next_cursor"],
         }
         
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error listing predictions: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -507,77 +883,65 @@ async def get_predictions(
 async def get_prediction_detail(prediction_id: str):
     """Get prediction details with nested case and patient data"""
     try:
-        pred = await get_prediction(prediction_id)
+        pred = await get_prediction_with_case(prediction_id)
         
         if not pred:
             raise HTTPException(status_code=404, detail="Prediction not found")
         
-        # Parse JSON fields
-        import json
-        secondary_diagnoses = pred.secondaryCodes
-        if isinstance(secondary_diagnoses, str):
-            secondary_diagnoses = json.loads(secondary_diagnoses)
+        case_sections = await load_case_sections(pred)
         
         # Handle original fields if corrected
         original_main_diagnosis = None
         original_secondary_diagnoses = None
         
-        if pred.corrected and pred.originalMainCode:
+        if pred["corrected"] and pred["originalMainCode"]:
             original_main_diagnosis = {
-                "code": pred.originalMainCode,
-                "name": pred.originalMainName,
-                "confidence": pred.originalMainConfidence,
+                "code": pred["originalMainCode"],
+                "name": pred["originalMainName"],
+                "confidence": pred["originalMainConfidence"],
             }
             
-            if pred.originalSecondaryCodes:
-                original_secondary = pred.originalSecondaryCodes
-                if isinstance(original_secondary, str):
-                    original_secondary_diagnoses = json.loads(original_secondary)
-                else:
-                    original_secondary_diagnoses = original_secondary
+            original_secondary_diagnoses = pred["originalSecondaryCodes"]
         
         return {
-            "prediction_id": pred.id,
-            "case_id": pred.caseId,
-            "pac_id": pred.case.pacId if pred.case else None,
-            "selected_codes": pred.selectedCodes,
-            "step1_reasoning": pred.step1Reasoning or "",
+            "prediction_id": pred["id"],
+            "case_id": pred["caseId"],
+            "pac_id": pred["pacId"],
+            "selected_codes": pred["selectedCodes"],
+            "step1_reasoning": pred["step1Reasoning"] or "",
             "main_diagnosis": {
-                "code": pred.mainCode,
-                "name": pred.mainName,
-                "confidence": pred.mainConfidence,
-                "reasoning": pred.mainReasoning,
+                "code": pred["mainCode"],
+                "name": pred["mainName"],
+                "confidence": pred["mainConfidence"],
+                "reasoning": pred["mainReasoning"],
             },
-            "secondary_diagnoses": secondary_diagnoses,
+            "secondary_diagnoses": pred["secondaryCodes"],
             "original_main_diagnosis": original_main_diagnosis,
             "original_secondary_diagnoses": original_secondary_diagnoses,
-            "model_used": pred.modelUsed,
-            "processing_time": pred.processingTime,
-            "validated": pred.validated,
-            "validated_at": pred.validatedAt,
-            "validated_by": pred.validatedBy,
-            "feedback_type": pred.feedbackType,
-            "corrected": pred.corrected,
-            "corrected_at": pred.correctedAt,
-            "feedback_comment": pred.feedbackComment,
-            "corrections": pred.corrections,
-            "created_at": pred.createdAt,
+            "model_used": pred["modelUsed"],
+            "processing_time": pred["processingTime"],
+            "validated": pred["validated"],
+            "validated_at": pred["validatedAt"],
+            "validated_by": pred["validatedBy"],
+            "feedback_type": pred["feedbackType"],
+            "corrected": pred["corrected"],
+            "corrected_at": pred["correctedAt"],
+            "feedback_comment": pred["feedbackComment"],
+            "corrections": pred["corrections"],
+            "created_at": pred["createdAt"],
             "case": {
-                "id": pred.case.id,
-                "clinical_text": pred.case.clinicalText,
-                "biochemistry": pred.case.biochemistry,
-                "hematology": pred.case.hematology,
-                "microbiology": pred.case.microbiology,
-                "medication": pred.case.medication,
+                "id": pred["caseId"],
+                "clinical_text": pred["clinicalText"],
+                **case_sections,
                 "patient": {
-                    "id": pred.case.patient.id,
-                    "first_name": pred.case.patient.firstName,
-                    "last_name": pred.case.patient.lastName,
-                    "date_of_birth": pred.case.patient.dateOfBirth,
-                    "sex": pred.case.patient.sex,
-                    "birth_number": pred.case.patient.birthNumber,
-                } if pred.case.patient else None
-            } if pred.case else None
+                    "id": pred["patientId"],
+                    "first_name": pred["firstName"],
+                    "last_name": pred["lastName"],
+                    "date_of_birth": pred["dateOfBirth"],
+                    "sex": pred["sex"],
+                    "birth_number": pred["birthNumber"],
+                },
+            },
         }
         
     except HTTPException:
@@ -610,6 +974,8 @@ async def submit_feedback_endpoint(
         
         # Get current prediction
         prediction = await get_prediction(prediction_id)
+        if not prediction:
+            raise HTTPException(status_code=404, detail="Prediction not found")
         
         # Build corrections object for detailed change tracking
         corrections_detail = None
@@ -626,29 +992,10 @@ async def submit_feedback_endpoint(
         if feedback.feedback_type == "rejected" and (feedback.corrected_main_code or feedback.corrected_secondary):
             logger.info(f"Applying corrections to prediction {prediction_id}")
             
-            # Get prediction data - handle both dict and Prisma model
-            import json
-            
-            if isinstance(prediction, dict):
-                # Already a dict from get_prediction
-                main_code = prediction["main_diagnosis"]["code"]
-                main_name = prediction["main_diagnosis"]["name"]
-                main_confidence = prediction["main_diagnosis"]["confidence"]
-                original_secondary = prediction.get("secondary_diagnoses", [])
-            else:
-                # Prisma model object - use direct attribute access
-                main_code = prediction.mainCode
-                main_name = prediction.mainName
-                main_confidence = prediction.mainConfidence
-                
-                # Parse secondary codes JSON
-                secondary_data = prediction.secondaryCodes
-                if isinstance(secondary_data, str):
-                    original_secondary = json.loads(secondary_data)
-                elif isinstance(secondary_data, list):
-                    original_secondary = secondary_data
-                else:
-                    original_secondary = []
+            main_code = prediction.mainCode
+            main_name = prediction.mainName
+            main_confidence = prediction.mainConfidence
+            original_secondary = prediction.secondaryCodes or []
             
             # Build corrected secondary codes
             # If no corrections provided, keep the original secondary codes
@@ -667,31 +1014,52 @@ async def submit_feedback_endpoint(
             final_main_name = feedback.corrected_main_name if feedback.corrected_main_code else main_name
             
             # Update prediction: corrections become current, original preserved
-            pred = await db.prediction.update(
-                where={"id": prediction_id},
-                data={
-                    # Preserve original AI prediction
-                    "originalMainCode": main_code,
-                    "originalMainName": main_name,
-                    "originalMainConfidence": main_confidence,
-                    "originalSecondaryCodes": json.dumps(original_secondary),  # Must be JSON string
-                    
-                    # Update current with corrections (or keep original if not corrected)
-                    "mainCode": final_main_code,
-                    "mainName": final_main_name,
-                    "secondaryCodes": json.dumps(corrected_secondary_list),  # Must be JSON string
-                    
-                    # Metadata
-                    "corrected": True,
-                    "correctedAt": datetime.now(),
-                    "validated": True,
-                    "validatedAt": datetime.now(),
-                    "validatedBy": feedback.validated_by,
-                    "feedbackType": feedback.feedback_type,
-                    "corrections": json.dumps(corrections_detail) if corrections_detail else None,  # Must be JSON string
-                    "feedbackComment": feedback.feedback_comment,
-                }
-            )
+            async with db.tx() as tx:
+                # Code statistics count a prediction's first review only
+                first_review = await lock_for_first_review(prediction_id, tx)
+                pred = await update_prediction(
+                    prediction_id,
+                    {
+                        # Preserve original AI prediction
+                        "originalMainCode": main_code,
+                        "originalMainName": main_name,
+                        "originalMainConfidence": main_confidence,
+                        "originalSecondaryCodes": Json(original_secondary),
+                        
+                        # Update current with corrections (or keep original if not corrected)
+                        "mainCode": final_main_code,
+                        "mainName": final_main_name,
+                        "secondaryCodes": Json(corrected_secondary_list),
+                        
+                        # Metadata
+                        "corrected": True,
+                        "correctedAt": datetime.now(),
+                        "validated": True,
+                        "validatedAt": datetime.now(),
+                        "validatedBy": feedback.validated_by,
+                        "feedbackType": feedback.feedback_type,
+                        "corrections": Json(corrections_detail) if corrections_detail else None,
+                        "feedbackComment": feedback.feedback_comment,
+                    },
+                    client=tx,
+                )
+                await sync_prediction_codes(
+                    prediction_id,
+                    final_main_code,
+                    None if feedback.corrected_main_code else main_confidence,
+                    corrected_secondary_list,
+                    client=tx,
+                )
+                if first_review:
+                    await add_code_stats(
+                        prediction.modelUsed,
+                        feedback_stat_deltas(
+                            main_code, original_secondary,
+                            final_main_code, corrected_secondary_list,
+                            feedback.feedback_type,
+                        ),
+                        client=tx,
+                    )
             
             # Log what was corrected
             if feedback.corrected_main_code:
@@ -701,13 +1069,26 @@ async def submit_feedback_endpoint(
         
         else:
             # Approved or rejected without corrections - use existing function
-            pred = await submit_prediction_feedback(
-                prediction_id=prediction_id,
-                validated_by=feedback.validated_by,
-                feedback_type=feedback.feedback_type,
-                corrections=corrections_detail,
-                feedback_comment=feedback.feedback_comment,
-            )
+            async with db.tx() as tx:
+                first_review = await lock_for_first_review(prediction_id, tx)
+                pred = await submit_prediction_feedback(
+                    prediction_id=prediction_id,
+                    validated_by=feedback.validated_by,
+                    feedback_type=feedback.feedback_type,
+                    corrections=corrections_detail,
+                    feedback_comment=feedback.feedback_comment,
+                    client=tx,
+                )
+                if first_review:
+                    await add_code_stats(
+                        prediction.modelUsed,
+                        feedback_stat_deltas(
+                            prediction.mainCode, prediction.secondaryCodes,
+                            prediction.mainCode, prediction.secondaryCodes,
+                            feedback.feedback_type,
+                        ),
+                        client=tx,
+                    )
         
         return {
             "id": pred.id,
@@ -725,6 +1106,65 @@ async def submit_feedback_endpoint(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+# ===== STATS =====
+
+@app.get("/api/stats/codes", response_model=List[CodeStatsItem])
+async def get_code_statistics(
+    model: str = Query(None, description="Only predictions of this model; summed over all models if omitted"),
+    code: str = Query(None),
+    role: Literal["main", "secondary"] = Query(None),
+    sort: Literal["predicted", "approved", "corrected_away", "added_by_coder"] = Query("corrected_away"),
+    limit: int = Query(50, ge=1, le=500),
+):
+    """
+    Per-code prediction and review statistics
+    
+    Shows which codes the model predicts, which coders keep, which they
+    correct away and which they add. Served from the incrementally
+    maintained code_stats table.
+    """
+    try:
+        rows = await get_code_stats(model_used=model, code=code, role=role, sort=sort, limit=limit)
+        
+        stats = []
+        for row in rows:
+            reviewed = row["approved"] + row["correctedAway"]
+            stats.append(
+                CodeStatsItem(
+                    code=row["code"],
+                    name=row["name"],
+                    role=row["role"],
+                    model_used=row["modelUsed"],
+                    predicted=row["predicted"],
+                    approved=row["approved"],
+                    corrected_away=row["correctedAway"],
+                    added_by_coder=row["addedByCoder"],
+                    correction_rate=row["correctedAway"] / reviewed if reviewed else None,
+                )
+            )
+        return stats
+        
+    except Exception as e:
+        logger.error(f"Error getting code statistics: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/api/stats/event-loop")
+async def get_event_loop_stats():
+    """
+    Event loop blocked time per route since startup
+    
+    Each lagging tick of the loop monitor is charged to every route with a
+    request in flight; a route that collects far more blocked time than
+    its request volume suggests runs synchronous work on the loop.
+    """
+    return {
+        "interval_ms": settings.LOOP_LAG_INTERVAL_MS,
+        "cpu_pool": settings.CPU_POOL,
+        "routes": loop_lag_stats(),
+    }
+
+
 # ===== CODE SEARCH =====
 
 @app.get("/api/codes/search", response_model=List[CodeSearchResult])
@@ -773,11 +1213,16 @@ async def get_code_details(
     code: str,
     page: int = Query(1, ge=1),
     limit: int = Query(20, ge=1, le=100),
+    cursor: str = Query(None, description="next_cursor of the previous page (keyset pagination)"),
+    include_total: bool = Query(None, description="Count all matches; defaults to true for page numbers, false for cursors"),
+    all_time: bool = Query(False, description="Include predictions older than RECENT_PREDICTIONS_DAYS"),
 ):
     """
     Get diagnosis code details with all predictions that use this code
     
-    Shows where this code appears as either main or secondary diagnosis
+    Shows where this code appears as either main or secondary diagnosis.
+    Usage counts cover all time; the listing only recent predictions
+    unless all_time is set.
     """
     try:
         # Get code details
@@ -786,36 +1231,49 @@ async def get_code_details(
             raise HTTPException(status_code=404, detail="Diagnosis code not found")
         
         # Get all predictions using this code
-        result = await get_predictions_by_code(code, page=page, limit=limit)
+        result = await get_predictions_by_code(
+            code,
+            page=page,
+            limit=limit,
+            cursor=cursor,
+            with_total=_with_total(include_total, cursor),
+            since=_recent_since(all_time),
+        )
+        usage = await get_code_usage(code)
         
         predictions = [
             PredictionListItem(
-                id=pred.id,
-                case_id=pred.caseId,
-                pac_id=pred.case.pacId if pred.case else None,
-                main_code=pred.mainCode,
-                main_name=pred.mainName,
-                main_confidence=pred.mainConfidence,
-                validated=pred.validated,
-                created_at=pred.createdAt,
+                id=pred["id"],
+                case_id=pred["caseId"],
+                pac_id=pred["pacId"],
+                main_code=pred["mainCode"],
+                main_name=pred["mainName"],
+                main_confidence=pred["mainConfidence"],
+                validated=pred["validated"],
+                created_at=pred["createdAt"],
             )
             for pred in result["predictions"]
         ]
         
         return CodeDetailResponse(
-            code=code_obj.code,
-            name=code_obj.name,
-            chapter=code_obj.chapter,
-            category=code_obj.category,
-            usage_count=result["total"],
+            code=code_obj["code"],
+            name=code_obj["name"],
+            chapter=code_obj["chapter"],
+            category=code_obj["category"],
+            usage_count=usage["predictions"],
+            main_count=usage["main"],
+            secondary_count=usage["secondary"],
             predictions=predictions,
             total_predictions=result["total"],
             page=result["page"],
             pages=result["pages"],
+            next_cursor=result["next_cursor"],
         )
         
     except HTTPException:
         raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error getting code details: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -80,6 +80,27 @@ class PredictionResponse(BaseModel):
     created_at: datetime
 
 
+class BatchCaseItem(BaseModel):
+    """One patient block of a multi-patient XML upload"""
+    index: int  # position of the block in the document
+    pac_id: Optional[str]
+    case_id: str
+    prediction_id: Optional[str]  # None until a re-run of a stored case starts
+    status: str  # queued, processing or completed
+
+
+class BatchIngestError(BaseModel):
+    """Patient block that could not be ingested"""
+    index: int
+    detail: str
+
+
+class BatchIngestResponse(BaseModel):
+    """Result of a multi-patient XML upload"""
+    cases: List[BatchCaseItem]
+    errors: List[BatchIngestError] = []
+
+
 class CaseResponse(BaseModel):
     """Patient case response"""
     id: str
@@ -98,12 +119,27 @@ class CaseDetailResponse(CaseResponse):
     predictions: List[PredictionResponse]
 
 
+class CaseListItem(BaseModel):
+    """Case in list view (no lab sections, clinical text truncated)"""
+    id: str
+    pac_id: Optional[str]
+    patient_id: str
+    first_name: Optional[str]
+    last_name: Optional[str]
+    admission_date: Optional[datetime]
+    discharge_date: Optional[datetime]
+    clinical_text_preview: str
+    created_at: datetime
+    predictions_count: int
+
+
 class PaginatedCases(BaseModel):
     """Paginated cases"""
-    cases: List[CaseResponse]
-    total: int
+    cases: List[CaseListItem]
+    total: Optional[int]  # None when the count was skipped
     page: int
-    pages: int
+    pages: Optional[int]
+    next_cursor: Optional[str] = None  # Pass as ?cursor= for the next page
 
 
 class PredictionListItem(BaseModel):
@@ -121,9 +157,10 @@ class PredictionListItem(BaseModel):
 class PaginatedPredictions(BaseModel):
     """Paginated predictions"""
     predictions: List[PredictionListItem]
-    total: int
+    total: Optional[int]  # None when the count was skipped
     page: int
-    pages: int
+    pages: Optional[int]
+    next_cursor: Optional[str] = None  # Pass as ?cursor= for the next page
 
 
 class CodeSearchResult(BaseModel):
@@ -140,11 +177,27 @@ class CodeDetailResponse(BaseModel):
     name: str
     chapter: str
     category: Optional[str]
-    usage_count: int  # How many times this code appears
+    usage_count: int  # How many predictions use this code (either role)
+    main_count: int  # ...as main diagnosis
+    secondary_count: int  # ...as secondary diagnosis
     predictions: List[PredictionListItem]
-    total_predictions: int
+    total_predictions: Optional[int]
     page: int
-    pages: int
+    pages: Optional[int]
+    next_cursor: Optional[str] = None  # Pass as ?cursor= for the next page
+
+
+class CodeStatsItem(BaseModel):
+    """Prediction and review counts for one code in one role"""
+    code: str
+    name: Optional[str]
+    role: str  # "main" or "secondary"
+    model_used: Optional[str]  # None when summed over all models
+    predicted: int  # Times the model predicted it
+    approved: int  # ...and a coder kept it
+    corrected_away: int  # ...and a coder removed or replaced it
+    added_by_coder: int  # Times a coder added it although the model didn't predict it
+    correction_rate: Optional[float]  # corrected_away / reviewed predictions, None if never reviewed
 
 
 class HealthResponse(BaseModel):
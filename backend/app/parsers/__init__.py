@@ -1,4 +1,18 @@
 """XML parsing utilities"""
-from .xml_parser import parse_medical_xml, ParsedMedicalData
+from .xml_parser import (
+    parse_medical_xml,
+    build_parsed_data,
+    extract_structured,
+    iter_patient_records,
+    extract_patient_records,
+    ParsedMedicalData,
+)
 
-__all__ = ['parse_medical_xml', 'ParsedMedicalData']
+__all__ = [
+    'parse_medical_xml',
+    'build_parsed_data',
+    'extract_structured',
+    'iter_patient_records',
+    'extract_patient_records',
+    'ParsedMedicalData',
+]
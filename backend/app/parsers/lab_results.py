@@ -0,0 +1,389 @@
+"""
+Structured lab results and a compact summary for prompts
+
+Parses the pipe-separated biochemistry and hematology sections
+("11.01.2025: NA 143.0 mmol/L | KA 5.27 mmol/L | ... | ČAS_MĚŘ. 10:30")
+into typed results, then summarizes only what matters for coding:
+values outside the reference range and values that moved markedly
+during the stay. The discharge summaries carry no reference ranges, so
+approximate adult ranges are kept here per analyte and unit; results in
+a unit other than the one listed are not judged.
+"""
+
+import re
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from app.parsers.lab_sections import LAB_META_FIELDS
+
+
+class ReferenceRange(NamedTuple):
+    unit: str
+    low: Optional[float]
+    high: Optional[float]
+    # Female range where it differs
+    female_low: Optional[float] = None
+    female_high: Optional[float] = None
+
+    def bounds(self, sex: Optional[str]) -> Tuple[Optional[float], Optional[float]]:
+        if sex == 'F' and (self.female_low is not None or self.female_high is not None):
+            return self.female_low, self.female_high
+        return self.low, self.high
+
+
+# Approximate adult reference ranges in the units the labs report
+REFERENCE_RANGES: Dict[str, Tuple[ReferenceRange, ...]] = {
+    # Electrolytes, kidney, glucose
+    'NA': (ReferenceRange('mmol/L', 136, 146),),
+    'SODIK': (ReferenceRange('mmol/L', 136, 146),),
+    'KA': (ReferenceRange('mmol/L', 3.8, 5.1),),
+    'CL': (ReferenceRange('mmol/L', 97, 108),),
+    'CA': (ReferenceRange('mmol/L', 2.0, 2.75),),
+    'CA-KOR': (ReferenceRange('mmol/L', 2.0, 2.75),),
+    'CAI': (ReferenceRange('mmol/L', 1.15, 1.29),),
+    'MG': (ReferenceRange('mmol/L', 0.66, 0.94),),
+    'PA': (ReferenceRange('mmol/L', 0.65, 1.61),),
+    'GL': (ReferenceRange('mmol/L', 3.6, 5.6),),
+    'MO': (ReferenceRange('mmol/L', 2.8, 8.0),),
+    'KR': (ReferenceRange('umol/l', 64, 104, 49, 90),),
+    'GFR': (ReferenceRange('ml/s/1,73 m2', 1.5, None),),
+    'KM': (ReferenceRange('umol/l', 202, 417, 143, 339),),
+    'PLAC': (ReferenceRange('mmol/L', 0.5, 2.2),),
+    # Liver, pancreas, proteins
+    'BI': (ReferenceRange('umol/l', 2, 17),),
+    'BP': (ReferenceRange('umol/l', 0, 5),),
+    'AL': (ReferenceRange('ukat/l', 0.1, 0.78, 0.1, 0.56),),
+    'AS': (ReferenceRange('ukat/l', 0.1, 0.72, 0.1, 0.6),),
+    'GM': (ReferenceRange('ukat/l', 0.14, 0.84, 0.14, 0.68),),
+    'AF': (ReferenceRange('ukat/l', 0.66, 2.2),),
+    'AM': (ReferenceRange('ukat/l', 0.47, 1.67),),
+    'LIP': (ReferenceRange('ukat/l', 0.13, 1.0),),
+    'AB': (ReferenceRange('g/L', 35, 53),),
+    'CB': (ReferenceRange('g/L', 65, 85),),
+    'PREA': (ReferenceRange('g/L', 0.2, 0.4),),
+    # Lipids
+    'CH': (ReferenceRange('mmol/L', 2.9, 5.0),),
+    'HDL': (ReferenceRange('mmol/L', 1.0, None, 1.2, None),),
+    'LDL': (ReferenceRange('mmol/L', 1.2, 3.0),),
+    'TR': (ReferenceRange('mmol/L', 0.45, 1.7),),
+    # Inflammation, cardiac, muscle
+    'CRP': (ReferenceRange('mg/L', 0, 5),),
+    'PCT': (ReferenceRange('ug/l', 0, 0.5), ReferenceRange('%', 0.15, 0.4)),
+    'IL6': (ReferenceRange('ng/L', 0, 7),),
+    'BNP': (ReferenceRange('ng/L', 0, 100),),
+    'NTBNP': (ReferenceRange('ng/L', 0, 125),),
+    'TNI': (ReferenceRange('ng/L', 0, 34, 0, 16),),
+    'MYO': (ReferenceRange('ug/l', 28, 72, 25, 58),),
+    'CKMBM': (ReferenceRange('ug/l', 0, 4.9),),
+    'CK': (ReferenceRange('ukat/l', 0.4, 3.2, 0.4, 2.85),),
+    # Thyroid
+    'TSH': (ReferenceRange('mU/L', 0.27, 4.2),),
+    'FT3': (ReferenceRange('pmol/L', 3.1, 6.8),),
+    'FT4': (ReferenceRange('pmol/L', 12, 22),),
+    # Blood gases
+    'KPH': (ReferenceRange('-', 7.36, 7.44),),
+    'KPC': (ReferenceRange('kPa', 4.8, 5.9),),
+    'KPO': (ReferenceRange('kPa', 10, 13.3),),
+    'KAC': (ReferenceRange('mmol/L', 22, 26),),
+    'KSC': (ReferenceRange('mmol/L', 22, 26),),
+    'KBE': (ReferenceRange('mmol/L', -2.5, 2.5),),
+    'KSB': (ReferenceRange('mmol/L', -2.5, 2.5),),
+    'KSA': (ReferenceRange('%', 95, 99),),
+    # Blood count
+    'WBC': (ReferenceRange('x10^9/L', 4, 10),),
+    'RBC': (ReferenceRange('x10^12/L', 4.0, 5.8, 3.8, 5.2),),
+    'HGB': (ReferenceRange('g/L', 135, 175, 120, 160),),
+    'HCT': (ReferenceRange('%', 40, 50, 35, 47),),
+    'MCV': (ReferenceRange('fL', 82, 98),),
+    'MCH': (ReferenceRange('pg', 28, 34),),
+    'MCHC': (ReferenceRange('g/L', 320, 360),),
+    'PLT': (ReferenceRange('x10^9/L', 150, 400),),
+    'RDW': (ReferenceRange('%', 10, 15.2),),
+    'NEABS': (ReferenceRange('x10^9/L', 2.0, 7.0),),
+    'LYABS': (ReferenceRange('x10^9/L', 0.8, 4.0),),
+    # Coagulation
+    'APTT-T': (ReferenceRange('s', 25, 40),),
+    'APTT-R': (ReferenceRange('1', 0.8, 1.2),),
+    'PT-INR': (ReferenceRange('1', 0.8, 1.2),),
+    'PT-R': (ReferenceRange('1', 0.8, 1.2),),
+    'FIB': (ReferenceRange('g/L', 1.8, 4.2),),
+    'DDI': (ReferenceRange('mg/L FEU', 0, 0.5),),
+    'AT': (ReferenceRange('%', 80, 120),),
+}
+
+# First-to-last change that counts as a trend, as a share of the reference
+# range width (or of the single bound for one-sided ranges)
+TREND_MIN_CHANGE = 0.5
+
+# Values listed per analyte in the summary (first, most extreme, last)
+SUMMARY_MAX_VALUES = 3
+
+_DATE_MARKER = re.compile(r'(\d{1,2})\.(\d{1,2})\.(\d{4}):')
+_TIME = re.compile(r'(?<![\d.])(\d{1,2}):(\d{2})(?!\d)')
+_VALUE = re.compile(r'^(?P<comparator>[<>])?\s*(?P<value>-?\d+(?:[.,]\d+)?)\s*(?P<unit>.*)$')
+_MEASURED_AT = 'ČAS_MĚŘ.'
+
+
+@dataclass
+class LabResult:
+    """One analyte result from a lab section"""
+    section: str
+    analyte: str
+    text: str
+    value: Optional[float] = None
+    comparator: Optional[str] = None
+    unit: Optional[str] = None
+    taken_at: Optional[datetime] = None
+
+    @property
+    def is_numeric(self) -> bool:
+        return self.value is not None
+
+
+def _reference(result: LabResult) -> Optional[ReferenceRange]:
+    """Reference range whose unit matches the result's (any, if no unit given)"""
+    ranges = REFERENCE_RANGES.get(result.analyte, ())
+    if not result.unit:
+        return ranges[0] if len(ranges) == 1 else None
+    unit = result.unit.lower().replace(' ', '')
+    for reference in ranges:
+        if reference.unit.lower().replace(' ', '') == unit:
+            return reference
+    return None
+
+
+def flag(result: LabResult, sex: Optional[str] = None) -> Optional[str]:
+    """'H' above, 'L' below the reference range, None if normal or unknown"""
+    reference = _reference(result) if result.is_numeric else None
+    if reference is None:
+        return None
+    low, high = reference.bounds(sex)
+    value, comparator = result.value, result.comparator
+    if high is not None and value > high and comparator != '<':
+        return 'H'
+    if high is not None and value >= high and comparator == '>':
+        return 'H'
+    if low is not None and value < low and comparator != '>':
+        return 'L'
+    if low is not None and value <= low and comparator == '<':
+        return 'L'
+    return None
+
+
+def _parse_segment(section: str, segment: str, taken_at: Optional[datetime]) -> Optional[LabResult]:
+    tokens = segment.split(None, 1)
+    if not tokens:
+        return None
+    analyte = tokens[0].upper()
+    rest = tokens[1].strip() if len(tokens) > 1 else ''
+    result = LabResult(section=section, analyte=analyte, text=rest, taken_at=taken_at)
+    match = _VALUE.match(rest)
+    if match:
+        result.value = float(match.group('value').replace(',', '.'))
+        result.comparator = match.group('comparator')
+        result.unit = match.group('unit').strip() or None
+    return result
+
+
+def parse_lab_results(text: Optional[str], section: str) -> List[LabResult]:
+    """
+    Parse one lab section into results, in the order they appear
+
+    Dates ("11.01.2025:") start a panel; a "ČAS_MĚŘ. 10:28" field or a
+    time at the start of a line sets the panel's time of measurement.
+    Meta fields (comments, sample type) are skipped; non-numeric results
+    ("dodáme", "zakaleno") are kept with value None.
+    """
+    results: List[LabResult] = []
+    if not text:
+        return results
+
+    day: Optional[datetime] = None
+    panel: List[LabResult] = []
+
+    def set_time(hour: int, minute: int):
+        for result in panel:
+            if result.taken_at is not None:
+                result.taken_at = result.taken_at.replace(hour=hour, minute=minute)
+
+    for line in text.splitlines():
+        position = 0
+        pieces = []
+        for match in _DATE_MARKER.finditer(line):
+            pieces.append((line[position:match.start()], None))
+            day_, month, year = map(int, match.groups())
+            try:
+                pieces.append(('', datetime(year, month, day_)))
+            except ValueError:
+                pieces.append(('', None))
+            position = match.end()
+        pieces.append((line[position:], None))
+
+        for chunk, new_day in pieces:
+            if new_day is not None:
+                day, panel = new_day, []
+                continue
+            for segment in chunk.split('|'):
+                segment = segment.strip()
+                if not segment:
+                    continue
+                if segment.upper().startswith(_MEASURED_AT):
+                    time_match = _TIME.search(segment)
+                    if time_match:
+                        set_time(*map(int, time_match.groups()))
+                    continue
+                time_match = _TIME.fullmatch(segment)
+                if time_match:
+                    # Time of the measurements that follow ("12:08| KPH ...")
+                    panel = []
+                    if day is not None:
+                        day = day.replace(hour=int(time_match.group(1)), minute=int(time_match.group(2)))
+                    continue
+                result = _parse_segment(section, segment, day)
+                if result is None or result.analyte in LAB_META_FIELDS or result.analyte.endswith(':'):
+                    continue
+                results.append(result)
+                panel.append(result)
+    return results
+
+
+def _format_value(result: LabResult) -> str:
+    value = f"{result.value:g}"
+    return f"{result.comparator}{value}" if result.comparator else value
+
+
+def _is_trend(values: List[LabResult], reference: Optional[ReferenceRange], sex: Optional[str]) -> bool:
+    """Marked first-to-last change; only judged for analytes with a reference range"""
+    if len(values) < 2 or reference is None:
+        return False
+    low, high = reference.bounds(sex)
+    scale = (high - low) if low is not None and high is not None else abs(low if low is not None else high)
+    return bool(scale) and abs(values[-1].value - values[0].value) >= TREND_MIN_CHANGE * scale
+
+
+def _format_reference(reference: ReferenceRange, sex: Optional[str]) -> str:
+    low, high = reference.bounds(sex)
+    if low is not None and high is not None:
+        return f"{low:g}–{high:g}"
+    return f">{low:g}" if low is not None else f"<{high:g}"
+
+
+def _leading_lines(text: str, max_chars: int) -> str:
+    """As many whole leading lines of text as fit in max_chars"""
+    kept = []
+    length = 0
+    for line in text.splitlines():
+        length += len(line) + bool(kept)
+        if length > max_chars:
+            break
+        kept.append(line)
+    return '\n'.join(kept)
+
+
+def summarize_lab_results(
+    results: List[LabResult],
+    patient_age: Optional[int] = None,
+    patient_sex: Optional[str] = None,
+    max_chars: Optional[int] = None,
+) -> str:
+    """
+    Compact text of abnormal and trending results, one line per analyte
+
+    "GL 6.56→18.31→9.68↑ mmol/L [3.6–5.6] 11.01.–12.01." lists the first,
+    the most extreme and the last value, the reference range and, when
+    they span several days, the dates. Analytes with only normal, stable
+    values are counted, not listed. Returns "" when there are no numeric
+    results.
+
+    With max_chars, whole analyte lines are left out until the summary
+    fits: trends within the reference range first, then values outside
+    it from the last one back. The number left out is stated.
+    """
+    by_analyte: Dict[str, List[LabResult]] = {}
+    for result in results:
+        if result.is_numeric:
+            by_analyte.setdefault(result.analyte, []).append(result)
+    if not by_analyte:
+        return ""
+
+    lines = []
+    abnormal = []
+    normal = 0
+    for analyte, values in by_analyte.items():
+        reference = _reference(values[-1])
+        flags = {flag(result, patient_sex) for result in values} - {None}
+        if not flags and not _is_trend(values, reference, patient_sex):
+            normal += 1
+            continue
+
+        shown = [values[0]]
+        if len(values) > 2:
+            extreme = min if flags == {'L'} else max
+            shown.append(extreme(values[1:-1], key=lambda result: result.value))
+        if len(values) > 1:
+            shown.append(values[-1])
+
+        line = f"{analyte} {'→'.join(_format_value(result) for result in shown[:SUMMARY_MAX_VALUES])}"
+        line += ''.join('↑' if f == 'H' else '↓' for f in sorted(flags))
+        if values[-1].unit:
+            line += f" {values[-1].unit}"
+        if reference is not None:
+            line += f" [{_format_reference(reference, patient_sex)}]"
+        days = sorted({result.taken_at.date() for result in values if result.taken_at})
+        if len(days) > 1:
+            line += f" {days[0]:%d.%m.}–{days[-1]:%d.%m.}"
+        lines.append(line)
+        abnormal.append(bool(flags))
+
+    header = "Mimo referenční meze (orientační, pro dospělé) nebo s výrazným vývojem"
+    if patient_age is not None and patient_age < 18:
+        header += "; pozor, dětský pacient"
+
+    def render(kept: List[int]) -> str:
+        summary = [f"{header}:"] + [lines[i] for i in kept]
+        if normal:
+            summary.append(f"Ostatní parametry ({normal}) v normě nebo bez referenčních mezí.")
+        if len(kept) < len(lines):
+            summary.append(f"Pro délku vynecháno dalších {len(lines) - len(kept)} parametrů mimo meze nebo s vývojem.")
+        return '\n'.join(summary)
+
+    kept = list(range(len(lines)))
+    text = render(kept)
+    if max_chars is not None:
+        # Trend-only lines go first, then out-of-range ones, each from the end
+        drop_order = [i for i in reversed(kept) if not abnormal[i]] + [i for i in reversed(kept) if abnormal[i]]
+        for i in drop_order:
+            if len(text) <= max_chars:
+                break
+            kept.remove(i)
+            text = render(kept)
+    return text
+
+
+def summarize_labs(
+    biochemistry: Optional[str],
+    hematology: Optional[str],
+    patient_age: Optional[int] = None,
+    patient_sex: Optional[str] = None,
+    max_chars: Optional[Dict[str, int]] = None,
+) -> Dict[str, str]:
+    """
+    Summaries of the biochemistry and hematology sections, keyed by section
+
+    A section that yields no numeric results (not in the expected format)
+    is returned as is, cut to whole lines if it exceeds its max_chars.
+    max_chars maps a section to its size limit; see summarize_lab_results.
+    """
+    max_chars = max_chars or {}
+    summaries = {}
+    for section, text in (('biochemistry', biochemistry), ('hematology', hematology)):
+        if not text:
+            summaries[section] = ""
+            continue
+        limit = max_chars.get(section)
+        summary = summarize_lab_results(parse_lab_results(text, section), patient_age, patient_sex, limit)
+        if not summary:
+            summary = text if limit is None else _leading_lines(text, limit)
+        summaries[section] = summary
+    return summaries
@@ -0,0 +1,255 @@
+"""
+Rule-based separation of clinical text and lab sections
+
+DASTA discharge summaries put the narrative first and the lab results
+after headers such as "Biochemie:", "Hematologie:" and "Mikrobiologie:",
+with results written as "CODE value unit | CODE value unit". This module
+splits such text locally using the headers, the shape of each line and a
+dictionary of analyte codes, and scores how sure the split is. Only texts
+scoring below LAB_SEPARATOR_MIN_CONFIDENCE need the LLM separator.
+"""
+
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+# Analyte codes as printed by the lab systems, upper case. PCT is in both
+# sets: procalcitonin in biochemistry, plateletcrit in blood counts.
+BIOCHEMISTRY_ANALYTES = frozenset({
+    # Electrolytes, kidney, glucose
+    'NA', 'KA', 'CL', 'CA', 'CA-KOR', 'CAI', 'MG', 'PA', 'PI', 'SODIK', 'CLKOR',
+    'GL', 'MO', 'KR', 'GFR', 'KM', 'UAKOR', 'PLAC',
+    # Liver, pancreas, proteins
+    'BI', 'BP', 'AL', 'AS', 'GM', 'AF', 'AM', 'LIP', 'FIB4', 'AB', 'CB', 'PREA',
+    'ALBU', 'ALFA1', 'ALFA2', 'BETA1', 'BETA2', 'GAMA', 'A/G', 'FP/TP',
+    # Lipids
+    'CH', 'HDL', 'LDL', 'NONHDL', 'TR',
+    # Inflammation, cardiac, muscle
+    'CRP', 'PCT', 'IL6', 'BNP', 'NTBNP', 'TNI', 'MYO', 'CKMBM', 'CK', 'ASLO',
+    # Thyroid, hormones, tumor markers
+    'TSH', 'FT3', 'FT4', 'CPEP', 'AFP', 'CEA', 'CA19-9', 'NSE', 'SCC', 'CYFRA21',
+    'PROGRP', 'TPA', 'B2M', 'PSAT', 'HCY', 'ETA',
+    # Immunoglobulins, serology
+    'IGA', 'IGE', 'IGG', 'IGM', 'AHAV', 'AHAVM', 'AHCV', 'BORG', 'BORM', 'WBORG',
+    'WBORM', 'TOXOG', 'TOXOM', 'MYCOG', 'MYCOM', 'WCHPNA', 'WCHPNG', 'WCHPSA', 'WCHPSG',
+    # Blood gases (ASTRUP)
+    'KPH', 'KPC', 'KPO', 'KAC', 'KBE', 'KSB', 'KSC', 'KSA', 'KGH', 'KKH', 'KMH',
+    'ALBI', 'SID', 'AG', 'AGKOR',
+    # Serum indices
+    'HEMOL', 'ICTER', 'LIPEM', 'PHEMOL1', 'PICTER1', 'PLIPEM1',
+    # Urinalysis
+    'UCOL', 'UCLA', 'UPH', 'USH', 'UBILK', 'UGK-S', 'UAC', 'UROB', 'UBIL', 'ULEU',
+    'UERY', 'UEPI', 'UKEPI', 'UBAK', 'UHLEN', 'UAS', 'UAM', 'UAMP', 'UBAR', 'UBZO',
+    'UCAOX', 'UCOC', 'UEXT', 'UKVAS', 'UMTD', 'UOPI', 'UTCA', 'UTHC', 'UTRIP', 'UVALH',
+})
+
+HEMATOLOGY_ANALYTES = frozenset({
+    # Blood count
+    'WBC', 'RBC', 'HGB', 'HCT', 'MCV', 'MCH', 'MCHC', 'PLT', 'PCT', 'MPV', 'PDW',
+    'RDW', 'NRBC', 'NRBC%',
+    # Differential (automated and manual)
+    'NE', 'LY', 'MON', 'EO', 'BA', 'NEABS', 'LYABS', 'MOABS', 'EOABS', 'BAABS',
+    'NEUM', 'TYCM', 'LYM', 'MOM', 'EOM', 'BAM', 'MMYM', 'MYM', 'PMYM', 'MYBLM',
+    'PLBM', 'PLYM', 'NEDBBM', 'NEDBLM', 'NRBCM', 'MLEU', 'MERYM', 'MPLTM',
+    # Coagulation
+    'APTT-T', 'APTT-R', 'PT-INR', 'PT-R', 'PT-T', 'FIB', 'DDI', 'AT', 'AXA',
+})
+
+# Fields printed between results that are not analytes
+LAB_META_FIELDS = frozenset({
+    'VŠECHNY:', 'ČAS_MĚŘ.', 'TYP_ODB', 'KOMENTÁŘ', 'DOORDINA', 'VÝSLEDKY',
+    'REPT_NTS', 'PODPIS', 'POZNÁMKA', 'KOLIZE', 'STAB.VZO',
+})
+
+# Section header (lower case, without the colon) -> section field
+SECTION_HEADERS = {
+    'biochemie': 'biochemistry',
+    'klinická biochemie': 'biochemistry',
+    'biochemistry': 'biochemistry',
+    'hematologie': 'hematology',
+    'hematology': 'hematology',
+    'krevní obraz': 'hematology',
+    'koagulace': 'hematology',
+    'mikrobiologie': 'microbiology',
+    'microbiology': 'microbiology',
+}
+
+SECTION_FIELDS = ['clinical_text', 'biochemistry', 'hematology', 'microbiology']
+
+_HEADER = re.compile(r'^\s*([^\W\d_][^:|]{2,40}?)\s*:\s*(.*)$')
+_SUBHEADER = re.compile(r'^\s*[^|]{1,40}:\s*$')
+_DATE_OR_TIME = re.compile(r'^\s*(?:\d{1,2}\.\d{1,2}\.\d{4}|\d{1,2}:\d{2})\s*[:|]?\s*$')
+_DATED = re.compile(r'^\s*\d{1,2}\.\d{1,2}\.\d{4}:')
+_SEGMENT_SPLIT = re.compile(r'\||\d{1,2}\.\d{1,2}\.\d{4}:')
+_RESULT = re.compile(r'(?<![\w.-])([A-Za-z][\w%/.-]*)\s+[<>]?\s*-?\d+(?:[.,]\d+)?')
+_MICROBIOLOGY_MARKER = re.compile(
+    r'^\s*Q_[\w-]+:|kultivac|Nález:|CFU|Laboratorní číslo|\b(?:CIT|REZ)\b|pozitivní|negativní',
+    re.IGNORECASE,
+)
+
+# Confidence deductions
+STRAY_LINE_PENALTY = 0.05
+MISFILED_PENALTY_WEIGHT = 1.0
+UNKNOWN_ANALYTES_PENALTY = 0.2
+UNKNOWN_ANALYTES_SHARE = 0.5
+LABS_IN_NARRATIVE_PENALTY = 0.3
+MICROBIOLOGY_UNMARKED_PENALTY = 0.2
+HEADERLESS_LABS_CONFIDENCE = 0.5
+
+
+@dataclass
+class LabSeparation:
+    """Result of the rule-based split"""
+    sections: Dict[str, str]
+    confidence: float
+    issues: List[str] = field(default_factory=list)
+
+
+def analyte_codes(line: str) -> List[str]:
+    """Leading code of every "CODE value unit" segment of a lab line, upper case"""
+    codes = []
+    for segment in _SEGMENT_SPLIT.split(line):
+        tokens = segment.split()
+        if tokens:
+            codes.append(tokens[0].upper())
+    return codes
+
+
+def _known_results(line: str) -> int:
+    """Number of "CODE number" pairs with a known analyte code"""
+    return sum(
+        1 for match in _RESULT.finditer(line)
+        if match.group(1).upper() in BIOCHEMISTRY_ANALYTES
+        or match.group(1).upper() in HEMATOLOGY_ANALYTES
+    )
+
+
+def _is_lab_line(line: str) -> bool:
+    """Pipe-separated results, or several known results on one line"""
+    known = _known_results(line)
+    return ('|' in line and known >= 1) or known >= 3
+
+
+def _lab_field(line: str) -> str:
+    """biochemistry or hematology, by the majority of the line's analytes"""
+    codes = analyte_codes(line)
+    biochemistry = sum(code in BIOCHEMISTRY_ANALYTES for code in codes)
+    hematology = sum(code in HEMATOLOGY_ANALYTES for code in codes)
+    return 'hematology' if hematology > biochemistry else 'biochemistry'
+
+
+def _section_header(line: str) -> Optional[tuple]:
+    """(field, rest of line) if the line opens a lab section"""
+    match = _HEADER.match(line)
+    if not match:
+        return None
+    section = SECTION_HEADERS.get(match.group(1).strip().lower())
+    return (section, match.group(2)) if section else None
+
+
+def _split_headerless(lines: List[str]) -> LabSeparation:
+    """Line by line split for texts without section headers"""
+    parts = {name: [] for name in SECTION_FIELDS}
+    found_labs = False
+    for line in lines:
+        if _is_lab_line(line):
+            parts[_lab_field(line)].append(line)
+            found_labs = True
+        elif re.match(r'^\s*Q_[\w-]+:', line):
+            parts['microbiology'].append(line)
+            found_labs = True
+        else:
+            parts['clinical_text'].append(line)
+
+    sections = {name: '\n'.join(part).strip() for name, part in parts.items()}
+    if not found_labs:
+        return LabSeparation(sections=sections, confidence=1.0)
+    return LabSeparation(
+        sections=sections,
+        confidence=HEADERLESS_LABS_CONFIDENCE,
+        issues=['lab results without section headers'],
+    )
+
+
+def separate_lab_sections(text: str) -> LabSeparation:
+    """
+    Split clinical text into clinical_text, biochemistry, hematology and
+    microbiology, the same fields XMLParserLLM.separate_sections returns
+
+    Everything before the first lab section header is narrative. Lines in
+    the biochemistry and hematology sections that are neither results nor
+    short sub-headers (e.g. "Medikace: ..." after the blood count) are
+    moved back to the narrative. The confidence starts at 1.0 and drops
+    for every sign that the layout was not understood: analytes filed
+    under the wrong header, mostly unknown codes, results in the narrative,
+    a microbiology section without culture results, or no headers at all.
+    """
+    lines = text.splitlines()
+    if not any(_section_header(line) for line in lines):
+        return _split_headerless(lines)
+
+    parts = {name: [] for name in SECTION_FIELDS}
+    issues = []
+    confidence = 1.0
+    current = 'clinical_text'
+    stray_lines = 0
+    narrative_lab_lines = 0
+
+    for line in lines:
+        header = _section_header(line)
+        if header:
+            current, rest = header
+            if rest.strip():
+                parts[current].append(rest)
+            continue
+
+        if current == 'clinical_text':
+            if _is_lab_line(line):
+                narrative_lab_lines += 1
+            parts['clinical_text'].append(line)
+        elif current == 'microbiology' or not line.strip():
+            parts[current].append(line)
+        elif (
+            '|' in line or _is_lab_line(line) or _DATED.match(line)
+            or _DATE_OR_TIME.match(line) or _SUBHEADER.match(line)
+        ):
+            parts[current].append(line)
+        else:
+            parts['clinical_text'].append(line)
+            stray_lines += 1
+
+    if narrative_lab_lines:
+        confidence -= LABS_IN_NARRATIVE_PENALTY * narrative_lab_lines
+        issues.append(f'{narrative_lab_lines} lab result lines in the narrative')
+    if stray_lines:
+        confidence -= STRAY_LINE_PENALTY * stray_lines
+        issues.append(f'{stray_lines} non-result lines moved out of lab sections')
+
+    for section, own, other in (
+        ('biochemistry', BIOCHEMISTRY_ANALYTES, HEMATOLOGY_ANALYTES),
+        ('hematology', HEMATOLOGY_ANALYTES, BIOCHEMISTRY_ANALYTES),
+    ):
+        codes = [
+            code for line in parts[section] for code in analyte_codes(line)
+            if code not in LAB_META_FIELDS and not _DATE_OR_TIME.match(code)
+        ]
+        if not codes:
+            continue
+        matching = sum(code in own for code in codes)
+        misfiled = sum(code in other and code not in own for code in codes)
+        if misfiled:
+            confidence -= MISFILED_PENALTY_WEIGHT * misfiled / (matching + misfiled)
+            issues.append(f'{misfiled} {section} results look misfiled')
+        if (len(codes) - matching - misfiled) / len(codes) > UNKNOWN_ANALYTES_SHARE:
+            confidence -= UNKNOWN_ANALYTES_PENALTY
+            issues.append(f'mostly unknown analytes in {section}')
+
+    if parts['microbiology'] and not any(_MICROBIOLOGY_MARKER.search(line) for line in parts['microbiology']):
+        confidence -= MICROBIOLOGY_UNMARKED_PENALTY
+        issues.append('microbiology section without culture results')
+
+    return LabSeparation(
+        sections={name: '\n'.join(part).strip() for name, part in parts.items()},
+        confidence=max(0.0, round(confidence, 2)),
+        issues=issues,
+    )
@@ -1,12 +1,16 @@
 """
 Medical XML Parser
 
-Combines rule-based extraction for structured data (demographics)
-with LLM-based extraction for unstructured clinical text separation.
+Combines rule-based extraction for structured data (demographics,
+medications) with separation of the clinical text into narrative and lab
+sections. Structured fields come from a single streaming pass over the
+document (see extract_structured); sections are split by rules (see
+lab_sections) and only ambiguous texts go to the LLM. Both CPU-bound
+steps run through app.cpu_pool, off the event loop.
 """
 
 import xml.etree.ElementTree as ET
-from typing import Optional, Dict
+from typing import IO, Dict, Iterator, List, Optional, Union
 from datetime import datetime
 from dataclasses import dataclass
 from openai import AsyncOpenAI
@@ -15,6 +19,8 @@ import json
 from loguru import logger
 
 from app.core.config import settings
+from app.cpu_pool import run_cpu
+from app.parsers.lab_sections import separate_lab_sections
 
 
 @dataclass
@@ -30,7 +36,7 @@ class ParsedMedicalData:
     patient_id: Optional[str]
     pac_id: Optional[str]
     
-    # Clinical data (LLM-separated)
+    # Clinical data (rule- or LLM-separated)
     clinical_text: str
     biochemistry: str
     hematology: str
@@ -48,88 +54,164 @@ NAMESPACES = {
 }
 
 
-def extract_demographics(tree: ET.Element) -> Dict:
-    """
-    Extract patient demographics using XPath (rule-based)
-    Fast and reliable for structured fields
-    """
-    demographics = {}
-    
+# Demographic fields taken from the first element with that tag
+DEMOGRAPHIC_TAGS = {
+    f"{{{NAMESPACES['dsip']}}}rodcis": 'birth_number',
+    f"{{{NAMESPACES['dsip']}}}jmeno": 'first_name',
+    f"{{{NAMESPACES['dsip']}}}prijmeni": 'last_name',
+    f"{{{NAMESPACES['dsip']}}}dat_dn": 'date_of_birth',
+    f"{{{NAMESPACES['dsip']}}}stat_pris": 'country_of_residence',
+    f"{{{NAMESPACES['dsip']}}}sex": 'sex',
+}
+IP_TAG = f"{{{NAMESPACES['dsip']}}}ip"
+LEZ_TAG = f"{{{NAMESPACES['dsip']}}}lez"
+PTEXT_TAG = f"{{{NAMESPACES['dsip']}}}ptext"
+
+# Keep the DASTA prefixes when patient blocks are serialized
+for _prefix, _uri in NAMESPACES.items():
+    ET.register_namespace(_prefix, _uri)
+
+# Characters fed to the pull parser at a time
+PARSE_CHUNK_SIZE = 64 * 1024
+
+
+def _parse_date(text: Optional[str]) -> Optional[datetime]:
+    if not text:
+        return None
     try:
-        # Birth number (rodné číslo)
-        rodcis = tree.find('.//dsip:rodcis', NAMESPACES)
-        demographics['birth_number'] = rodcis.text if rodcis is not None else None
-        
-        # First name
-        jmeno = tree.find('.//dsip:jmeno', NAMESPACES)
-        demographics['first_name'] = jmeno.text if jmeno is not None else None
-        
-        # Last name
-        prijmeni = tree.find('.//dsip:prijmeni', NAMESPACES)
-        demographics['last_name'] = prijmeni.text if prijmeni is not None else None
-        
-        # Date of birth
-        dat_dn = tree.find('.//dsip:dat_dn', NAMESPACES)
-        if dat_dn is not None and dat_dn.text:
-            try:
-                demographics['date_of_birth'] = datetime.strptime(dat_dn.text, '%Y-%m-%d')
-            except ValueError:
-                demographics['date_of_birth'] = None
-        else:
-            demographics['date_of_birth'] = None
-        
-        # Country of residence
-        stat_pris = tree.find('.//dsip:stat_pris', NAMESPACES)
-        demographics['country_of_residence'] = stat_pris.text if stat_pris is not None else None
-        
-        # Sex
-        sex = tree.find('.//dsip:sex', NAMESPACES)
-        demographics['sex'] = sex.text if sex is not None else None
-        
-        # Patient ID (internal hospital ID)
-        ip = tree.find('.//dsip:ip', NAMESPACES)
-        demographics['patient_id'] = ip.get('id_pac') if ip is not None else None
-        
-        # PAC ID (could be same as birth number or separate)
-        demographics['pac_id'] = demographics['birth_number'] or demographics['patient_id']
-        
-    except Exception as e:
-        logger.warning(f"Error extracting demographics: {e}")
+        return datetime.strptime(text, '%Y-%m-%d')
+    except ValueError:
+        return None
+
+
+def _chunks(source: Union[str, bytes, IO]) -> Iterator:
+    """Yield the document in PARSE_CHUNK_SIZE pieces"""
+    if isinstance(source, (str, bytes)):
+        for offset in range(0, len(source), PARSE_CHUNK_SIZE):
+            yield source[offset:offset + PARSE_CHUNK_SIZE]
+    else:
+        while chunk := source.read(PARSE_CHUNK_SIZE):
+            yield chunk
+
+
+class _PatientRecord:
+    """Fields collected from the elements of one patient block"""
+    
+    def __init__(self):
+        self.fields = {field: None for field in DEMOGRAPHIC_TAGS.values()}
+        self.fields['patient_id'] = None
+        self.seen = set()
+        self.medications = []
+        self.clinical_text = None
+    
+    def start(self, elem: ET.Element):
+        # Attributes are complete at start, text only at end
+        if elem.tag == LEZ_TAG:
+            drug_name = elem.get('nazev_lek')
+            if drug_name:
+                self.medications.append(drug_name)
+        elif elem.tag == IP_TAG and IP_TAG not in self.seen:
+            self.seen.add(IP_TAG)
+            self.fields['patient_id'] = elem.get('id_pac')
     
-    return demographics
+    def end(self, elem: ET.Element):
+        field = DEMOGRAPHIC_TAGS.get(elem.tag)
+        if field and elem.tag not in self.seen:
+            self.seen.add(elem.tag)
+            self.fields[field] = _parse_date(elem.text) if field == 'date_of_birth' else elem.text
+        elif elem.tag == PTEXT_TAG and self.clinical_text is None:
+            self.clinical_text = (elem.text or "").strip()
+    
+    def is_empty(self) -> bool:
+        return not self.seen and self.clinical_text is None and not self.medications
+    
+    def result(self) -> Dict:
+        result = dict(self.fields)
+        # PAC ID (could be same as birth number or separate)
+        result['pac_id'] = result['birth_number'] or result['patient_id']
+        result['medication'] = ', '.join(self.medications)
+        result['clinical_text'] = self.clinical_text or ""
+        return result
 
 
-def extract_medications(tree: ET.Element) -> str:
+def iter_patient_records(source: Union[str, bytes, IO], keep_xml: bool = False) -> Iterator[Dict]:
     """
-    Extract medications using XPath (rule-based)
-    Format: "DRUG1, DRUG2, DRUG3"
+    Yield the structured fields of every patient block (dsip:ip) in a document
+    
+    Single streaming pass: each record is yielded as soon as its block
+    ends, and elements are detached from their parent when they end, so
+    only the path from the root to the current element is kept in memory.
+    With `keep_xml` the current patient block stays in memory until it is
+    serialized into the record's 'raw_xml'.
+    
+    Records are dicts with the demographic fields (first occurrence of
+    each tag within the block wins), 'medication' ("DRUG1, DRUG2") and
+    'clinical_text' (the block's first ptext). A document without patient
+    blocks yields one record from the whole document, if it has any of
+    these fields. Raises ET.ParseError on invalid XML.
     """
-    medications = []
+    parser = ET.XMLPullParser(events=('start', 'end'))
+    path = []
+    loose = _PatientRecord()
+    current = None
+    block = None
+    finished = []
+    found_blocks = False
     
-    try:
-        lez_elements = tree.findall('.//dsip:lez', NAMESPACES)
-        for lez in lez_elements:
-            drug_name = lez.get('nazev_lek')
-            if drug_name:
-                medications.append(drug_name)
-    except Exception as e:
-        logger.warning(f"Error extracting medications: {e}")
+    def handle(events):
+        nonlocal current, block, found_blocks
+        for event, elem in events:
+            if event == 'start':
+                path.append(elem)
+                if elem.tag == IP_TAG and current is None:
+                    current, block, found_blocks = _PatientRecord(), elem, True
+                (current or loose).start(elem)
+                continue
+            
+            (current or loose).end(elem)
+            path.pop()
+            if elem is block:
+                record = current.result()
+                if keep_xml:
+                    record['raw_xml'] = ET.tostring(elem, encoding='unicode')
+                finished.append(record)
+                current = block = None
+            if path and (current is None or not keep_xml):
+                path[-1].remove(elem)
+    
+    for chunk in _chunks(source):
+        parser.feed(chunk)
+        handle(parser.read_events())
+        yield from finished
+        finished.clear()
+    parser.close()
+    handle(parser.read_events())
+    yield from finished
     
-    return ', '.join(medications) if medications else ""
+    if not found_blocks and not loose.is_empty():
+        record = loose.result()
+        if keep_xml:
+            record['raw_xml'] = source if isinstance(source, str) else None
+        yield record
 
 
-def extract_clinical_text_full(tree: ET.Element) -> str:
-    """
-    Extract full clinical text that needs to be separated by LLM
+def extract_structured(source: Union[str, bytes, IO]) -> Dict:
     """
-    try:
-        ptext = tree.find('.//dsip:ptext', NAMESPACES)
-        if ptext is not None and ptext.text:
-            return ptext.text.strip()
-    except Exception as e:
-        logger.warning(f"Error extracting clinical text: {e}")
+    Extract demographics, medications and clinical text in one streaming pass
     
-    return ""
+    Fields of the first patient block, see iter_patient_records. The whole
+    document is still parsed, so invalid XML anywhere raises ET.ParseError.
+    """
+    first = None
+    for record in iter_patient_records(source):
+        if first is None:
+            first = record
+    return first or _PatientRecord().result()
+
+
+def extract_patient_records(source: Union[str, bytes], keep_xml: bool = False) -> List[Dict]:
+    """All records of iter_patient_records as a list, for run_cpu"""
+    return list(iter_patient_records(source, keep_xml=keep_xml))
 
 
 # LLM Client for XML parsing (reuses OpenRouter like services.py)
@@ -223,61 +305,73 @@ Return JSON:
 parser_llm = XMLParserLLM()
 
 
+async def build_parsed_data(extracted: Dict, raw_xml: str) -> ParsedMedicalData:
+    """
+    Turn one extracted record into ParsedMedicalData
+    
+    The clinical text is separated into narrative and lab sections by
+    rules; only a low-confidence split is redone with the LLM.
+    Raises ValueError if the record has no clinical text.
+    """
+    medications = extracted['medication']
+    full_clinical_text = extracted['clinical_text']
+    logger.info(f"Extracted demographics for patient: {extracted.get('first_name')} {extracted.get('last_name')}")
+    logger.info(f"Extracted {len(medications.split(',')) if medications else 0} medications")
+    
+    if not full_clinical_text:
+        raise ValueError("No clinical text found in XML")
+    
+    # Separate sections by rules, LLM only for ambiguous layouts
+    separation = await run_cpu(separate_lab_sections, full_clinical_text)
+    if separation.confidence >= settings.LAB_SEPARATOR_MIN_CONFIDENCE:
+        logger.info(f"Separated clinical text sections by rules (confidence {separation.confidence})")
+        separated_sections = separation.sections
+    else:
+        logger.info(
+            f"Rule-based separation unsure (confidence {separation.confidence}: "
+            f"{'; '.join(separation.issues)}), separating with LLM..."
+        )
+        separated_sections = await parser_llm.separate_sections(full_clinical_text)
+    
+    return ParsedMedicalData(
+        # Demographics
+        birth_number=extracted.get('birth_number'),
+        first_name=extracted.get('first_name'),
+        last_name=extracted.get('last_name'),
+        date_of_birth=extracted.get('date_of_birth'),
+        country_of_residence=extracted.get('country_of_residence'),
+        sex=extracted.get('sex'),
+        patient_id=extracted.get('patient_id'),
+        pac_id=extracted.get('pac_id'),
+        
+        # Clinical data (rule- or LLM-separated)
+        clinical_text=separated_sections['clinical_text'],
+        biochemistry=separated_sections['biochemistry'],
+        hematology=separated_sections['hematology'],
+        microbiology=separated_sections['microbiology'],
+        medication=medications,
+        
+        # Raw XML
+        raw_xml=raw_xml,
+    )
+
+
 async def parse_medical_xml(xml_content: str) -> ParsedMedicalData:
     """
     Complete XML parsing pipeline:
-    1. Extract demographics with XPath (fast, reliable)
-    2. Extract medications with XPath
-    3. Extract clinical text
-    4. Separate clinical text with LLM (smart, flexible)
+    1. Extract demographics, medications and clinical text in one
+       streaming pass (fast, reliable, bounded memory)
+    2. Separate clinical text into narrative and lab sections by rules;
+       only a low-confidence split is redone with the LLM
+    
+    Only the first patient block is used; documents with several
+    patients go through extract_patient_records and build_parsed_data.
     
     Returns: ParsedMedicalData with all fields populated
     """
     try:
-        # Parse XML
-        tree = ET.fromstring(xml_content)
-        
-        # Step 1: Extract demographics (rule-based, fast)
-        demographics = extract_demographics(tree)
-        logger.info(f"Extracted demographics for patient: {demographics.get('first_name')} {demographics.get('last_name')}")
-        
-        # Step 2: Extract medications (rule-based, fast)
-        medications = extract_medications(tree)
-        logger.info(f"Extracted {len(medications.split(',')) if medications else 0} medications")
-        
-        # Step 3: Extract full clinical text
-        full_clinical_text = extract_clinical_text_full(tree)
-        
-        if not full_clinical_text:
-            raise ValueError("No clinical text found in XML")
-        
-        # Step 4: Separate sections with LLM (smart, flexible)
-        logger.info("Separating clinical text sections with LLM...")
-        separated_sections = await parser_llm.separate_sections(full_clinical_text)
-        
-        # Build final result
-        parsed_data = ParsedMedicalData(
-            # Demographics
-            birth_number=demographics.get('birth_number'),
-            first_name=demographics.get('first_name'),
-            last_name=demographics.get('last_name'),
-            date_of_birth=demographics.get('date_of_birth'),
-            country_of_residence=demographics.get('country_of_residence'),
-            sex=demographics.get('sex'),
-            patient_id=demographics.get('patient_id'),
-            pac_id=demographics.get('pac_id'),
-            
-            # Clinical data (LLM-separated)
-            clinical_text=separated_sections['clinical_text'],
-            biochemistry=separated_sections['biochemistry'],
-            hematology=separated_sections['hematology'],
-            microbiology=separated_sections['microbiology'],
-            medication=medications,
-            
-            # Raw XML
-            raw_xml=xml_content,
-        )
-        
+        extracted = await run_cpu(extract_structured, xml_content)
+        parsed_data = await build_parsed_data(extracted, xml_content)
         logger.info("Successfully parsed medical XML")
         return parsed_data
         
@@ -1,6 +1,6 @@
 """Prediction services - 2-step LLM pipeline"""
 
-from typing import Dict, List
+from typing import Dict, List, Optional
 from openai import AsyncOpenAI
 from tenacity import retry, stop_after_attempt, wait_exponential
 from loguru import logger
@@ -8,6 +8,21 @@ import json
 
 from app.core.config import settings
 from app.database import get_all_three_char_codes, get_codes_by_prefix
+from app.abbreviations import (
+    AbbreviationAnnotation,
+    annotate_many,
+    cache_annotation,
+    cached_annotation,
+    format_glossary,
+    merge_glossaries,
+    text_hash,
+)
+from app.cpu_pool import run_cpu
+from app.parsers.lab_results import summarize_labs
+
+# Size of the lab sections in the step 2 prompt; summaries are shortened
+# by whole lines (see summarize_lab_results)
+LAB_SUMMARY_MAX_CHARS = {'biochemistry': 3000, 'hematology': 2000}
 
 
 # ===== LLM CLIENT =====
@@ -69,6 +84,37 @@ class LLMClient:
 llm = LLMClient()
 
 
+# ===== ABBREVIATIONS =====
+
+async def annotate_abbreviations(texts: List[str]) -> List[AbbreviationAnnotation]:
+    """
+    Abbreviation spans and used-glossary of each text
+    
+    Cached by text hash; the texts not cached yet are annotated in one
+    CPU pool call, so bulk paths should pass a whole batch at once.
+    """
+    keys = [text_hash(text) for text in texts]
+    annotations = [cached_annotation(key) for key in keys]
+    missing = {key: text for key, text, annotation in zip(keys, texts, annotations) if annotation is None}
+    
+    if missing:
+        for key, annotation in zip(missing, await run_cpu(annotate_many, list(missing.values()))):
+            cache_annotation(key, annotation)
+        annotations = [annotation or cached_annotation(key) for key, annotation in zip(keys, annotations)]
+    
+    return annotations
+
+
+def abbreviation_texts(clinical_text: str, microbiology: Optional[str] = None) -> List[str]:
+    """
+    Texts scanned for abbreviations: the narrative and microbiology
+    
+    Lab sections are left out, their analyte codes (AB, CL, ...) collide
+    with clinical abbreviations.
+    """
+    return [clinical_text or "", microbiology or ""]
+
+
 # ===== STEP 1: TOP-LEVEL CODE SELECTION =====
 
 async def step1_select_codes(
@@ -77,6 +123,7 @@ async def step1_select_codes(
     hematology: str = None,
     microbiology: str = None,
     medication: str = None,
+    abbreviations: Optional[Dict[str, str]] = None,
 ) -> Dict:
     """
     Step 1: Show LLM all 3-char codes (A00, I21, etc.) and select relevant ones
@@ -113,6 +160,9 @@ async def step1_select_codes(
     if medication:
         prompt += f"\n# Medikace\n{medication}\n"
     
+    if abbreviations:
+        prompt += f"\n# Zkratky použité v textu\n{format_glossary(abbreviations)}\n"
+    
     prompt += """
 # Tvůj úkol
 1. Zamysli se hluboce nad pacientovými daty (klinický text, biochemie, hematologie, mikrobiologie, medikace)
@@ -164,6 +214,7 @@ async def step2_predict_codes(
     hematology: str = None,
     microbiology: str = None,
     medication: str = None,
+    abbreviations: Optional[Dict[str, str]] = None,
 ) -> Dict:
     """
     Step 2: Expand selected codes to subcodes and predict specific diagnoses
@@ -216,11 +267,16 @@ async def step2_predict_codes(
 {clinical_text}
 """
     
+    # Labs as a summary of abnormal and trending values instead of raw text
+    lab_summaries = await run_cpu(
+        summarize_labs, biochemistry, hematology, patient_age, patient_sex, LAB_SUMMARY_MAX_CHARS
+    )
+    
     if biochemistry:
-        prompt += f"\n## Biochemie\n{biochemistry[:3000]}\n"
+        prompt += f"\n## Biochemie\n{lab_summaries['biochemistry']}\n"
     
     if hematology:
-        prompt += f"\n## Hematologie\n{hematology[:2000]}\n"
+        prompt += f"\n## Hematologie\n{lab_summaries['hematology']}\n"
     
     if microbiology:
         prompt += f"\n## Mikrobiologie\n{microbiology[:2000]}\n"
@@ -228,6 +284,9 @@ async def step2_predict_codes(
     if medication:
         prompt += f"\n## Medikace\n{medication[:1000]}\n"
     
+    if abbreviations:
+        prompt += f"\n## Zkratky použité v textu\n{format_glossary(abbreviations)}\n"
+    
     prompt += """
 # Pravidla kódování diagnóz pro DRG
 
@@ -372,9 +431,18 @@ async def predict_diagnosis(
     
     start = time.time()
     
+    # Glossary of the abbreviations used, the text itself stays as written
+    abbreviations = {}
+    if settings.ABBREVIATION_GLOSSARY:
+        abbreviations = merge_glossaries(
+            await annotate_abbreviations(abbreviation_texts(clinical_text, microbiology))
+        )
+        logger.info(f"Abbreviations used: {len(abbreviations)}")
+    
     # Step 1: Select top-level codes
     step1_result = await step1_select_codes(
-        clinical_text, biochemistry, hematology, microbiology, medication
+        clinical_text, biochemistry, hematology, microbiology, medication,
+        abbreviations=abbreviations,
     )
     
     step1_time = int((time.time() - start) * 1000)
@@ -385,7 +453,8 @@ async def predict_diagnosis(
         clinical_text,
         step1_result["selected_codes"],
         patient_age, patient_sex,
-        biochemistry, hematology, microbiology, medication
+        biochemistry, hematology, microbiology, medication,
+        abbreviations=abbreviations,
     )
     
     step2_time = int((time.time() - step2_start) * 1000)
@@ -397,5 +466,6 @@ async def predict_diagnosis(
         "processing_time": total_time,
         "step1_time": step1_time,
         "step2_time": step2_time,
+        "abbreviations": abbreviations,
         "model_used": settings.DEFAULT_LLM_MODEL,
     }
@@ -1,6 +1,18 @@
 """Utility functions"""
 
+import hashlib
+import re
+import zlib
 from datetime import datetime
+from typing import Tuple
+
+try:  # Python 3.14+
+    from compression import zstd as _zstd
+except ImportError:
+    try:
+        import zstandard as _zstd
+    except ImportError:
+        _zstd = None
 
 
 def calculate_age(date_of_birth: datetime) -> int:
@@ -13,3 +25,46 @@ def calculate_age(date_of_birth: datetime) -> int:
         age -= 1
     
     return age
+
+
+_INTER_TAG_WHITESPACE = re.compile(r">\s+<")
+
+
+def compute_content_hash(content: str) -> str:
+    """
+    Fingerprint an uploaded document for duplicate detection
+    
+    Normalizes BOM, line endings and indentation between tags so that
+    re-sent exports of the same document hash identically.
+    """
+    normalized = content.lstrip("\ufeff").replace("\r\n", "\n").strip()
+    normalized = _INTER_TAG_WHITESPACE.sub("><", normalized)
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+# zstd level 10 shrinks DASTA XML ~8x while still compressing several MB/s
+ZSTD_LEVEL = 10
+
+
+def compress_text(text: str) -> Tuple[str, bytes]:
+    """
+    Compress text for blob storage, returns (codec, data)
+    
+    Uses zstd when available (stdlib on Python 3.14+, else the
+    `zstandard` package) and falls back to zlib.
+    """
+    raw = text.encode("utf-8")
+    if _zstd is None:
+        return "zlib", zlib.compress(raw, 9)
+    return "zstd", _zstd.compress(raw, level=ZSTD_LEVEL)
+
+
+def decompress_text(codec: str, data: bytes) -> str:
+    """Inverse of compress_text"""
+    if codec == "zlib":
+        return zlib.decompress(data).decode("utf-8")
+    if codec == "zstd":
+        if _zstd is None:
+            raise RuntimeError("zstd blob found but neither compression.zstd nor zstandard is installed")
+        return _zstd.decompress(data).decode("utf-8")
+    raise ValueError(f"Unknown blob codec: {codec}")
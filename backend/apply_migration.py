@@ -1,4 +1,7 @@
-"""Apply migration using direct database connection"""
+"""Apply migration using direct database connection
+
+Usage: python apply_migration.py [path/to/migration.sql]
+"""
 import os
 import sys
 
@@ -12,17 +15,19 @@ load_dotenv()
 from prisma import Prisma
 import asyncio
 
-async def main():
+DEFAULT_MIGRATION = "prisma/migrations/20241129_add_patients/migration.sql"
+
+async def main(migration_path: str = DEFAULT_MIGRATION):
     print("📡 Connecting to database...")
     db = Prisma()
     await db.connect()
     
     try:
         # Read migration SQL
-        with open("prisma/migrations/20241129_add_patients/migration.sql", "r") as f:
+        with open(migration_path, "r") as f:
             migration_sql = f.read()
         
-        print("🔄 Applying migration...")
+        print(f"🔄 Applying migration {migration_path}...")
         
         # Execute raw SQL
         await db.execute_raw(migration_sql)
@@ -45,4 +50,4 @@ async def main():
         await db.disconnect()
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    asyncio.run(main(*sys.argv[1:2]))
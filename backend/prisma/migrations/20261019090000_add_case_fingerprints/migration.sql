@@ -0,0 +1,7 @@
+-- Fingerprints for idempotent XML uploads
+ALTER TABLE "patient_cases" ADD COLUMN IF NOT EXISTS "contentHash" TEXT;
+ALTER TABLE "patient_cases" ADD COLUMN IF NOT EXISTS "idempotencyKey" TEXT;
+
+-- Unique indexes double as the lookup path for duplicate detection
+CREATE UNIQUE INDEX IF NOT EXISTS "patient_cases_contentHash_key" ON "patient_cases"("contentHash");
+CREATE UNIQUE INDEX IF NOT EXISTS "patient_cases_idempotencyKey_key" ON "patient_cases"("idempotencyKey");
@@ -0,0 +1,9 @@
+-- Composite indexes for keyset pagination on (createdAt, id)
+CREATE INDEX IF NOT EXISTS "patient_cases_createdAt_id_idx" ON "patient_cases"("createdAt", "id");
+CREATE INDEX IF NOT EXISTS "predictions_createdAt_id_idx" ON "predictions"("createdAt", "id");
+
+-- Filtered listings: the leading column replaces the old single-column indexes
+CREATE INDEX IF NOT EXISTS "predictions_caseId_createdAt_id_idx" ON "predictions"("caseId", "createdAt", "id");
+CREATE INDEX IF NOT EXISTS "predictions_validated_createdAt_id_idx" ON "predictions"("validated", "createdAt", "id");
+DROP INDEX IF EXISTS "predictions_caseId_idx";
+DROP INDEX IF EXISTS "predictions_validated_idx";
@@ -0,0 +1,48 @@
+-- Normalized prediction -> code table
+CREATE TABLE IF NOT EXISTS "prediction_codes" (
+    "id" TEXT NOT NULL,
+    "predictionId" TEXT NOT NULL,
+    "code" TEXT NOT NULL,
+    "role" TEXT NOT NULL,
+    "confidence" DOUBLE PRECISION,
+
+    CONSTRAINT "prediction_codes_pkey" PRIMARY KEY ("id"),
+    CONSTRAINT "prediction_codes_predictionId_fkey" FOREIGN KEY ("predictionId")
+        REFERENCES "predictions"("id") ON DELETE CASCADE ON UPDATE CASCADE
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS "prediction_codes_predictionId_code_role_key"
+    ON "prediction_codes"("predictionId", "code", "role");
+CREATE INDEX IF NOT EXISTS "prediction_codes_code_role_predictionId_idx"
+    ON "prediction_codes"("code", "role", "predictionId");
+
+-- Backfill main diagnoses (placeholders of unfinished predictions have an empty code)
+INSERT INTO "prediction_codes" ("id", "predictionId", "code", "role", "confidence")
+SELECT gen_random_uuid()::text, p.id, p."mainCode", 'main', p."mainConfidence"
+FROM "predictions" p
+WHERE p."mainCode" <> ''
+ON CONFLICT DO NOTHING;
+
+-- Backfill secondary diagnoses; older rows store the array double-encoded as a JSON string
+WITH secondary AS (
+    SELECT
+        p.id AS prediction_id,
+        CASE jsonb_typeof(p."secondaryCodes")
+            WHEN 'string' THEN (p."secondaryCodes" #>> '{}')::jsonb
+            ELSE p."secondaryCodes"
+        END AS codes
+    FROM "predictions" p
+)
+INSERT INTO "prediction_codes" ("id", "predictionId", "code", "role", "confidence")
+SELECT
+    gen_random_uuid()::text,
+    s.prediction_id,
+    item->>'code',
+    'secondary',
+    CASE WHEN jsonb_typeof(item->'confidence') = 'number' THEN (item->>'confidence')::double precision END
+FROM secondary s
+CROSS JOIN LATERAL jsonb_array_elements(
+    CASE WHEN jsonb_typeof(s.codes) = 'array' THEN s.codes ELSE '[]'::jsonb END
+) AS item
+WHERE coalesce(item->>'code', '') <> ''
+ON CONFLICT DO NOTHING;
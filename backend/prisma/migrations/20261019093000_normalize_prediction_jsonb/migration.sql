@@ -0,0 +1,24 @@
+-- Unwrap JSON columns that were stored double-encoded (a JSON string holding the serialized array)
+UPDATE "predictions"
+SET "selectedCodes" = ("selectedCodes" #>> '{}')::jsonb
+WHERE jsonb_typeof("selectedCodes") = 'string';
+
+UPDATE "predictions"
+SET "secondaryCodes" = ("secondaryCodes" #>> '{}')::jsonb
+WHERE jsonb_typeof("secondaryCodes") = 'string';
+
+UPDATE "predictions"
+SET "original_secondary_codes" = ("original_secondary_codes" #>> '{}')::jsonb
+WHERE jsonb_typeof("original_secondary_codes") = 'string';
+
+UPDATE "predictions"
+SET "corrections" = ("corrections" #>> '{}')::jsonb
+WHERE jsonb_typeof("corrections") = 'string';
+
+-- Containment lookups (e.g. "secondaryCodes" @> '[{"code": "I10"}]')
+CREATE INDEX IF NOT EXISTS "predictions_selectedCodes_idx"
+    ON "predictions" USING GIN ("selectedCodes" jsonb_path_ops);
+CREATE INDEX IF NOT EXISTS "predictions_secondaryCodes_idx"
+    ON "predictions" USING GIN ("secondaryCodes" jsonb_path_ops);
+CREATE INDEX IF NOT EXISTS "predictions_original_secondary_codes_idx"
+    ON "predictions" USING GIN ("original_secondary_codes" jsonb_path_ops);
@@ -0,0 +1,13 @@
+-- Trigram search over a denormalized per-case search document
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+ALTER TABLE "patient_cases" ADD COLUMN IF NOT EXISTS "searchDocument" TEXT;
+
+-- Backfill; keep the expression in sync with CASE_SEARCH_DOCUMENT_SQL in app/database.py
+UPDATE "patient_cases" c
+SET "searchDocument" = lower(concat_ws(' ', c."pacId", pt."firstName", pt."lastName", pt."birthNumber", c."clinicalText"))
+FROM "patients" pt
+WHERE pt.id = c."patientId" AND c."searchDocument" IS NULL;
+
+CREATE INDEX IF NOT EXISTS "patient_cases_searchDocument_idx"
+    ON "patient_cases" USING GIN ("searchDocument" gin_trgm_ops);
@@ -0,0 +1,18 @@
+-- Content-addressed cold storage for raw XML and case sections
+CREATE TABLE IF NOT EXISTS "blobs" (
+    "hash" TEXT NOT NULL,
+    "codec" TEXT NOT NULL,
+    "size" INTEGER NOT NULL,
+    "data" BYTEA NOT NULL,
+    "createdAt" TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP,
+
+    CONSTRAINT "blobs_pkey" PRIMARY KEY ("hash")
+);
+
+-- Blob payloads are already compressed; skip TOAST compression
+ALTER TABLE "blobs" ALTER COLUMN "data" SET STORAGE EXTERNAL;
+
+ALTER TABLE "patient_cases" ADD COLUMN IF NOT EXISTS "sectionsBlob" TEXT;
+ALTER TABLE "patient_cases" ADD COLUMN IF NOT EXISTS "rawXmlBlob" TEXT;
+
+-- Existing inline documents are moved by: python -m scripts.move_case_documents_to_blobs
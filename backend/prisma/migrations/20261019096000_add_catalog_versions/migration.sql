@@ -0,0 +1,14 @@
+-- Catalog reloads update and retire codes instead of only inserting new ones
+ALTER TABLE "diagnosis_codes" ADD COLUMN IF NOT EXISTS "updatedAt" TIMESTAMP(3);
+ALTER TABLE "diagnosis_codes" ADD COLUMN IF NOT EXISTS "retiredAt" TIMESTAMP(3);
+
+CREATE TABLE IF NOT EXISTS "catalog_versions" (
+    "version" SERIAL NOT NULL,
+    "source" TEXT NOT NULL,
+    "inserted" INTEGER NOT NULL,
+    "updated" INTEGER NOT NULL,
+    "retired" INTEGER NOT NULL,
+    "loadedAt" TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP,
+
+    CONSTRAINT "catalog_versions_pkey" PRIMARY KEY ("version")
+);
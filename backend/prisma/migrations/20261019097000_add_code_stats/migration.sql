@@ -0,0 +1,94 @@
+-- Per code/role/model prediction and review counters
+CREATE TABLE IF NOT EXISTS "code_stats" (
+    "code" TEXT NOT NULL,
+    "role" TEXT NOT NULL,
+    "modelUsed" TEXT NOT NULL,
+    "predicted" INTEGER NOT NULL DEFAULT 0,
+    "approved" INTEGER NOT NULL DEFAULT 0,
+    "correctedAway" INTEGER NOT NULL DEFAULT 0,
+    "addedByCoder" INTEGER NOT NULL DEFAULT 0,
+    "updatedAt" TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP,
+
+    CONSTRAINT "code_stats_pkey" PRIMARY KEY ("code", "role", "modelUsed")
+);
+
+-- Backfill from history (only into an empty table, so re-running is harmless).
+-- Mirrors prediction_stat_deltas / feedback_stat_deltas in app/database.py.
+WITH preds AS (
+    SELECT
+        p.id,
+        p."modelUsed" AS model,
+        p.validated,
+        p."feedbackType" AS feedback_type,
+        CASE WHEN p.corrected THEN p.original_main_code ELSE p."mainCode" END AS original_main,
+        CASE WHEN p.corrected THEN p.original_secondary_codes ELSE p."secondaryCodes" END AS original_secondary,
+        p."mainCode" AS final_main,
+        p."secondaryCodes" AS final_secondary
+    FROM "predictions" p
+    WHERE p.status = 'completed'
+),
+original AS (
+    SELECT id, original_main AS code, 'main' AS role FROM preds WHERE coalesce(original_main, '') <> ''
+    UNION
+    SELECT p.id, item->>'code', 'secondary'
+    FROM preds p
+    CROSS JOIN LATERAL jsonb_array_elements(
+        CASE WHEN jsonb_typeof(p.original_secondary) = 'array' THEN p.original_secondary ELSE '[]'::jsonb END
+    ) AS item
+    WHERE coalesce(item->>'code', '') <> ''
+),
+final AS (
+    SELECT id, final_main AS code, 'main' AS role FROM preds WHERE coalesce(final_main, '') <> ''
+    UNION
+    SELECT p.id, item->>'code', 'secondary'
+    FROM preds p
+    CROSS JOIN LATERAL jsonb_array_elements(
+        CASE WHEN jsonb_typeof(p.final_secondary) = 'array' THEN p.final_secondary ELSE '[]'::jsonb END
+    ) AS item
+    WHERE coalesce(item->>'code', '') <> ''
+),
+unchanged AS (
+    -- Reviews that left the code set as predicted
+    SELECT p.id
+    FROM preds p
+    WHERE NOT EXISTS (
+        (SELECT code, role FROM original o WHERE o.id = p.id
+         EXCEPT SELECT code, role FROM final f WHERE f.id = p.id)
+        UNION ALL
+        (SELECT code, role FROM final f WHERE f.id = p.id
+         EXCEPT SELECT code, role FROM original o WHERE o.id = p.id)
+    )
+),
+events AS (
+    SELECT
+        o.code, o.role, p.model,
+        1 AS predicted,
+        CASE
+            WHEN NOT p.validated THEN 0
+            WHEN p.feedback_type = 'rejected' AND u.id IS NOT NULL THEN 0
+            WHEN f.id IS NOT NULL THEN 1
+            ELSE 0
+        END AS approved,
+        CASE
+            WHEN NOT p.validated THEN 0
+            WHEN p.feedback_type = 'rejected' AND u.id IS NOT NULL THEN 1
+            WHEN f.id IS NULL THEN 1
+            ELSE 0
+        END AS corrected_away,
+        0 AS added_by_coder
+    FROM original o
+    JOIN preds p ON p.id = o.id
+    LEFT JOIN final f ON f.id = o.id AND f.code = o.code AND f.role = o.role
+    LEFT JOIN unchanged u ON u.id = o.id
+    UNION ALL
+    SELECT f.code, f.role, p.model, 0, 0, 0, 1
+    FROM final f
+    JOIN preds p ON p.id = f.id
+    LEFT JOIN original o ON o.id = f.id AND o.code = f.code AND o.role = f.role
+    WHERE o.id IS NULL AND p.validated
+)
+INSERT INTO "code_stats" ("code", "role", "modelUsed", "predicted", "approved", "correctedAway", "addedByCoder")
+SELECT code, role, coalesce(model, ''), sum(predicted), sum(approved), sum(corrected_away), sum(added_by_coder)
+FROM events
+WHERE NOT EXISTS (SELECT 1 FROM "code_stats")
+GROUP BY code, role, coalesce(model, '');
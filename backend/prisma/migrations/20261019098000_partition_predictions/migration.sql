@@ -0,0 +1,93 @@
+-- Range-partition predictions by month of "createdAt".
+--
+-- The primary key of a partitioned table must contain the partition key, so
+-- it becomes ("id", "createdAt"); ids stay unique because they are generated.
+-- prediction_codes can no longer reference predictions(id) with a foreign
+-- key; scripts/manage_partitions.py removes its rows when archiving a month.
+--
+-- patient_cases is not partitioned: its unique contentHash/idempotencyKey
+-- constraints (duplicate upload detection) would have to include createdAt
+-- and so could no longer be enforced across months.
+
+CREATE OR REPLACE FUNCTION create_prediction_partition(month_start DATE) RETURNS TEXT AS $$
+DECLARE
+    partition_name TEXT := format('predictions_%s', to_char(month_start, 'YYYY_MM'));
+BEGIN
+    EXECUTE format(
+        'CREATE TABLE IF NOT EXISTS %I PARTITION OF "predictions" FOR VALUES FROM (%L) TO (%L)',
+        partition_name,
+        date_trunc('month', month_start)::date,
+        (date_trunc('month', month_start) + INTERVAL '1 month')::date
+    );
+    RETURN partition_name;
+END
+$$ LANGUAGE plpgsql;
+
+DO $$
+DECLARE
+    first_month DATE;
+    month DATE;
+BEGIN
+    IF (SELECT relkind FROM pg_class WHERE oid = '"predictions"'::regclass) = 'p' THEN
+        RETURN;  -- already partitioned
+    END IF;
+
+    ALTER TABLE "predictions" RENAME TO "predictions_unpartitioned";
+
+    CREATE TABLE "predictions" (LIKE "predictions_unpartitioned" INCLUDING DEFAULTS)
+        PARTITION BY RANGE ("createdAt");
+
+    SELECT coalesce(date_trunc('month', min("createdAt")), date_trunc('month', now()))::date
+    INTO first_month
+    FROM "predictions_unpartitioned";
+
+    month := first_month;
+    WHILE month <= (date_trunc('month', now()) + INTERVAL '3 months')::date LOOP
+        PERFORM create_prediction_partition(month);
+        month := (month + INTERVAL '1 month')::date;
+    END LOOP;
+
+    -- Safety net for rows outside the prepared months; kept empty by manage_partitions.py
+    CREATE TABLE IF NOT EXISTS "predictions_default" PARTITION OF "predictions" DEFAULT;
+
+    INSERT INTO "predictions" SELECT * FROM "predictions_unpartitioned";
+
+    DROP TABLE "predictions_unpartitioned" CASCADE;
+END
+$$;
+
+ALTER TABLE "prediction_codes" DROP CONSTRAINT IF EXISTS "prediction_codes_predictionId_fkey";
+
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'predictions_pkey') THEN
+        ALTER TABLE "predictions" ADD CONSTRAINT "predictions_pkey" PRIMARY KEY ("id", "createdAt");
+    END IF;
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'predictions_caseId_fkey') THEN
+        ALTER TABLE "predictions" ADD CONSTRAINT "predictions_caseId_fkey" FOREIGN KEY ("caseId")
+            REFERENCES "patient_cases"("id") ON DELETE CASCADE ON UPDATE CASCADE;
+    END IF;
+END
+$$;
+
+CREATE INDEX IF NOT EXISTS "predictions_caseId_createdAt_id_idx" ON "predictions"("caseId", "createdAt", "id");
+CREATE INDEX IF NOT EXISTS "predictions_validated_createdAt_id_idx" ON "predictions"("validated", "createdAt", "id");
+CREATE INDEX IF NOT EXISTS "predictions_createdAt_id_idx" ON "predictions"("createdAt", "id");
+CREATE INDEX IF NOT EXISTS "predictions_status_idx" ON "predictions"("status");
+CREATE INDEX IF NOT EXISTS "predictions_corrected_idx" ON "predictions"("corrected");
+CREATE INDEX IF NOT EXISTS "predictions_selectedCodes_idx"
+    ON "predictions" USING GIN ("selectedCodes" jsonb_path_ops);
+CREATE INDEX IF NOT EXISTS "predictions_secondaryCodes_idx"
+    ON "predictions" USING GIN ("secondaryCodes" jsonb_path_ops);
+CREATE INDEX IF NOT EXISTS "predictions_original_secondary_codes_idx"
+    ON "predictions" USING GIN ("original_secondary_codes" jsonb_path_ops);
+
+-- Months moved out of the database, one compressed JSON-lines blob each
+CREATE TABLE IF NOT EXISTS "prediction_archives" (
+    "month" DATE NOT NULL,
+    "blobHash" TEXT NOT NULL,
+    "rows" INTEGER NOT NULL,
+    "archivedAt" TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP,
+
+    CONSTRAINT "prediction_archives_pkey" PRIMARY KEY ("month")
+);
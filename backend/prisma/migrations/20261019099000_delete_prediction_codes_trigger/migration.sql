@@ -0,0 +1,26 @@
+-- Delete a prediction's codes with it.
+--
+-- prediction_codes lost its foreign key to predictions when predictions was
+-- partitioned (20261019098000_partition_predictions), and with it the
+-- ON DELETE CASCADE: deleting a case still deletes its predictions, through
+-- predictions_caseId_fkey, but left their codes behind. A row trigger on
+-- the partitioned table is cloned to every partition, present and future.
+--
+-- Archiving a month drops its partition, which fires no delete triggers;
+-- scripts/manage_partitions.py deletes those codes itself.
+
+CREATE OR REPLACE FUNCTION delete_prediction_codes() RETURNS TRIGGER AS $$
+BEGIN
+    DELETE FROM "prediction_codes" WHERE "predictionId" = OLD."id";
+    RETURN OLD;
+END
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS "predictions_delete_codes" ON "predictions";
+CREATE TRIGGER "predictions_delete_codes"
+    AFTER DELETE ON "predictions"
+    FOR EACH ROW EXECUTE FUNCTION delete_prediction_codes();
+
+-- Codes orphaned by cases deleted since the foreign key was dropped
+DELETE FROM "prediction_codes" c
+WHERE NOT EXISTS (SELECT 1 FROM "predictions" p WHERE p."id" = c."predictionId");
@@ -0,0 +1,101 @@
+"""Benchmark abbreviation expansion: regex function vs AbbreviationExpander
+
+Usage: python -m scripts.benchmark_abbreviations [cases_json] [repeats]
+
+Expands every case of cases_json (default data/patient_cases.json, all
+text fields joined) with
+
+- expand_medical_abbreviations as it is called today, which reads the
+  CSV and compiles its regex on every call
+- the same regex compiled once, to separate matching from setup
+- AbbreviationExpander (Aho-Corasick), built once
+
+checks all three give the same text and glossary, and reports throughput.
+Also times building the automaton from the CSV and loading it from disk.
+No database or API key is used.
+"""
+
+import json
+import re
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from app.abbreviations import DEFAULT_CSV_PATH, AbbreviationExpander  # noqa: E402
+from data.abbreviation_expander import expand_medical_abbreviations  # noqa: E402
+
+DEFAULT_CASES_PATH = Path(__file__).parent.parent / "data" / "patient_cases.json"
+
+TEXT_FIELDS = ["clinical_text", "biochemistry", "hematology", "microbiology", "medication"]
+
+
+def compiled_regex_expand(expander: AbbreviationExpander):
+    """expand_medical_abbreviations with its pattern and maps built once"""
+    keys = sorted(expander.expansions, key=len, reverse=True)
+    pattern = re.compile('|'.join(r'(?<!\w)' + re.escape(key) + r'(?!\w)' for key in keys), re.IGNORECASE)
+
+    def expand(text: str):
+        used = {}
+
+        def replace(match):
+            key = match.group().lower()
+            used[expander.canonical[key]] = expander.expansions[key]
+            return expander.expansions[key]
+
+        return pattern.sub(replace, text), used
+
+    return expand
+
+
+def _timed(expand, texts, repeats: int):
+    started = time.perf_counter()
+    for _ in range(repeats):
+        results = [expand(text) for text in texts]
+    return results, (time.perf_counter() - started) / repeats
+
+
+def main():
+    cases_path = Path(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_CASES_PATH
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+
+    with open(cases_path, encoding="utf-8") as f:
+        cases = json.load(f)
+    texts = ["\n".join(case.get(field) or "" for field in TEXT_FIELDS) for case in cases]
+    megabytes = sum(len(text.encode("utf-8")) for text in texts) / 1e6
+    print(f"{len(texts)} cases, {megabytes:.2f} MB of text, {repeats} repeats\n")
+
+    started = time.perf_counter()
+    expander = AbbreviationExpander.from_csv(DEFAULT_CSV_PATH)
+    build_time = time.perf_counter() - started
+    with tempfile.TemporaryDirectory() as tmp:
+        cache_path = Path(tmp) / "abbreviations.pkl"
+        expander.save(cache_path)
+        started = time.perf_counter()
+        AbbreviationExpander.load(cache_path)
+        load_time = time.perf_counter() - started
+    print(f"Automaton for {len(expander)} aliases: built from CSV in {build_time * 1000:.1f} ms, "
+          f"loaded from disk in {load_time * 1000:.1f} ms\n")
+
+    reference, _ = _timed(expand_medical_abbreviations, texts, 1)
+    runs = [
+        ("regex, built per call (current)", expand_medical_abbreviations, 1),
+        ("regex, compiled once", compiled_regex_expand(expander), repeats),
+        ("Aho-Corasick expander", expander.expand, repeats),
+    ]
+
+    print(f"{'method':<34} {'per case':>10} {'MB/s':>8} {'same':>6}")
+    for name, expand, run_repeats in runs:
+        results, elapsed = _timed(expand, texts, run_repeats)
+        print(
+            f"{name:<34} {elapsed / len(texts) * 1000:>8.2f}ms {megabytes / elapsed:>8.2f} "
+            f"{'yes' if results == reference else 'NO':>6}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Benchmark the lab part of the step-2 prompt: raw truncated text vs summary
+
+Usage: python -m scripts.benchmark_lab_summary [xml_dir]
+
+For every file in xml_dir (default preprocessing/input/xml_input) the
+upload is parsed and split like /api/predict/xml does (rule-based split,
+no LLM), then the biochemistry and hematology prompt sections are built
+both ways: the previous raw text cut at 3000/2000 characters, and the
+abnormal/trending summary. Reports prompt tokens of both and how many
+abnormal results the character cut dropped. Tokens are counted with
+tiktoken (cl100k_base) when installed, estimated as bytes / 4 otherwise.
+No database or API key is used.
+"""
+
+import sys
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from app.parsers.lab_results import flag, parse_lab_results, summarize_labs  # noqa: E402
+from app.parsers.lab_sections import separate_lab_sections  # noqa: E402
+from app.parsers.xml_parser import extract_structured  # noqa: E402
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+DEFAULT_XML_DIR = Path(__file__).parent.parent.parent / "preprocessing" / "input" / "xml_input"
+
+# Character limits step 2 applied to the raw sections
+RAW_LIMITS = {"biochemistry": 3000, "hematology": 2000}
+
+
+def _token_counter():
+    if tiktoken is None:
+        return lambda text: len(text.encode()) // 4, "estimated"
+    encoding = tiktoken.get_encoding("cl100k_base")
+    return lambda text: len(encoding.encode(text)), "cl100k_base"
+
+
+def _abnormal(text: str, section: str, sex) -> int:
+    return sum(1 for result in parse_lab_results(text, section) if flag(result, sex))
+
+
+def benchmark(xml_dir: Path = DEFAULT_XML_DIR):
+    paths = sorted(xml_dir.glob("*.xml"), key=lambda path: (len(path.stem), path.stem))
+    if not paths:
+        raise SystemExit(f"No XML files in {xml_dir}")
+    count_tokens, tokenizer = _token_counter()
+
+    totals = {"raw": 0, "summary": 0, "abnormal": 0, "dropped": 0, "summaries_cut": 0}
+    print(f"{'file':<10}{'raw tok':>9}{'summary tok':>13}{'abnormal':>10}{'cut by raw':>12}")
+    for path in paths:
+        extracted = extract_structured(path.read_text(encoding="utf-8"))
+        sections = separate_lab_sections(extracted["clinical_text"]).sections
+        sex = extracted["sex"]
+        summaries = summarize_labs(sections["biochemistry"], sections["hematology"], patient_sex=sex)
+
+        raw_tokens = summary_tokens = abnormal = dropped = 0
+        for section, limit in RAW_LIMITS.items():
+            text = sections[section]
+            if not text:
+                continue
+            raw_tokens += count_tokens(text[:limit])
+            summary_tokens += count_tokens(summaries[section][:limit])
+            totals["summaries_cut"] += len(summaries[section]) > limit
+            section_abnormal = _abnormal(text, section, sex)
+            abnormal += section_abnormal
+            dropped += section_abnormal - _abnormal(text[:limit], section, sex)
+
+        if not raw_tokens:
+            continue
+        print(f"{path.name:<10}{raw_tokens:>9}{summary_tokens:>13}{abnormal:>10}{dropped:>12}")
+        totals["raw"] += raw_tokens
+        totals["summary"] += summary_tokens
+        totals["abnormal"] += abnormal
+        totals["dropped"] += dropped
+
+    print()
+    print(f"Lab prompt tokens ({tokenizer}): {totals['raw']} raw -> {totals['summary']} summary "
+          f"({1 - totals['summary'] / totals['raw']:.0%} fewer)")
+    print(f"Abnormal results: {totals['abnormal']}, dropped by the raw character cut: {totals['dropped']}")
+    print(f"Summaries cut by the character limit: {totals['summaries_cut']}")
+
+
+if __name__ == "__main__":
+    benchmark(Path(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_XML_DIR)
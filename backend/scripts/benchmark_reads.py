@@ -0,0 +1,116 @@
+"""Benchmark hot read queries: Prisma vs the asyncpg fast path
+
+Usage: python -m scripts.benchmark_reads [requests] [concurrency]
+
+Runs the same database functions the API uses (case listing, prediction
+detail, code lookup and code usage) with reads routed through Prisma and
+then through the asyncpg pool, and reports throughput and latency
+percentiles. Requires asyncpg and a database with some cases and
+predictions.
+"""
+
+import asyncio
+import statistics
+import sys
+import time
+
+from dotenv import load_dotenv
+from loguru import logger
+
+load_dotenv()
+
+from app import fast_db  # noqa: E402
+from app.core.config import settings  # noqa: E402
+from app.database import (  # noqa: E402
+    connect_db,
+    db,
+    disconnect_db,
+    get_code_by_code,
+    get_code_usage,
+    get_prediction_with_case,
+    list_cases,
+)
+
+
+async def _sample_ids():
+    """Pick an existing prediction and code to look up"""
+    rows = await db.query_raw(
+        """
+        SELECT p.id AS "predictionId", pc.code
+        FROM predictions p
+        JOIN prediction_codes pc ON pc."predictionId" = p.id
+        ORDER BY p."createdAt" DESC
+        LIMIT 1
+        """
+    )
+    if not rows:
+        raise SystemExit("Need at least one completed prediction to benchmark")
+    return rows[0]["predictionId"], rows[0]["code"]
+
+
+async def _run(name: str, query, requests: int, concurrency: int) -> dict:
+    """Fire `requests` calls of `query` with at most `concurrency` in flight"""
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            start = time.perf_counter()
+            await query()
+            latencies.append(time.perf_counter() - start)
+
+    # Warm up connections and statement caches
+    await asyncio.gather(*(query() for _ in range(concurrency)))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "name": name,
+        "rps": requests / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+    }
+
+
+async def benchmark(requests: int = 500, concurrency: int = 20):
+    settings.FAST_READS = True
+    await connect_db()
+    if not fast_db.is_enabled():
+        raise SystemExit("asyncpg is not installed")
+
+    try:
+        prediction_id, code = await _sample_ids()
+        queries = {
+            "list_cases": lambda: list_cases(page=1, limit=20, with_total=False),
+            "list_cases(search)": lambda: list_cases(page=1, limit=20, search="pneumonie", with_total=False),
+            "prediction_detail": lambda: get_prediction_with_case(prediction_id),
+            "code_lookup": lambda: get_code_by_code(code),
+            "code_usage": lambda: get_code_usage(code),
+        }
+
+        pool = fast_db.pool
+        results = []
+        for name, query in queries.items():
+            fast_db.pool = None
+            prisma = await _run(name, query, requests, concurrency)
+            fast_db.pool = pool
+            fast = await _run(name, query, requests, concurrency)
+            results.append((prisma, fast))
+    finally:
+        await disconnect_db()
+
+    print(f"{requests} requests, concurrency {concurrency}")
+    print(f"{'query':<22}{'prisma rps':>12}{'p99 ms':>9}{'asyncpg rps':>13}{'p99 ms':>9}{'speedup':>9}")
+    for prisma, fast in results:
+        print(
+            f"{prisma['name']:<22}{prisma['rps']:>12.0f}{prisma['p99_ms']:>9.1f}"
+            f"{fast['rps']:>13.0f}{fast['p99_ms']:>9.1f}{fast['rps'] / prisma['rps']:>8.1f}x"
+        )
+    logger.info("Benchmark finished")
+
+
+if __name__ == "__main__":
+    asyncio.run(benchmark(*map(int, sys.argv[1:3])))
@@ -0,0 +1,132 @@
+"""Benchmark the rule-based DASTA extraction: whole tree vs streaming
+
+Usage: python -m scripts.benchmark_xml_parser [xml_dir] [repeats]
+
+Runs the previous approach (ET.fromstring plus one find() per field) and
+extract_structured over every file in xml_dir (default
+preprocessing/input/xml_input), checks both return the same fields, and
+reports time and peak allocated memory. Then inflates one sample with a
+growing number of extra lab reports to show how memory scales with
+document size. No database or API key is used.
+"""
+
+import re
+import sys
+import time
+import tracemalloc
+import xml.etree.ElementTree as ET
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from app.parsers.xml_parser import NAMESPACES, extract_structured  # noqa: E402
+
+DEFAULT_XML_DIR = Path(__file__).parent.parent.parent / "preprocessing" / "input" / "xml_input"
+
+# Extra copies of the report block appended to the inflated documents
+INFLATE_FACTORS = [1, 10, 100, 1000]
+
+_REPORT_BLOCK = re.compile(r"<dsip:ku_z\b.*?</dsip:ku_z>", re.S)
+
+
+def tree_extract(xml_content: str) -> dict:
+    """The previous extraction: build the whole tree, then search it per field"""
+    tree = ET.fromstring(xml_content)
+
+    def text(tag):
+        elem = tree.find(f".//dsip:{tag}", NAMESPACES)
+        return elem.text if elem is not None else None
+
+    ip = tree.find(".//dsip:ip", NAMESPACES)
+    ptext = tree.find(".//dsip:ptext", NAMESPACES)
+    return {
+        "birth_number": text("rodcis"),
+        "first_name": text("jmeno"),
+        "last_name": text("prijmeni"),
+        "dat_dn": text("dat_dn"),
+        "country_of_residence": text("stat_pris"),
+        "sex": text("sex"),
+        "patient_id": ip.get("id_pac") if ip is not None else None,
+        "medication": ", ".join(
+            lez.get("nazev_lek") for lez in tree.findall(".//dsip:lez", NAMESPACES) if lez.get("nazev_lek")
+        ),
+        "clinical_text": (ptext.text or "").strip() if ptext is not None else "",
+    }
+
+
+def _comparable(extracted: dict) -> dict:
+    fields = dict(extracted)
+    fields.pop("pac_id", None)
+    date_of_birth = fields.pop("date_of_birth", None)
+    if "dat_dn" not in fields:
+        fields["dat_dn"] = date_of_birth.strftime("%Y-%m-%d") if date_of_birth else None
+    return fields
+
+
+def _measure(extract, documents: list, repeats: int) -> tuple:
+    """(seconds per document, peak bytes allocated by one document)"""
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for document in documents:
+            extract(document)
+    per_document = (time.perf_counter() - start) / (repeats * len(documents))
+
+    peak = 0
+    for document in documents:
+        tracemalloc.start()
+        extract(document)
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    return per_document, peak
+
+
+def _inflate(document: str, factor: int) -> str:
+    """Append `factor` copies of the document's report block after it"""
+    block = _REPORT_BLOCK.search(document)
+    return document[:block.end()] + block.group(0) * factor + document[block.end():]
+
+
+def benchmark(xml_dir: Path = DEFAULT_XML_DIR, repeats: int = 20):
+    paths = sorted(xml_dir.glob("*.xml"))
+    if not paths:
+        raise SystemExit(f"No XML files in {xml_dir}")
+    documents = [path.read_text(encoding="utf-8") for path in paths]
+
+    mismatches = [
+        path.name for path, document in zip(paths, documents)
+        if _comparable(tree_extract(document)) != _comparable(extract_structured(document))
+    ]
+    if mismatches:
+        raise SystemExit(f"Extractors disagree on: {', '.join(mismatches)}")
+
+    total_kb = sum(len(document.encode()) for document in documents) / 1024
+    print(f"{len(documents)} files ({total_kb:.0f} KB), {repeats} repeats, outputs identical")
+    print(f"{'extractor':<12}{'ms/doc':>10}{'peak KB':>10}")
+    for name, extract in (("tree", tree_extract), ("streaming", extract_structured)):
+        seconds, peak = _measure(extract, documents, repeats)
+        print(f"{name:<12}{seconds * 1000:>10.3f}{peak / 1024:>10.0f}")
+
+    sample = max(documents, key=len)
+    print()
+    print("Inflated sample (extra report blocks)")
+    print(f"{'blocks':>8}{'size KB':>10}{'tree ms':>10}{'tree KB':>10}{'stream ms':>11}{'stream KB':>11}")
+    for factor in INFLATE_FACTORS:
+        document = _inflate(sample, factor)
+        runs = max(1, repeats // factor)
+        tree_seconds, tree_peak = _measure(tree_extract, [document], runs)
+        stream_seconds, stream_peak = _measure(extract_structured, [document], runs)
+        print(
+            f"{factor:>8}{len(document.encode()) / 1024:>10.0f}"
+            f"{tree_seconds * 1000:>10.1f}{tree_peak / 1024:>10.0f}"
+            f"{stream_seconds * 1000:>11.1f}{stream_peak / 1024:>11.0f}"
+        )
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    benchmark(
+        Path(args[0]) if args else DEFAULT_XML_DIR,
+        int(args[1]) if len(args) > 1 else 20,
+    )
@@ -0,0 +1,243 @@
+"""Convert a directory of DASTA XML files into a JSONL case corpus
+
+Usage:
+    python -m scripts.build_corpus [xml_dir] [output.jsonl] [--workers N] [--json cases.json] [--full]
+
+Walks xml_dir (default preprocessing/input/xml_input) recursively and
+writes one JSON line per patient block with the fields of
+data/patient_cases.json (pac_id, clinical_text, biochemistry,
+hematology, microbiology, medication) plus `source`, the file's path
+relative to xml_dir. Files are parsed on all cores with the app's own
+rule-based parser; lab sections are split by rules only, no LLM is called
+(files with a low-confidence split are counted in the manifest).
+
+Lines are appended as files finish, so an interrupted run keeps its
+progress. Next to the output, <output>.manifest.jsonl records size, mtime
+and SHA-256 of every converted file. A re-run skips files whose size and
+mtime are unchanged, or whose content hash is (touched but identical),
+drops the lines of changed and deleted files and converts only the rest.
+--full ignores the manifest. --json also writes the corpus as one JSON
+array without `source`, the format drg_naive_coder.py reads.
+--abbreviations adds an `abbreviations` field with the glossary of the
+abbreviations used in the narrative and microbiology (re-run with --full
+when toggling it).
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import time
+from multiprocessing import Pool
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from dotenv import load_dotenv
+from loguru import logger
+
+load_dotenv()
+
+from app.abbreviations import annotate_many, format_glossary, merge_glossaries  # noqa: E402
+from app.core.config import settings  # noqa: E402
+from app.parsers.lab_sections import separate_lab_sections  # noqa: E402
+from app.parsers.xml_parser import extract_patient_records  # noqa: E402
+
+DEFAULT_XML_DIR = Path(__file__).parent.parent.parent / "preprocessing" / "input" / "xml_input"
+DEFAULT_OUTPUT = Path(__file__).parent.parent / "data" / "patient_cases.jsonl"
+
+CORPUS_FIELDS = ["pac_id", "clinical_text", "biochemistry", "hematology", "microbiology", "medication"]
+
+# Files handed to a worker at a time
+CHUNK_SIZE = 8
+
+# Log progress every this many files
+PROGRESS_EVERY = 500
+
+
+def _convert(job: tuple) -> Dict:
+    """
+    Worker: hash one file and, unless the hash is `known_hash`, parse it
+
+    Returns the manifest entry with the file's records under 'records'
+    (None when unchanged).
+    """
+    source, path, known_hash, with_abbreviations = job
+    content = Path(path).read_bytes()
+    stat = os.stat(path)
+    entry = {
+        "source": source,
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "sha256": hashlib.sha256(content).hexdigest(),
+    }
+    if entry["sha256"] == known_hash:
+        entry["records"] = None
+        return entry
+
+    records = []
+    low_confidence = 0
+    try:
+        for patient in extract_patient_records(content):
+            if not patient["clinical_text"]:
+                continue
+            separation = separate_lab_sections(patient["clinical_text"])
+            if separation.confidence < settings.LAB_SEPARATOR_MIN_CONFIDENCE:
+                low_confidence += 1
+            records.append({
+                "source": source,
+                "pac_id": patient["pac_id"],
+                **separation.sections,
+                "medication": patient["medication"],
+            })
+            if with_abbreviations:
+                sections = separation.sections
+                records[-1]["abbreviations"] = format_glossary(
+                    merge_glossaries(annotate_many([sections["clinical_text"], sections["microbiology"]]))
+                )
+    except Exception as e:
+        entry["error"] = f"{type(e).__name__}: {e}"
+
+    entry.update(patients=len(records), low_confidence=low_confidence, records=records)
+    return entry
+
+
+def _read_jsonl(path: Path) -> List[Dict]:
+    if not path.exists():
+        return []
+    with path.open(encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _write_jsonl(path: Path, rows) -> None:
+    """Replace `path` atomically with `rows`"""
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    with tmp.open("w", encoding="utf-8") as f:
+        for row in rows:
+            f.write(json.dumps(row, ensure_ascii=False) + "\n")
+    os.replace(tmp, path)
+
+
+def _manifest_path(output: Path) -> Path:
+    return output.with_name(output.name + ".manifest.jsonl")
+
+
+def build_corpus(
+    xml_dir: Path = DEFAULT_XML_DIR,
+    output: Path = DEFAULT_OUTPUT,
+    workers: Optional[int] = None,
+    json_path: Optional[Path] = None,
+    full: bool = False,
+    abbreviations: bool = False,
+):
+    started = time.perf_counter()
+    files = {path.relative_to(xml_dir).as_posix(): path for path in sorted(xml_dir.rglob("*.xml"))}
+    logger.info(f"Found {len(files)} XML files in {xml_dir}")
+
+    manifest_path = _manifest_path(output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    if full:
+        manifest = {}
+    else:
+        # Later entries win; the log is compacted below
+        manifest = {entry["source"]: entry for entry in _read_jsonl(manifest_path)}
+
+    # Files with an unchanged size and mtime are skipped without reading them
+    jobs = []
+    kept = set()
+    for source, path in files.items():
+        entry = manifest.get(source)
+        stat = path.stat()
+        if entry and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+            kept.add(source)
+        else:
+            jobs.append((source, str(path), entry["sha256"] if entry else None, abbreviations))
+
+    # Drop lines of changed, deleted and half-written files; lines of files
+    # being re-hashed stay until the hash shows they changed
+    pending = {source for source, _, known, _ in jobs if known}
+    valid = kept | pending
+    lines = _read_jsonl(output)
+    if any(line["source"] not in valid for line in lines):
+        lines = [line for line in lines if line["source"] in valid]
+        _write_jsonl(output, lines)
+    previous_lines = len(lines)
+    _write_jsonl(manifest_path, (manifest[source] for source in sorted(valid)))
+    logger.info(f"{len(kept)} files unchanged, {len(jobs)} to check or convert")
+
+    converted = unchanged = failed = patients = low_confidence = 0
+    changed = set()
+    with Pool(workers) as pool, \
+            output.open("a", encoding="utf-8") as out, \
+            manifest_path.open("a", encoding="utf-8") as log:
+        for done, entry in enumerate(pool.imap_unordered(_convert, jobs, chunksize=CHUNK_SIZE), 1):
+            records = entry.pop("records")
+            if records is None:
+                unchanged += 1
+                entry = {**manifest[entry["source"]], **entry}
+            else:
+                if entry["source"] in pending:
+                    changed.add(entry["source"])
+                for record in records:
+                    out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                out.flush()
+                converted += 1
+                failed += "error" in entry
+                patients += entry["patients"]
+                low_confidence += entry["low_confidence"]
+                if "error" in entry:
+                    logger.warning(f"{entry['source']}: {entry['error']}")
+            # Written after the records, so a crash in between re-converts the file
+            log.write(json.dumps(entry) + "\n")
+            log.flush()
+
+            if done % PROGRESS_EVERY == 0:
+                rate = done / (time.perf_counter() - started)
+                logger.info(f"{done}/{len(jobs)} files ({rate:.0f}/s)")
+
+    if changed:
+        # Drop the old lines of files that turned out to have changed
+        _write_jsonl(output, [
+            line for position, line in enumerate(_read_jsonl(output))
+            if position >= previous_lines or line["source"] not in changed
+        ])
+    _write_jsonl(manifest_path, _latest(_read_jsonl(manifest_path)))
+
+    logger.info(
+        f"Converted {converted} files ({patients} patients, {failed} failed, "
+        f"{low_confidence} low-confidence lab splits), {unchanged} touched but unchanged, "
+        f"{len(kept)} skipped in {time.perf_counter() - started:.1f}s"
+    )
+
+    if json_path:
+        corpus = sorted(_read_jsonl(output), key=lambda line: line["source"])
+        with json_path.open("w", encoding="utf-8") as f:
+            json.dump(
+                [{key: line[key] for key in CORPUS_FIELDS + ["abbreviations"] if key in line} for line in corpus],
+                f, indent=2, ensure_ascii=False,
+            )
+        logger.info(f"Wrote {len(corpus)} cases to {json_path}")
+
+
+def _latest(entries: List[Dict]) -> List[Dict]:
+    """Last manifest entry per source"""
+    return list({entry["source"]: entry for entry in entries}.values())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert DASTA XML files into a JSONL case corpus")
+    parser.add_argument("xml_dir", nargs="?", type=Path, default=DEFAULT_XML_DIR)
+    parser.add_argument("output", nargs="?", type=Path, default=DEFAULT_OUTPUT)
+    parser.add_argument("--workers", type=int, help="Worker processes (default: all cores)")
+    parser.add_argument("--json", type=Path, dest="json_path", help="Also write the corpus as a JSON array")
+    parser.add_argument("--full", action="store_true", help="Ignore the manifest and convert every file")
+    parser.add_argument("--abbreviations", action="store_true", help="Add a glossary of the abbreviations used")
+    args = parser.parse_args()
+
+    build_corpus(
+        args.xml_dir, args.output,
+        workers=args.workers, json_path=args.json_path, full=args.full, abbreviations=args.abbreviations,
+    )
+
+
+if __name__ == "__main__":
+    main()
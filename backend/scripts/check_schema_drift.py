@@ -0,0 +1,56 @@
+"""Check that prisma/schema.prisma matches the database
+
+Usage:
+    python -m scripts.check_schema_drift
+
+Runs `prisma migrate diff` from the database at DIRECT_URL (DATABASE_URL
+if unset) to the schema and prints the SQL that would bring the database
+to the schema; exits with status 1 if there is any. Run it after applying
+a hand-written migration: the schema has to describe what the migration
+did, or the next `prisma migrate dev` tries to undo it.
+
+Objects Prisma does not model (partitions of predictions, functions,
+triggers) are not compared.
+"""
+
+import os
+import subprocess
+import sys
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "prisma", "schema.prisma")
+
+
+def main():
+    url = os.environ.get("DIRECT_URL") or os.environ.get("DATABASE_URL")
+    if not url:
+        raise SystemExit("Set DIRECT_URL or DATABASE_URL")
+
+    result = subprocess.run(
+        [
+            "prisma", "migrate", "diff",
+            "--from-url", url,
+            "--to-schema-datamodel", SCHEMA_PATH,
+            "--script",
+            "--exit-code",
+        ],
+        capture_output=True,
+        text=True,
+    )
+    # --exit-code: 0 no difference, 2 difference, anything else an error
+    if result.returncode == 0:
+        print("No drift: the database matches prisma/schema.prisma")
+        return
+    if result.returncode == 2:
+        print("The database differs from prisma/schema.prisma; migrate diff would run:\n")
+        print(result.stdout)
+        sys.exit(1)
+    sys.stderr.write(result.stderr or result.stdout)
+    sys.exit(result.returncode)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,103 +1,184 @@
-"""Load diagnosis codes from CSV into database"""
+"""Load diagnosis codes from CSV into database
 
+Usage: python -m scripts.load_diagnosis_codes [csv_path] [--dry-run] [--force]
+
+The CSV is streamed with COPY into a temporary staging table, then diffed
+against diagnosis_codes in one transaction:
+
+- new codes are inserted
+- renamed or recategorized codes are updated (and un-retired if needed)
+- codes missing from the CSV are retired (retiredAt set, rows kept so
+  existing predictions still resolve their names)
+
+If anything changed, a catalog_versions row is added; running API
+processes see the new version and drop their cached code lists. Re-running
+with an unchanged CSV is a no-op. Connects with asyncpg (a dependency of
+the backend) to DIRECT_URL.
+"""
+
+import argparse
 import asyncio
-import pandas as pd
+import os
+import time
 from pathlib import Path
+
+import asyncpg
+from dotenv import load_dotenv
 from loguru import logger
-from prisma import Prisma
 
+load_dotenv()
+
+from app.fast_db import asyncpg_dsn  # noqa: E402
+
+DEFAULT_CSV_PATH = Path(__file__).parent.parent / "data" / "diagnosis_codes.csv"
+
+# Refuse to retire more than this share of active codes unless --force,
+# which guards against loading a truncated or wrong file
+MAX_RETIRE_FRACTION = 0.05
 
-async def load_diagnosis_codes():
-    """Load all diagnosis codes from CSV into database"""
-    
-    # Load CSV
-    csv_path = Path(__file__).parent.parent / "data" / "diagnosis_codes.csv"
+
+class _DryRun(Exception):
+    """Raised inside the transaction to roll a dry run back"""
+
+
+def _row_count(status: str) -> int:
+    """Affected rows from a command status like 'INSERT 0 12' or 'UPDATE 3'"""
+    return int(status.split()[-1])
+
+
+async def load_diagnosis_codes(
+    csv_path: Path = DEFAULT_CSV_PATH,
+    dry_run: bool = False,
+    force: bool = False,
+):
+    """Apply the CSV catalog to diagnosis_codes"""
     logger.info(f"Loading diagnosis codes from {csv_path}")
-    
-    df = pd.read_csv(csv_path)
-    logger.info(f"Found {len(df)} codes in CSV")
-    
-    # Connect to database
-    db = Prisma()
-    await db.connect()
+    started = time.perf_counter()
+
+    conn = await asyncpg.connect(asyncpg_dsn(os.environ["DIRECT_URL"]))
     logger.info("Connected to database")
-    
+
     try:
-        # Extract ICD-10 chapter from code (first letter or letters)
-        def extract_chapter(code: str) -> str:
-            """Extract ICD-10 chapter from code (e.g., A000 -> A, I21.9 -> I)"""
-            if not code:
-                return "UNKNOWN"
-            # Take only letters at the start
-            chapter = ""
-            for char in code:
-                if char.isalpha():
-                    chapter += char
-                else:
-                    break
-            return chapter if chapter else "UNKNOWN"
-        
-        # Prepare data for bulk insert
-        codes_data = []
-        for _, row in df.iterrows():
-            code = str(row['Kod']).strip()
-            name = str(row['Nazev']).strip()
-            category = str(row['Kategorie']).strip() if pd.notna(row['Kategorie']) else None
-            chapter = extract_chapter(code)
-            
-            codes_data.append({
-                "code": code,
-                "name": name,
-                "category": category,
-                "chapter": chapter,
-            })
-        
-        # Bulk insert using raw SQL with batching
-        batch_size = 1000
-        total_inserted = 0
-        
-        for i in range(0, len(codes_data), batch_size):
-            batch = codes_data[i:i + batch_size]
-            
-            # Build values string for batch insert
-            values_list = []
-            for code_data in batch:
-                code = code_data['code'].replace("'", "''")  # Escape single quotes
-                name = code_data['name'].replace("'", "''")
-                category = code_data['category'].replace("'", "''") if code_data['category'] else None
-                chapter = code_data['chapter'].replace("'", "''")
-                
-                if category:
-                    values_list.append(f"(gen_random_uuid(), '{code}', '{name}', '{category}', '{chapter}', NOW())")
-                else:
-                    values_list.append(f"(gen_random_uuid(), '{code}', '{name}', NULL, '{chapter}', NOW())")
-            
-            values_str = ",\n".join(values_list)
-            
-            # Execute batch insert with ON CONFLICT DO NOTHING
-            sql = f"""
+        async with conn.transaction():
+            # Serialize concurrent loads
+            await conn.execute("SELECT pg_advisory_xact_lock(hashtext('diagnosis_codes_catalog'))")
+
+            await conn.execute(
+                """
+                CREATE TEMP TABLE diagnosis_codes_staging (
+                    code TEXT, name TEXT, category TEXT
+                ) ON COMMIT DROP
+                """
+            )
+            await conn.copy_to_table(
+                "diagnosis_codes_staging",
+                source=csv_path,
+                columns=["code", "name", "category"],
+                format="csv",
+                header=True,
+                encoding="utf-8",
+            )
+
+            # Normalize once: trimmed values, empty category as NULL, chapter = leading letters
+            await conn.execute(
+                """
+                CREATE TEMP TABLE diagnosis_codes_incoming ON COMMIT DROP AS
+                SELECT DISTINCT ON (code)
+                    code,
+                    btrim(name) AS name,
+                    nullif(btrim(category), '') AS category,
+                    coalesce(substring(code FROM '^[A-Za-z]+'), 'UNKNOWN') AS chapter
+                FROM (
+                    SELECT btrim(code) AS code, name, category FROM diagnosis_codes_staging
+                ) staged
+                WHERE code <> ''
+                ORDER BY code;
+
+                CREATE UNIQUE INDEX ON diagnosis_codes_incoming (code);
+                ANALYZE diagnosis_codes_incoming;
+                """
+            )
+            incoming = await conn.fetchval("SELECT count(*) FROM diagnosis_codes_incoming")
+            logger.info(f"Staged {incoming} codes")
+
+            inserted = _row_count(await conn.execute(
+                """
                 INSERT INTO diagnosis_codes (id, code, name, category, chapter, "createdAt")
-                VALUES {values_str}
-                ON CONFLICT (code) DO NOTHING
-            """
-            
-            try:
-                result = await db.execute_raw(sql)
-                total_inserted += len(batch)
-                logger.info(f"Progress: {min(i + batch_size, len(codes_data))}/{len(codes_data)} codes inserted")
-            except Exception as e:
-                logger.error(f"Error inserting batch at position {i}: {e}")
-        
-        logger.success(f"Successfully loaded {total_inserted} diagnosis codes into database")
-        
-        # Show some stats
-        total_count = await db.diagnosiscode.count()
-        logger.info(f"Total codes in database: {total_count}")
-        
+                SELECT gen_random_uuid()::text, i.code, i.name, i.category, i.chapter, now()
+                FROM diagnosis_codes_incoming i
+                WHERE NOT EXISTS (SELECT 1 FROM diagnosis_codes d WHERE d.code = i.code)
+                """
+            ))
+
+            updated = _row_count(await conn.execute(
+                """
+                UPDATE diagnosis_codes d
+                SET name = i.name,
+                    category = i.category,
+                    chapter = i.chapter,
+                    "updatedAt" = now(),
+                    "retiredAt" = NULL
+                FROM diagnosis_codes_incoming i
+                WHERE d.code = i.code
+                  AND (d.name, d.category, d.chapter, d."retiredAt" IS NOT NULL)
+                      IS DISTINCT FROM (i.name, i.category, i.chapter, false)
+                """
+            ))
+
+            active = await conn.fetchval(
+                'SELECT count(*) FROM diagnosis_codes WHERE "retiredAt" IS NULL'
+            )
+            retired = _row_count(await conn.execute(
+                """
+                UPDATE diagnosis_codes d
+                SET "retiredAt" = now()
+                WHERE d."retiredAt" IS NULL
+                  AND NOT EXISTS (SELECT 1 FROM diagnosis_codes_incoming i WHERE i.code = d.code)
+                """
+            ))
+
+            logger.info(f"Diff: {inserted} inserted, {updated} updated, {retired} retired")
+
+            if retired > active * MAX_RETIRE_FRACTION and not force:
+                raise SystemExit(
+                    f"Refusing to retire {retired} of {active} active codes; "
+                    f"check the CSV or re-run with --force"
+                )
+
+            if dry_run:
+                raise _DryRun()
+
+            if inserted or updated or retired:
+                version = await conn.fetchval(
+                    """
+                    INSERT INTO catalog_versions (source, inserted, updated, retired)
+                    VALUES ($1, $2, $3, $4)
+                    RETURNING version
+                    """,
+                    csv_path.name, inserted, updated, retired,
+                )
+                logger.success(f"Catalog version {version} committed")
+            else:
+                logger.info("Catalog unchanged, version not bumped")
+
+    except _DryRun:
+        logger.info("Dry run, changes rolled back")
     finally:
-        await db.disconnect()
+        await conn.close()
         logger.info("Disconnected from database")
 
+    logger.info(f"Finished in {time.perf_counter() - started:.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load the diagnosis code catalog")
+    parser.add_argument("csv_path", nargs="?", type=Path, default=DEFAULT_CSV_PATH)
+    parser.add_argument("--dry-run", action="store_true", help="Report the diff without committing it")
+    parser.add_argument("--force", action="store_true", help="Allow retiring many codes at once")
+    args = parser.parse_args()
+
+    asyncio.run(load_diagnosis_codes(args.csv_path, dry_run=args.dry_run, force=args.force))
+
 
 if __name__ == "__main__":
-    asyncio.run(load_diagnosis_codes())
+    main()
@@ -0,0 +1,182 @@
+"""Maintain the monthly partitions of the predictions table
+
+Usage:
+    python -m scripts.manage_partitions ensure [months_ahead]
+    python -m scripts.manage_partitions archive [older_than_months] [--dry-run]
+    python -m scripts.manage_partitions restore YYYY-MM
+
+ensure   creates partitions for the current and the next months so new
+         predictions never land in predictions_default. Run it daily
+         (e.g. from cron).
+archive  detaches each month older than the cutoff, stores its rows as a
+         compressed JSON-lines blob (see prediction_archives), removes the
+         month's prediction_codes rows and drops the partition.
+restore  re-creates an archived month's partition from its blob and
+         rebuilds its prediction_codes rows.
+"""
+
+import argparse
+import asyncio
+import json
+from datetime import date, timedelta
+
+from dotenv import load_dotenv
+from loguru import logger
+
+load_dotenv()
+
+from app.database import (  # noqa: E402
+    connect_db,
+    db,
+    disconnect_db,
+    get_blob,
+    put_blob,
+    sync_prediction_codes,
+)
+
+# Archiving copies a whole month inside one transaction
+ARCHIVE_TIMEOUT = timedelta(minutes=30)
+
+
+def _month_start(day: date, months_offset: int = 0) -> date:
+    month_index = day.year * 12 + day.month - 1 + months_offset
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+
+def _partition_name(month: date) -> str:
+    return f"predictions_{month:%Y_%m}"
+
+
+async def _monthly_partitions() -> list:
+    """(month, partition name) of all monthly partitions, oldest first"""
+    rows = await db.query_raw(
+        """
+        SELECT c.relname AS name
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = '"predictions"'::regclass
+          AND c.relname ~ '^predictions_[0-9]{4}_[0-9]{2}$'
+        ORDER BY c.relname
+        """
+    )
+    partitions = []
+    for row in rows:
+        year, month = row["name"].split("_")[1:]
+        partitions.append((date(int(year), int(month), 1), row["name"]))
+    return partitions
+
+
+async def ensure_partitions(months_ahead: int = 3):
+    """Create partitions from the current month up to `months_ahead` months ahead"""
+    today = date.today()
+    for offset in range(months_ahead + 1):
+        month = _month_start(today, offset)
+        await db.query_raw("SELECT create_prediction_partition($1::text::date) AS name", month.isoformat())
+    logger.info(f"Partitions ready through {_month_start(today, months_ahead):%Y-%m}")
+
+    stray = await db.query_raw('SELECT count(*) AS rows FROM "predictions_default"')
+    if stray[0]["rows"]:
+        logger.warning(
+            f"{stray[0]['rows']} predictions are in predictions_default; "
+            f"move them before creating partitions for their months"
+        )
+
+
+async def archive_partitions(older_than_months: int = 24, dry_run: bool = False):
+    """Move months older than the cutoff out of the database into blobs"""
+    cutoff = _month_start(date.today(), -older_than_months)
+    to_archive = [(month, name) for month, name in await _monthly_partitions() if month < cutoff]
+    if not to_archive:
+        logger.info(f"No partitions before {cutoff:%Y-%m}")
+        return
+
+    for month, name in to_archive:
+        if dry_run:
+            logger.info(f"Would archive {name}")
+            continue
+
+        async with db.tx(timeout=ARCHIVE_TIMEOUT) as tx:
+            await tx.execute_raw(f'ALTER TABLE "predictions" DETACH PARTITION "{name}"')
+            rows = await tx.query_raw(
+                f'SELECT row_to_json(t)::text AS row FROM "{name}" t ORDER BY t."createdAt", t.id'
+            )
+            blob_hash = await put_blob("\n".join(row["row"] for row in rows), client=tx)
+            await tx.execute_raw(
+                """
+                INSERT INTO prediction_archives (month, "blobHash", rows)
+                VALUES ($1::text::date, $2, $3)
+                """,
+                month.isoformat(), blob_hash, len(rows),
+            )
+            await tx.execute_raw(
+                f'DELETE FROM prediction_codes WHERE "predictionId" IN (SELECT id FROM "{name}")'
+            )
+            await tx.execute_raw(f'DROP TABLE "{name}"')
+
+        logger.info(f"Archived {name}: {len(rows)} predictions -> blob {blob_hash[:12]}")
+
+
+async def restore_partition(month: date):
+    """Bring an archived month back into the predictions table"""
+    archives = await db.query_raw(
+        'SELECT "blobHash", rows FROM prediction_archives WHERE month = $1::text::date',
+        month.isoformat(),
+    )
+    if not archives:
+        raise SystemExit(f"No archive for {month:%Y-%m}")
+
+    content = await get_blob(archives[0]["blobHash"])
+    records = [json.loads(line) for line in content.splitlines() if line]
+
+    async with db.tx(timeout=ARCHIVE_TIMEOUT) as tx:
+        await tx.query_raw("SELECT create_prediction_partition($1::text::date) AS name", month.isoformat())
+        await tx.execute_raw(
+            """
+            INSERT INTO predictions
+            SELECT r.* FROM jsonb_array_elements($1::jsonb) AS e,
+                 LATERAL jsonb_populate_record(NULL::predictions, e) AS r
+            """,
+            json.dumps(records),
+        )
+        for record in records:
+            await sync_prediction_codes(
+                record["id"],
+                record["mainCode"],
+                record["mainConfidence"],
+                record["secondaryCodes"],
+                client=tx,
+            )
+        await tx.execute_raw(
+            "DELETE FROM prediction_archives WHERE month = $1::text::date",
+            month.isoformat(),
+        )
+
+    logger.info(f"Restored {len(records)} predictions of {month:%Y-%m}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Maintain monthly prediction partitions")
+    commands = parser.add_subparsers(dest="command", required=True)
+    ensure = commands.add_parser("ensure")
+    ensure.add_argument("months_ahead", nargs="?", type=int, default=3)
+    archive = commands.add_parser("archive")
+    archive.add_argument("older_than_months", nargs="?", type=int, default=24)
+    archive.add_argument("--dry-run", action="store_true")
+    restore = commands.add_parser("restore")
+    restore.add_argument("month", help="YYYY-MM")
+    args = parser.parse_args()
+
+    await connect_db()
+    try:
+        if args.command == "ensure":
+            await ensure_partitions(args.months_ahead)
+        elif args.command == "archive":
+            await archive_partitions(args.older_than_months, dry_run=args.dry_run)
+        else:
+            await restore_partition(date.fromisoformat(f"{args.month}-01"))
+    finally:
+        await disconnect_db()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,78 @@
+"""Move inline raw XML and case sections into compressed blobs
+
+Usage: python -m scripts.move_case_documents_to_blobs [batch_size]
+
+Safe to re-run: only cases that still carry inline documents are touched.
+"""
+
+import asyncio
+import sys
+
+from dotenv import load_dotenv
+from loguru import logger
+
+load_dotenv()
+
+from app.database import (  # noqa: E402
+    CASE_SECTION_FIELDS,
+    connect_db,
+    db,
+    disconnect_db,
+    put_blob,
+    put_case_sections,
+)
+
+
+async def move_case_documents(batch_size: int = 200):
+    """Move inline documents of all cases to blobs, batch by batch"""
+    await connect_db()
+
+    moved = 0
+    try:
+        while True:
+            cases = await db.query_raw(
+                """
+                SELECT id, "rawXml", "rawXmlBlob", "sectionsBlob",
+                       biochemistry, hematology, microbiology, medication
+                FROM patient_cases
+                WHERE "rawXml" IS NOT NULL
+                   OR biochemistry IS NOT NULL OR hematology IS NOT NULL
+                   OR microbiology IS NOT NULL OR medication IS NOT NULL
+                ORDER BY id
+                LIMIT $1
+                """,
+                batch_size,
+            )
+            if not cases:
+                break
+
+            for case in cases:
+                raw_xml_blob = case["rawXmlBlob"]
+                if case["rawXml"] is not None:
+                    raw_xml_blob = await put_blob(case["rawXml"])
+
+                sections_blob = case["sectionsBlob"]
+                if any(case[field] is not None for field in CASE_SECTION_FIELDS):
+                    sections_blob = await put_case_sections(case)
+
+                await db.patientcase.update(
+                    where={"id": case["id"]},
+                    data={
+                        "rawXmlBlob": raw_xml_blob,
+                        "sectionsBlob": sections_blob,
+                        "rawXml": None,
+                        **{field: None for field in CASE_SECTION_FIELDS},
+                    },
+                )
+
+            moved += len(cases)
+            logger.info(f"Moved documents of {moved} cases")
+    finally:
+        await disconnect_db()
+
+    logger.info(f"Done: {moved} cases now read their documents from blobs")
+    logger.info("Run VACUUM (FULL) patient_cases to return the freed space to the OS")
+
+
+if __name__ == "__main__":
+    asyncio.run(move_case_documents(*map(int, sys.argv[1:2])))
@@ -42,10 +42,10 @@ export default function ApprovePage() {
     setCollapsed(prev => ({ ...prev, [section]: !prev[section] }));
   };
 
-  // Fetch unvalidated predictions
+  // Fetch unvalidated predictions; all_time so older unreviewed ones stay in the queue
   const { data: predictionsData, isLoading } = useQuery({
     queryKey: ['predictions', 'unvalidated'],
-    queryFn: () => api.listPredictions({ page: 1, limit: 100 }),
+    queryFn: () => api.listPredictions({ page: 1, limit: 100, all_time: true }),
     refetchInterval: 30000, // Refresh every 30s
   });
 
@@ -125,6 +125,7 @@ export function PredictionsDatabase() {
     },
   });
 
+  // Newest 50 within the default recent window, which reads the newest partitions only
   const { data: predictionsData, isLoading } = useQuery({
     queryKey: ['predictions'],
     queryFn: async () => {
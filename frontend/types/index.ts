@@ -127,17 +127,48 @@ export interface FeedbackSubmission {
   feedback_comment?: string;
 }
 
+// Case in list view (matches backend CaseListItem)
+export interface CaseListItem {
+  id: string;
+  pac_id?: string;
+  patient_id: string;
+  first_name?: string;
+  last_name?: string;
+  admission_date?: string;
+  discharge_date?: string;
+  clinical_text_preview: string;
+  created_at: string;
+  predictions_count: number;
+}
+
 // Paginated responses (matches backend)
+// total/pages are null when the count was skipped (cursor requests);
+// pass next_cursor as ?cursor= to fetch the following page
+// Query parameters of GET /api/predictions. Only the last
+// RECENT_PREDICTIONS_DAYS (180) are listed unless all_time is set
+// or the listing is for one case
+export interface ListPredictionsParams {
+  page?: number;
+  limit?: number;
+  case_id?: string;
+  validated?: boolean;
+  cursor?: string;
+  include_total?: boolean;
+  all_time?: boolean;
+}
+
 export interface PaginatedPredictions {
   predictions: PredictionListItem[];
-  total: number;
+  total: number | null;
   page: number;
-  pages: number;
+  pages: number | null;
+  next_cursor?: string | null;
 }
 
 export interface PaginatedCases {
-  cases: PatientCase[];
-  total: number;
+  cases: CaseListItem[];
+  total: number | null;
   page: number;
-  pages: number;
+  pages: number | null;
+  next_cursor?: string | null;
 }
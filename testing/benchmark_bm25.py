@@ -0,0 +1,112 @@
+"""
+Benchmark BM25: rank_bm25's BM25Okapi vs the sparse matrix index
+
+Usage:
+    python testing/benchmark_bm25.py [--csv diagnosis_codes.csv] [--queries N] [--top-k K]
+
+Indexes the Nazev column of the catalog (default backend/data/diagnosis_codes.csv,
+no embedding model or API key needed) and queries it with a few words drawn
+from random catalog names, like the short segments of run_segmented_search.py.
+Reports build and load time, per-query latency of SparseBM25 one query at
+a time and in batches, and, if rank_bm25 is installed, its latency and the
+largest score difference between the two (they should agree up to float32
+rounding; ties may be ordered differently in top-k).
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from testing.bm25_index import SparseBM25, tokenize
+
+try:
+    from rank_bm25 import BM25Okapi
+except ImportError:
+    BM25Okapi = None
+
+DEFAULT_CSV_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend", "data", "diagnosis_codes.csv"
+)
+
+BATCH_SIZE = 64
+
+# rank_bm25 is slow; it is timed on this many queries only
+REFERENCE_QUERIES = 50
+
+
+def _queries(documents, n_queries, rng):
+    queries = []
+    while len(queries) < n_queries:
+        tokens = tokenize(documents[rng.integers(len(documents))])
+        if tokens:
+            picked = rng.choice(len(tokens), size=min(3, len(tokens)), replace=False)
+            queries.append(" ".join(tokens[i] for i in sorted(picked)))
+    return queries
+
+
+def _ms_per_query(run, queries, batch_size):
+    started = time.perf_counter()
+    for i in range(0, len(queries), batch_size):
+        run(queries[i:i + batch_size])
+    return (time.perf_counter() - started) / len(queries) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark rank_bm25 vs sparse matrix BM25")
+    parser.add_argument("--csv", default=DEFAULT_CSV_PATH)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--top-k", type=int, default=20)
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.csv)
+    documents = df['Nazev'].fillna('').tolist()
+    ids = df['Kod'].tolist()
+    queries = _queries(documents, args.queries, np.random.default_rng(0))
+
+    started = time.perf_counter()
+    index = SparseBM25.build(documents, ids)
+    build_time = time.perf_counter() - started
+    with tempfile.TemporaryDirectory() as tmp:
+        index.save(tmp)
+        started = time.perf_counter()
+        index = SparseBM25.load(tmp)
+        load_time = time.perf_counter() - started
+    print(f"{len(documents)} documents, {len(index.vocab)} terms, {index.weights.nnz} entries; "
+          f"built in {build_time * 1000:.0f} ms, loaded in {load_time * 1000:.0f} ms")
+    print(f"{len(queries)} queries, top {args.top_k}\n")
+
+    print(f"{'method':<30} {'ms/query':>10}")
+    if BM25Okapi is not None:
+        started = time.perf_counter()
+        reference = BM25Okapi([tokenize(document) for document in documents])
+        print(f"{'rank_bm25 build':<30} {(time.perf_counter() - started) * 1000:>8.0f}ms (total)")
+        sample = queries[:REFERENCE_QUERIES]
+        ms = _ms_per_query(
+            lambda batch: [reference.get_top_n(tokenize(query), ids, n=args.top_k) for query in batch], sample, 1,
+        )
+        print(f"{'rank_bm25 get_top_n':<30} {ms:>10.3f}")
+
+    ms = _ms_per_query(lambda batch: index.top_n(batch, n=args.top_k), queries, 1)
+    print(f"{'sparse, 1 query at a time':<30} {ms:>10.3f}")
+    ms = _ms_per_query(lambda batch: index.top_n(batch, n=args.top_k), queries, BATCH_SIZE)
+    print(f"{f'sparse, batches of {BATCH_SIZE}':<30} {ms:>10.3f}")
+
+    if BM25Okapi is not None:
+        scores = index.get_scores(sample)
+        difference = max(
+            np.abs(reference.get_scores(tokenize(query)) - row).max() for query, row in zip(sample, scores)
+        )
+        print(f"\nLargest score difference vs rank_bm25 over {len(sample)} queries: {difference:.2e}")
+    else:
+        print("\nrank_bm25 not installed, skipped the comparison")
+
+
+if __name__ == "__main__":
+    main()
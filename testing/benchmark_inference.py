@@ -0,0 +1,164 @@
+"""
+Benchmark the inference backends (inference_backend.py): torch vs onnx-int8
+
+Usage:
+    python testing/benchmark_inference.py [--backends torch onnx-int8] [--threads N]
+        [--queries N] [--candidates K] [--batch-size N]
+
+Queries are segments of the clinical texts in backend/data/patient_cases.json
+(split like run_segmented_search.py), candidates random catalog names. For
+each backend, in a fresh process so memory is its own, reports model load
+time, peak RSS, single-query latency (p50 / p95) and batched throughput of
+the embedding model (encode) and the cross-encoder (predict, one query
+against K candidates). Models are config.EMBEDDING_MODEL_NAME and
+config.CROSS_ENCODER_MODEL_NAME.
+
+Outputs of every backend are then checked against the first: lowest
+cosine similarity of the query embeddings and Spearman correlation of the
+cross-encoder scores, against EMBEDDING_MIN_COSINE and
+CROSS_ENCODER_MIN_SPEARMAN. Exits with status 1 when a check fails.
+Exports are made before timing, so they do not count towards load time or RSS.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import re
+import resource
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from embeds import config
+from testing.inference_backend import (
+    BACKENDS,
+    CROSS_ENCODER_MIN_SPEARMAN,
+    EMBEDDING_MIN_COSINE,
+    embedding_agreement,
+    ensure_onnx_int8,
+    load_model,
+    score_agreement,
+)
+
+CASES_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend", "data", "patient_cases.json"
+)
+
+
+def _peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _latencies(run, items):
+    """ms per call of run(item), after one warm-up call"""
+    run(items[0])
+    times = []
+    for item in items:
+        started = time.perf_counter()
+        run(item)
+        times.append((time.perf_counter() - started) * 1000)
+    return np.percentile(times, 50), np.percentile(times, 95)
+
+
+def _run_backend(job):
+    """Child process: load both models on one backend and time them"""
+    backend, threads, queries, candidates, batch_size = job
+    result = {"backend": backend}
+
+    started = time.perf_counter()
+    embed_model = load_model("embedding", config.EMBEDDING_MODEL_NAME, backend=backend, threads=threads)
+    cross_encoder = load_model("cross-encoder", config.CROSS_ENCODER_MODEL_NAME, backend=backend, threads=threads)
+    result["load_s"] = time.perf_counter() - started
+    result["rss_loaded_mb"] = _peak_rss_mb()
+
+    result["embed_p50"], result["embed_p95"] = _latencies(lambda query: embed_model.encode(query), queries)
+    started = time.perf_counter()
+    embeddings = embed_model.encode(queries, batch_size=batch_size, convert_to_numpy=True)
+    result["embed_per_s"] = len(queries) / (time.perf_counter() - started)
+
+    def rerank(query):
+        return cross_encoder.predict([[query, name] for name in candidates], batch_size=batch_size)
+
+    result["rerank_p50"], result["rerank_p95"] = _latencies(rerank, queries)
+    pairs = [[query, name] for query in queries for name in candidates]
+    started = time.perf_counter()
+    scores = cross_encoder.predict(pairs, batch_size=batch_size)
+    result["pairs_per_s"] = len(pairs) / (time.perf_counter() - started)
+
+    result["rss_peak_mb"] = _peak_rss_mb()
+    result["embeddings"] = np.asarray(embeddings, dtype=np.float32)
+    result["scores"] = np.asarray(scores, dtype=np.float32)
+    return result
+
+
+def _queries(n_queries):
+    with open(CASES_PATH, encoding="utf-8") as f:
+        cases = json.load(f)
+    segments = []
+    for case in cases:
+        segments += [segment.strip() for segment in re.split(r'[.,;\n]+', case.get("clinical_text") or "")]
+    segments = [segment for segment in segments if len(segment) > 3]
+    rng = np.random.default_rng(0)
+    return [segments[i] for i in rng.choice(len(segments), size=min(n_queries, len(segments)), replace=False)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark torch vs quantized ONNX inference")
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=list(BACKENDS))
+    parser.add_argument("--threads", type=int, default=getattr(config, "INFERENCE_THREADS", None))
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--candidates", type=int, default=20, help="Catalog names reranked per query")
+    parser.add_argument("--batch-size", type=int, default=64)
+    args = parser.parse_args()
+
+    queries = _queries(args.queries)
+    names = pd.read_csv(config.CSV_PATH)['Nazev'].dropna().tolist()
+    rng = np.random.default_rng(1)
+    candidates = [names[i] for i in rng.choice(len(names), size=args.candidates, replace=False)]
+    print(f"{len(queries)} queries, {len(candidates)} candidates each, "
+          f"{args.threads or os.cpu_count()} threads, batch size {args.batch_size}")
+
+    if "onnx-int8" in args.backends:
+        ensure_onnx_int8("embedding", config.EMBEDDING_MODEL_NAME)
+        ensure_onnx_int8("cross-encoder", config.CROSS_ENCODER_MODEL_NAME)
+
+    # One process per backend, so RSS and thread pools are not shared
+    context = multiprocessing.get_context("spawn")
+    results = []
+    for backend in args.backends:
+        with context.Pool(1) as pool:
+            results.append(pool.apply(_run_backend, ((backend, args.threads, queries, candidates, args.batch_size),)))
+
+    print(f"\n{'backend':<10} {'load':>7} {'RSS':>8} {'peak':>8} "
+          f"{'embed p50/p95':>15} {'embed/s':>8} {'rerank p50/p95':>16} {'pairs/s':>8}")
+    for r in results:
+        print(
+            f"{r['backend']:<10} {r['load_s']:>6.1f}s {r['rss_loaded_mb']:>6.0f}MB {r['rss_peak_mb']:>6.0f}MB "
+            f"{r['embed_p50']:>6.1f}/{r['embed_p95']:<6.1f}ms {r['embed_per_s']:>8.0f} "
+            f"{r['rerank_p50']:>6.1f}/{r['rerank_p95']:<7.1f}ms {r['pairs_per_s']:>8.0f}"
+        )
+
+    failed = False
+    reference = results[0]
+    for r in results[1:]:
+        cosine = embedding_agreement(reference["embeddings"], r["embeddings"])
+        spearman, max_difference = score_agreement(reference["scores"], r["scores"])
+        ok = cosine >= EMBEDDING_MIN_COSINE and spearman >= CROSS_ENCODER_MIN_SPEARMAN
+        failed |= not ok
+        print(
+            f"\n{r['backend']} vs {reference['backend']}: lowest embedding cosine {cosine:.4f} "
+            f"(min {EMBEDDING_MIN_COSINE}), score Spearman {spearman:.4f} (min {CROSS_ENCODER_MIN_SPEARMAN}), "
+            f"largest score difference {max_difference:.4f}: {'OK' if ok else 'OUT OF TOLERANCE'}"
+        )
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
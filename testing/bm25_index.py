@@ -0,0 +1,158 @@
+"""
+BM25 over a precomputed sparse term-document matrix (replaces rank_bm25)
+
+Scores are those of rank_bm25's BM25Okapi (same k1, b, epsilon floor for
+negative idf, repeated query terms counted again), but all the per-term
+work is done once at build time: the matrix holds idf * tf * (k1 + 1) /
+(tf + k1 * (1 - b + b * dl / avgdl)) for every (term, document), so a
+batch of queries is scored by one sparse product of their term counts
+with it, and top-k is taken with argpartition.
+
+On-disk layout of an index directory:
+    weights.npz   CSR matrix (terms x documents), scipy.sparse.save_npz
+    vocab.json    term of each matrix row
+    ids.json      id of each document
+    meta.json     parameters and a hash of the documents, to detect a stale index
+"""
+
+import hashlib
+import json
+import os
+import re
+from collections import Counter
+
+import numpy as np
+from scipy import sparse
+
+# Where HybridRetriever keeps its BM25 index
+DEFAULT_INDEX_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "catalog_bm25")
+
+# BM25Okapi defaults
+K1 = 1.5
+B = 0.75
+EPSILON = 0.25
+
+
+def tokenize(text):
+    """Lowercase alphanumeric tokens (the tokenizer HybridRetriever always used)"""
+    return re.findall(r'\w+', text.lower())
+
+
+def documents_hash(documents, ids):
+    digest = hashlib.sha256()
+    for doc_id, document in zip(ids, documents):
+        digest.update(f"{doc_id}\t{document}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+class SparseBM25:
+    def __init__(self, weights, vocab, ids, meta=None):
+        self.weights = weights
+        self.vocab = vocab
+        self.term_rows = {term: row for row, term in enumerate(vocab)}
+        self.ids = ids
+        self.meta = meta or {}
+
+    @classmethod
+    def build(cls, documents, ids, k1=K1, b=B, epsilon=EPSILON):
+        """Index `documents` (strings, tokenized with tokenize) under `ids`"""
+        term_rows = {}
+        rows, cols, counts = [], [], []
+        doc_len = np.zeros(len(documents), dtype=np.float64)
+        for col, document in enumerate(documents):
+            tokens = tokenize(document)
+            doc_len[col] = len(tokens)
+            for term, count in Counter(tokens).items():
+                rows.append(term_rows.setdefault(term, len(term_rows)))
+                cols.append(col)
+                counts.append(count)
+
+        tf = sparse.csr_matrix(
+            (np.asarray(counts, dtype=np.float64), (rows, cols)),
+            shape=(len(term_rows), len(documents)),
+        )
+
+        # idf with BM25Okapi's floor for terms in more than half the documents
+        n_docs = len(documents)
+        doc_freq = np.diff(tf.indptr)
+        idf = np.log(n_docs - doc_freq + 0.5) - np.log(doc_freq + 0.5)
+        idf[idf < 0] = epsilon * idf.mean()
+
+        # Term saturation and length normalization, per stored entry
+        avgdl = doc_len.sum() / n_docs
+        norm = k1 * (1 - b + b * doc_len / avgdl)
+        tf_values = tf.data
+        entry_docs = tf.indices
+        entry_terms = np.repeat(np.arange(len(term_rows)), doc_freq)
+        tf.data = idf[entry_terms] * tf_values * (k1 + 1) / (tf_values + norm[entry_docs])
+
+        vocab = [None] * len(term_rows)
+        for term, row in term_rows.items():
+            vocab[row] = term
+        meta = {
+            "k1": k1, "b": b, "epsilon": epsilon,
+            "documents": n_docs, "terms": len(vocab),
+            "documents_hash": documents_hash(documents, ids),
+        }
+        return cls(tf.astype(np.float32), vocab, list(ids), meta)
+
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+        sparse.save_npz(os.path.join(path, "weights.npz"), self.weights)
+        with open(os.path.join(path, "vocab.json"), "w", encoding="utf-8") as f:
+            json.dump(self.vocab, f, ensure_ascii=False)
+        with open(os.path.join(path, "ids.json"), "w") as f:
+            json.dump(self.ids, f)
+        with open(os.path.join(path, "meta.json"), "w") as f:
+            json.dump(self.meta, f, indent=2)
+
+    @classmethod
+    def load(cls, path):
+        weights = sparse.load_npz(os.path.join(path, "weights.npz")).tocsr()
+        with open(os.path.join(path, "vocab.json"), encoding="utf-8") as f:
+            vocab = json.load(f)
+        with open(os.path.join(path, "ids.json")) as f:
+            ids = json.load(f)
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        return cls(weights, vocab, ids, meta)
+
+    @classmethod
+    def load_or_build(cls, path, documents, ids):
+        """Load the index at `path` if it was built from these documents, else build and save it"""
+        if os.path.exists(os.path.join(path, "meta.json")):
+            index = cls.load(path)
+            if index.meta.get("documents_hash") == documents_hash(documents, ids):
+                return index
+            print("BM25 index is stale, rebuilding...")
+        index = cls.build(documents, ids)
+        index.save(path)
+        return index
+
+    def query_matrix(self, queries):
+        """Sparse (n_queries x terms) matrix of query term counts; unknown terms are dropped"""
+        rows, cols = [], []
+        for row, query in enumerate(queries):
+            for term in tokenize(query):
+                col = self.term_rows.get(term)
+                if col is not None:
+                    rows.append(row)
+                    cols.append(col)
+        # Duplicate (row, col) entries are summed: repeated terms count again
+        return sparse.csr_matrix(
+            (np.ones(len(rows), dtype=np.float32), (rows, cols)),
+            shape=(len(queries), len(self.vocab)),
+        )
+
+    def get_scores(self, queries):
+        """Dense (n_queries x documents) scores, one sparse product for the batch"""
+        return (self.query_matrix(queries) @ self.weights).toarray()
+
+    def top_n(self, queries, n=20):
+        """Ids of the n best documents per query, best first"""
+        scores = self.get_scores(queries)
+        n = min(n, scores.shape[1])
+        top = np.argpartition(-scores, n - 1, axis=1)[:, :n]
+        order = np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1, kind="stable")
+        top = np.take_along_axis(top, order, axis=1)
+        return [[self.ids[col] for col in row] for row in top]
@@ -0,0 +1,65 @@
+"""
+Embed all catalog descriptions (Nazev) and write the local vector index
+
+Usage: python testing/build_vector_index.py [--output DIR] [--batch-size N] [--hnsw] [--backend B]
+
+Uses config.EMBEDDING_MODEL_NAME, the model HybridRetriever encodes
+queries with. The index goes to config.VECTOR_INDEX_DIR if set, else
+testing/catalog_index. --hnsw also builds the approximate graph (needs
+hnswlib). --backend is the inference backend (inference_backend.py,
+default config.INFERENCE_BACKEND); index with the one queries will use.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import pandas as pd
+
+# Add project root to path to allow imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from embeds import config
+from testing.inference_backend import BACKENDS, DEFAULT_BACKEND, load_model
+from testing.vector_index import DEFAULT_INDEX_DIR, VectorIndex
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the local catalog vector index")
+    parser.add_argument("--output", default=getattr(config, "VECTOR_INDEX_DIR", DEFAULT_INDEX_DIR))
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--hnsw", action="store_true", help="Also build an HNSW graph (needs hnswlib)")
+    parser.add_argument("--backend", choices=BACKENDS, default=getattr(config, "INFERENCE_BACKEND", DEFAULT_BACKEND))
+    args = parser.parse_args()
+
+    df = pd.read_csv(config.CSV_PATH)
+    df['Nazev'] = df['Nazev'].fillna('')
+    print(f"Embedding {len(df)} descriptions with {config.EMBEDDING_MODEL_NAME} ({args.backend})...")
+
+    model = load_model(
+        "embedding", config.EMBEDDING_MODEL_NAME,
+        backend=args.backend, threads=getattr(config, "INFERENCE_THREADS", None),
+    )
+    started = time.perf_counter()
+    embeddings = model.encode(
+        df['Nazev'].tolist(),
+        batch_size=args.batch_size,
+        show_progress_bar=True,
+        convert_to_numpy=True,
+    )
+    print(f"Embedded in {time.perf_counter() - started:.0f}s, dim {embeddings.shape[1]}")
+
+    index = VectorIndex.build(
+        embeddings,
+        df['Kod'].tolist(),
+        args.output,
+        model_name=config.EMBEDDING_MODEL_NAME,
+        with_hnsw=args.hnsw,
+    )
+    size = os.path.getsize(os.path.join(args.output, "vectors.npy")) / 1e6
+    print(f"Wrote {len(index)} vectors ({size:.0f} MB float16) to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
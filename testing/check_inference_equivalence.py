@@ -0,0 +1,83 @@
+"""
+Check that the onnx-int8 backend agrees with torch on fixed inputs
+
+Usage:
+    python testing/check_inference_equivalence.py [--threads N]
+
+Encodes a few fixed clinical phrases with the embedding model and scores
+fixed query-name pairs with the cross-encoder (config.EMBEDDING_MODEL_NAME
+and config.CROSS_ENCODER_MODEL_NAME) on both backends, then checks every
+embedding pair against EMBEDDING_MIN_COSINE and the cross-encoder scores
+against CROSS_ENCODER_MIN_SPEARMAN. Prints the measured values and exits
+with status 1 when a check fails. Needs no data files; run it after
+changing the export or quantization settings. benchmark_inference.py runs
+the same checks on sampled cases, with timings.
+"""
+
+import argparse
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from embeds import config
+from testing.inference_backend import (
+    CROSS_ENCODER_MIN_SPEARMAN,
+    EMBEDDING_MIN_COSINE,
+    embedding_agreement,
+    load_model,
+    score_agreement,
+)
+
+QUERIES = [
+    "Akutní infarkt myokardu přední stěny, PCI s implantací stentu",
+    "Pneumonie vlevo, CRP 180 mg/l, leukocytóza",
+    "Diabetes mellitus 2. typu na inzulinu s periferní neuropatií",
+    "Fibrilace síní s rychlou odpovědí komor",
+    "Zlomenina krčku stehenní kosti po pádu doma",
+    "Chronické onemocnění ledvin, stadium 3b",
+]
+
+CANDIDATES = [
+    "Akutní transmurální infarkt myokardu přední stěny",
+    "Pneumonie, neurčená",
+    "Diabetes mellitus 2. typu s neurologickými komplikacemi",
+    "Fibrilace a flutter síní",
+    "Zlomenina krčku stehenní kosti",
+    "Chronické onemocnění ledvin, stadium 3",
+    "Esenciální (primární) hypertenze",
+    "Anémie z nedostatku železa, neurčená",
+]
+
+
+def _outputs(backend, threads):
+    embed_model = load_model("embedding", config.EMBEDDING_MODEL_NAME, backend=backend, threads=threads)
+    cross_encoder = load_model("cross-encoder", config.CROSS_ENCODER_MODEL_NAME, backend=backend, threads=threads)
+    embeddings = embed_model.encode(QUERIES, convert_to_numpy=True)
+    scores = cross_encoder.predict([[query, name] for query in QUERIES for name in CANDIDATES])
+    return np.asarray(embeddings, dtype=np.float32), np.asarray(scores, dtype=np.float32)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check onnx-int8 outputs against torch on fixed inputs")
+    parser.add_argument("--threads", type=int, default=getattr(config, "INFERENCE_THREADS", None))
+    args = parser.parse_args()
+
+    reference_embeddings, reference_scores = _outputs("torch", args.threads)
+    embeddings, scores = _outputs("onnx-int8", args.threads)
+
+    cosine = embedding_agreement(reference_embeddings, embeddings)
+    spearman, max_difference = score_agreement(reference_scores, scores)
+    print(f"{len(QUERIES)} embeddings: lowest cosine {cosine:.4f} (min {EMBEDDING_MIN_COSINE})")
+    print(f"{len(scores)} cross-encoder scores: Spearman {spearman:.4f} (min {CROSS_ENCODER_MIN_SPEARMAN}), "
+          f"largest difference {max_difference:.4f}")
+
+    ok = cosine >= EMBEDDING_MIN_COSINE and spearman >= CROSS_ENCODER_MIN_SPEARMAN
+    print("OK" if ok else "OUT OF TOLERANCE")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -99,13 +99,13 @@ def main():
     
     results_map = {}
     
-    for segment in segments:
+    results = retriever.search_batch(segments, top_k=3)
+
+    for segment, candidates in zip(segments, results):
         print(f"\nQuery: '{segment}'")
-        candidates = retriever.search(segment, top_k=3)
         
         for rank, code in enumerate(candidates):
-            row = retriever.df[retriever.df['Kod'] == code]
-            name = row.iloc[0]['Nazev'] if not row.empty else "Unknown"
+            name = retriever.code_names.get(code, "Unknown")
             print(f"  {rank+1}. [{code}] {name}")
             
             # Aggregate scores (simple frequency count for now)
@@ -0,0 +1,147 @@
+"""
+Inference backends for the embedding and cross-encoder models
+
+    torch      sentence-transformers in full precision PyTorch, as before
+    onnx-int8  the model exported to ONNX with int8 dynamic quantization
+               of its weights, run by an onnxruntime CPU session
+
+Callers pick the backend with config.INFERENCE_BACKEND (default torch)
+and the CPU threads with config.INFERENCE_THREADS (default: all cores).
+Both backends return the usual SentenceTransformer / CrossEncoder
+objects, so encode() and predict() are used as before.
+
+The first onnx-int8 load of a model exports and quantizes it (needs
+onnxruntime and optimum: pip install sentence-transformers[onnx]) into
+testing/onnx_models/<model>/, next to its tokenizer and config; later
+loads read the quantized file from there. Quantization is tuned for the
+CPU it runs on (avx512_vnni, avx512, avx2 or arm64).
+
+Quantized outputs are close to, not equal to, the originals:
+check_inference_equivalence.py (fixed inputs) and benchmark_inference.py
+(sampled cases) check them against the torch backend with
+EMBEDDING_MIN_COSINE and CROSS_ENCODER_MIN_SPEARMAN.
+"""
+
+import os
+import platform
+
+import numpy as np
+from scipy.stats import spearmanr
+from sentence_transformers import CrossEncoder, SentenceTransformer
+
+try:
+    import onnxruntime
+except ImportError:
+    onnxruntime = None
+
+# Where quantized exports are kept
+DEFAULT_EXPORT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "onnx_models")
+
+BACKENDS = ("torch", "onnx-int8")
+DEFAULT_BACKEND = "torch"
+
+MODEL_CLASSES = {"embedding": SentenceTransformer, "cross-encoder": CrossEncoder}
+
+# Quantized vs torch: lowest cosine similarity of an embedding pair, and
+# lowest rank correlation of cross-encoder scores
+EMBEDDING_MIN_COSINE = 0.98
+CROSS_ENCODER_MIN_SPEARMAN = 0.95
+
+
+def quantization_target():
+    """optimum's AutoQuantizationConfig preset for this CPU"""
+    if platform.machine().lower() in ("arm64", "aarch64"):
+        return "arm64"
+    flags = set()
+    try:
+        with open("/proc/cpuinfo") as f:
+            for line in f:
+                if line.startswith("flags"):
+                    flags.update(line.split(":", 1)[1].split())
+                    break
+    except OSError:
+        pass
+    if "avx512_vnni" in flags:
+        return "avx512_vnni"
+    if "avx512f" in flags:
+        return "avx512"
+    return "avx2"
+
+
+def session_options(threads=None):
+    """onnxruntime options for one session per process: all cores inside an op, ops in sequence"""
+    options = onnxruntime.SessionOptions()
+    options.intra_op_num_threads = threads or os.cpu_count() or 1
+    options.inter_op_num_threads = 1
+    options.execution_mode = onnxruntime.ExecutionMode.ORT_SEQUENTIAL
+    options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+    return options
+
+
+def export_path(model_name, export_root=None):
+    return os.path.join(export_root or DEFAULT_EXPORT_DIR, model_name.replace("/", "__"))
+
+
+def ensure_onnx_int8(kind, model_name, export_root=None):
+    """
+    Export and quantize `model_name` unless already done
+
+    Returns (model directory, quantized file name relative to it).
+    """
+    if onnxruntime is None:
+        raise ImportError("The onnx-int8 backend needs onnxruntime and optimum: pip install sentence-transformers[onnx]")
+    from sentence_transformers import export_dynamic_quantized_onnx_model
+
+    path = export_path(model_name, export_root)
+    target = quantization_target()
+    file_name = f"onnx/model_qint8_{target}.onnx"
+    if os.path.exists(os.path.join(path, file_name)):
+        return path, file_name
+
+    print(f"Exporting {model_name} to ONNX and quantizing it ({target})...")
+    # Loading with backend="onnx" exports the float model; save() keeps it
+    # with the tokenizer and config, the quantized file is added next to it
+    model = MODEL_CLASSES[kind](model_name, backend="onnx")
+    model.save(path)
+    export_dynamic_quantized_onnx_model(model, target, path, file_suffix=f"qint8_{target}")
+    return path, file_name
+
+
+def load_model(kind, model_name, backend=DEFAULT_BACKEND, threads=None, export_root=None):
+    """A SentenceTransformer ("embedding") or CrossEncoder ("cross-encoder") on `backend`"""
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown inference backend {backend!r}, expected one of {', '.join(BACKENDS)}")
+
+    if backend == "torch":
+        if threads:
+            import torch
+            torch.set_num_threads(threads)
+        return MODEL_CLASSES[kind](model_name)
+
+    path, file_name = ensure_onnx_int8(kind, model_name, export_root)
+    return MODEL_CLASSES[kind](
+        path,
+        backend="onnx",
+        model_kwargs={
+            "file_name": file_name,
+            "provider": "CPUExecutionProvider",
+            "session_options": session_options(threads),
+        },
+    )
+
+
+def embedding_agreement(reference, candidate):
+    """Lowest cosine similarity between matching rows of two embedding matrices"""
+    reference = np.asarray(reference, dtype=np.float32)
+    candidate = np.asarray(candidate, dtype=np.float32)
+    cosine = (reference * candidate).sum(axis=1) / (
+        np.linalg.norm(reference, axis=1) * np.linalg.norm(candidate, axis=1) + 1e-12
+    )
+    return float(cosine.min())
+
+
+def score_agreement(reference, candidate):
+    """(Spearman correlation, largest absolute difference) of two score vectors"""
+    reference = np.asarray(reference, dtype=np.float64)
+    candidate = np.asarray(candidate, dtype=np.float64)
+    return float(spearmanr(reference, candidate).statistic), float(np.abs(reference - candidate).max())
@@ -2,9 +2,6 @@ import os
 import json
 import pandas as pd
 import numpy as np
-from pinecone import Pinecone
-from sentence_transformers import SentenceTransformer, CrossEncoder
-from rank_bm25 import BM25Okapi
 from openai import OpenAI
 from dotenv import load_dotenv
 import sys
@@ -14,49 +11,84 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from embeds import config
+from testing.inference_backend import DEFAULT_BACKEND, load_model
+from testing.bm25_index import DEFAULT_INDEX_DIR as DEFAULT_BM25_DIR, SparseBM25, tokenize
+from testing.vector_index import DEFAULT_INDEX_DIR, VectorIndex
+
+# Query-candidate pairs per CrossEncoder forward pass
+RERANK_BATCH_SIZE = 64
 
 # Load environment variables
 load_dotenv()
 
+def code_names(df):
+    """Code -> name lookup of the catalog; the first row wins for a repeated code"""
+    names = {}
+    for code, name in zip(df['Kod'], df['Nazev']):
+        names.setdefault(code, name)
+    return names
+
 class HybridRetriever:
     def __init__(self):
         print("Initializing Hybrid Retriever...")
-        # 1. Setup Pinecone (Dense)
-        self.pc = Pinecone(api_key=config.PINECONE_API_KEY)
-        self.index = self.pc.Index(config.PINECONE_INDEX_NAME)
-        self.embed_model = SentenceTransformer(config.EMBEDDING_MODEL_NAME)
+        # 1. Setup dense retrieval: local index (build_vector_index.py), Pinecone if none
+        index_dir = getattr(config, "VECTOR_INDEX_DIR", DEFAULT_INDEX_DIR)
+        if VectorIndex.exists(index_dir):
+            print(f"Loading local vector index from {index_dir}...")
+            self.vector_index = VectorIndex.load(index_dir, expected_model=config.EMBEDDING_MODEL_NAME)
+            self.index = None
+        else:
+            print("No local vector index, using Pinecone (run testing/build_vector_index.py to go offline)")
+            from pinecone import Pinecone
+            self.vector_index = None
+            self.pc = Pinecone(api_key=config.PINECONE_API_KEY)
+            self.index = self.pc.Index(config.PINECONE_INDEX_NAME)
+        self.embed_model = load_model(
+            "embedding",
+            config.EMBEDDING_MODEL_NAME,
+            backend=getattr(config, "INFERENCE_BACKEND", DEFAULT_BACKEND),
+            threads=getattr(config, "INFERENCE_THREADS", None),
+        )
         
-        # 2. Setup BM25 (Sparse) - In-memory build
-        print("Building BM25 index...")
+        # 2. Setup BM25 (Sparse) - sparse matrix, saved to disk, rebuilt when the CSV changes
+        print("Loading BM25 index...")
         self.df = pd.read_csv(config.CSV_PATH)
         self.df['Nazev'] = self.df['Nazev'].fillna('')
         # Tokenize for BM25 (Simple split for MVP, ideally use a Czech lemmatizer)
         # Improved: Lowercase and simple alphanumeric split
-        import re
-        def tokenize(text):
-            return re.findall(r'\w+', text.lower())
-
         self.tokenize = tokenize
-        tokenized_corpus = [self.tokenize(doc) for doc in self.df['Nazev'].tolist()]
-        self.bm25 = BM25Okapi(tokenized_corpus)
+        bm25_dir = getattr(config, "BM25_INDEX_DIR", DEFAULT_BM25_DIR)
+        self.bm25 = SparseBM25.load_or_build(bm25_dir, self.df['Nazev'].tolist(), self.df['Kod'].tolist())
+        self.code_names = code_names(self.df)
         print("Retriever initialized.")
 
     def search(self, query, top_k=20):
+        return self.search_batch([query], top_k=top_k)[0]
+
+    def search_batch(self, queries, top_k=20):
+        """search() for many queries: one embedding call and one BM25 matrix product"""
         # Dense Search
-        query_embedding = self.embed_model.encode(query).tolist()
-        dense_results = self.index.query(
-            vector=query_embedding,
-            top_k=top_k,
-            include_metadata=True
-        )
-        dense_ids = [match['id'] for match in dense_results['matches']]
-        
+        query_embeddings = self.embed_model.encode(queries)
+        if self.vector_index is not None:
+            dense_ids = [
+                [code for code, _ in matches]
+                for matches in self.vector_index.search(query_embeddings, top_k=top_k)
+            ]
+        else:
+            dense_ids = []
+            for query_embedding in query_embeddings:
+                dense_results = self.index.query(
+                    vector=query_embedding.tolist(),
+                    top_k=top_k,
+                    include_metadata=True
+                )
+                dense_ids.append([match['id'] for match in dense_results['matches']])
+
         # Sparse Search
-        tokenized_query = self.tokenize(query)
-        sparse_results = self.bm25.get_top_n(tokenized_query, self.df['Kod'].tolist(), n=top_k)
-        
+        sparse_results = self.bm25.top_n(queries, n=top_k)
+
         # RRF Fusion
-        return self.rrf_fusion(dense_ids, sparse_results)
+        return [self.rrf_fusion(dense, sparse) for dense, sparse in zip(dense_ids, sparse_results)]
 
     def rrf_fusion(self, list1, list2, k=60):
         """Reciprocal Rank Fusion"""
@@ -70,41 +102,50 @@ class HybridRetriever:
         return [item[0] for item in sorted_items]
 
 class Reranker:
-    def __init__(self):
+    def __init__(self, batch_size=None):
         print(f"Loading Cross-Encoder: {config.CROSS_ENCODER_MODEL_NAME}...")
-        self.model = CrossEncoder(config.CROSS_ENCODER_MODEL_NAME)
+        self.model = load_model(
+            "cross-encoder",
+            config.CROSS_ENCODER_MODEL_NAME,
+            backend=getattr(config, "INFERENCE_BACKEND", DEFAULT_BACKEND),
+            threads=getattr(config, "INFERENCE_THREADS", None),
+        )
+        self.batch_size = batch_size or getattr(config, "RERANK_BATCH_SIZE", RERANK_BATCH_SIZE)
 
-    def rerank(self, query, candidate_codes, df_lookup):
+    def rerank(self, query, candidate_codes, names):
         """
         Rerank candidates based on query relevance.
+        names: code -> name lookup (HybridRetriever.code_names)
+        """
+        return self.rerank_batch([query], [candidate_codes], names)[0]
+
+    def rerank_batch(self, queries, candidate_lists, names):
+        """
+        rerank() for many queries, scoring the pairs of all of them in one predict call
         """
         pairs = []
         valid_candidates = []
-        
-        for code in candidate_codes:
-            # Get description from DF
-            row = df_lookup[df_lookup['Kod'] == code]
-            if not row.empty:
-                desc = row.iloc[0]['Nazev']
-                pairs.append([query, desc])
-                valid_candidates.append({'code': code, 'name': desc})
-        
-        if not pairs:
-            return []
+        for query, candidate_codes in zip(queries, candidate_lists):
+            candidates = []
+            for code in candidate_codes:
+                desc = names.get(code)
+                if desc is not None:
+                    pairs.append([query, desc])
+                    candidates.append({'code': code, 'name': desc})
+            valid_candidates.append(candidates)
 
-        scores = self.model.predict(pairs)
-        
-        # Attach scores
+        scores = self.model.predict(pairs, batch_size=self.batch_size) if pairs else []
+
+        # Attach scores, per query
         results = []
-        for i, candidate in enumerate(valid_candidates):
-            results.append({
-                'code': candidate['code'],
-                'name': candidate['name'],
-                'score': float(scores[i])
-            })
-            
-        # Sort by score
-        results.sort(key=lambda x: x['score'], reverse=True)
+        position = 0
+        for candidates in valid_candidates:
+            for candidate in candidates:
+                candidate['score'] = float(scores[position])
+                position += 1
+            # Sort by score
+            candidates.sort(key=lambda x: x['score'], reverse=True)
+            results.append(candidates)
         return results
 
 class DRGReasoningAgent:
@@ -197,24 +238,27 @@ def main():
     results = []
     
     # 3. Process Patients
-    for patient in patients[:3]: # Process first 3 for demo
+    patients = patients[:3] # Process first 3 for demo
+
+    # Preprocessing (Simple concatenation)
+    texts = [
+        f"{patient['clinical_text']}\n{patient.get('biochemistry', '')}\n{patient.get('microbiology', '')}"
+        for patient in patients
+    ]
+
+    # Extraction (Mock: Just use the first 500 chars as query for now)
+    # In production: Use LLM to extract entities first.
+    queries = [text[:500] for text in texts]
+
+    # Retrieval and reranking for all patients at once
+    print("Retrieving candidates...")
+    candidate_lists = retriever.search_batch(queries)
+    print("Reranking...")
+    reranked_lists = reranker.rerank_batch(queries, candidate_lists, retriever.code_names)
+
+    for patient, text, reranked_candidates in zip(patients, texts, reranked_lists):
         print(f"\nProcessing Patient ID: {patient['pac_id']}...")
-        
-        # Preprocessing (Simple concatenation)
-        text = f"{patient['clinical_text']}\n{patient.get('biochemistry', '')}\n{patient.get('microbiology', '')}"
-        
-        # Extraction (Mock: Just use the first 500 chars as query for now)
-        # In production: Use LLM to extract entities first.
-        query = text[:500] 
-        
-        # Retrieval
-        print("Retrieving candidates...")
-        candidate_codes = retriever.search(query)
-        
-        # Reranking
-        print("Reranking...")
-        reranked_candidates = reranker.rerank(query, candidate_codes, retriever.df)
-        
+
         # Reasoning
         print("LLM Reasoning...")
         decision = agent.analyze(text, reranked_candidates)
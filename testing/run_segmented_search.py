@@ -31,17 +31,16 @@ def main():
     print("\nRunning queries for each segment...")
     print("-" * 50)
     
-    for i, segment in enumerate(segments):
+    # Search all segments at once
+    results = retriever.search_batch(segments, top_k=3)
+
+    for i, (segment, candidates) in enumerate(zip(segments, results)):
         # Skip some obviously non-medical segments manually if needed, but let's see all
         print(f"\nQuery: '{segment}'")
         
-        # Search
-        candidates = retriever.search(segment, top_k=3)
-        
         # Print top results
         for rank, code in enumerate(candidates):
-            row = retriever.df[retriever.df['Kod'] == code]
-            name = row.iloc[0]['Nazev'] if not row.empty else "Unknown"
+            name = retriever.code_names.get(code, "Unknown")
             print(f"  {rank+1}. [{code}] {name}")
 
 if __name__ == "__main__":
@@ -0,0 +1,173 @@
+"""
+Local vector index over the catalog embeddings (replaces Pinecone for dense retrieval)
+
+On-disk layout of an index directory:
+    vectors.npy   float16 matrix (n, dim), rows L2-normalized, memory-mapped on load
+    ids.json      code of each row
+    meta.json     model name, dim, count, whether an HNSW graph was built
+    hnsw.bin      optional hnswlib graph (pip install hnswlib)
+
+Exact search scores queries against the matrix in row blocks with one
+matrix product per block, keeping the running top-k with argpartition, so
+memory stays bounded by BLOCK_ROWS x batch size. Each block is widened to
+float32 per call, which dominates single-query latency; batch queries, or
+load with resident=True to keep a float32 copy in memory (twice the size
+of the file) when answering one query at a time. Scores are cosine
+similarities (dot products of normalized vectors), like the Pinecone
+index used before.
+"""
+
+import json
+import os
+
+import numpy as np
+
+try:
+    import hnswlib
+except ImportError:
+    hnswlib = None
+
+# Where build_vector_index.py writes the catalog index
+DEFAULT_INDEX_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "catalog_index")
+
+# Matrix rows scored per matrix product in exact search
+BLOCK_ROWS = 16384
+
+# HNSW defaults: graph degree, build and query beam widths
+HNSW_M = 32
+HNSW_EF_CONSTRUCTION = 200
+HNSW_EF_SEARCH = 128
+
+
+def normalize(vectors):
+    """Rows scaled to unit length, as float32"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors[None, :]
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class VectorIndex:
+    def __init__(self, vectors, ids, meta=None, hnsw=None):
+        self.vectors = vectors
+        self.ids = ids
+        self.meta = meta or {}
+        self.hnsw = hnsw
+
+    @classmethod
+    def build(cls, embeddings, ids, path, model_name=None, with_hnsw=False):
+        """Write an index for `embeddings` (one row per id) to directory `path` and load it"""
+        embeddings = normalize(embeddings)
+        if len(embeddings) != len(ids):
+            raise ValueError(f"{len(embeddings)} embeddings for {len(ids)} ids")
+
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, "vectors.npy"), embeddings.astype(np.float16))
+        with open(os.path.join(path, "ids.json"), "w") as f:
+            json.dump(list(ids), f)
+
+        meta = {
+            "model": model_name,
+            "dim": int(embeddings.shape[1]),
+            "count": len(ids),
+            "hnsw": False,
+        }
+        if with_hnsw:
+            if hnswlib is None:
+                raise ImportError("HNSW mode needs hnswlib: pip install hnswlib")
+            graph = hnswlib.Index(space="ip", dim=meta["dim"])
+            graph.init_index(max_elements=len(ids), M=HNSW_M, ef_construction=HNSW_EF_CONSTRUCTION)
+            graph.add_items(embeddings, np.arange(len(ids)))
+            graph.save_index(os.path.join(path, "hnsw.bin"))
+            meta.update(hnsw=True, hnsw_m=HNSW_M, hnsw_ef_construction=HNSW_EF_CONSTRUCTION)
+
+        with open(os.path.join(path, "meta.json"), "w") as f:
+            json.dump(meta, f, indent=2)
+        return cls.load(path)
+
+    @classmethod
+    def load(cls, path, with_hnsw=True, resident=False, expected_model=None):
+        """
+        Open an index directory; the matrix is memory-mapped unless `resident`
+
+        With `expected_model`, raises ValueError if the index was built with
+        another embedding model: its vectors would not be comparable to the
+        query embeddings.
+        """
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        if expected_model is not None and meta.get("model") != expected_model:
+            raise ValueError(
+                f"Vector index {path} was built with {meta.get('model')!r}, queries are encoded "
+                f"with {expected_model!r}; rebuild it with build_vector_index.py"
+            )
+        with open(os.path.join(path, "ids.json")) as f:
+            ids = json.load(f)
+        vectors = np.load(os.path.join(path, "vectors.npy"), mmap_mode="r")
+        if resident:
+            vectors = np.asarray(vectors, dtype=np.float32)
+
+        hnsw = None
+        if with_hnsw and meta.get("hnsw") and hnswlib is not None:
+            hnsw = hnswlib.Index(space="ip", dim=meta["dim"])
+            hnsw.load_index(os.path.join(path, "hnsw.bin"), max_elements=meta["count"])
+            hnsw.set_ef(HNSW_EF_SEARCH)
+        return cls(vectors, ids, meta, hnsw)
+
+    @staticmethod
+    def exists(path):
+        return os.path.exists(os.path.join(path, "meta.json"))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def search_exact(self, queries, top_k=20):
+        """
+        Exact top-k for a batch of queries
+
+        Returns (rows, scores), both (n_queries, top_k), best first.
+        """
+        queries = normalize(queries)
+        top_k = min(top_k, len(self.ids))
+        best_rows = np.empty((len(queries), 0), dtype=np.int64)
+        best_scores = np.empty((len(queries), 0), dtype=np.float32)
+
+        for start in range(0, len(self.ids), BLOCK_ROWS):
+            block = self.vectors[start:start + BLOCK_ROWS]
+            if block.dtype != np.float32:
+                block = block.astype(np.float32)
+            scores = queries @ block.T
+            k = min(top_k, scores.shape[1])
+            rows = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            best_rows = np.hstack([best_rows, rows + start])
+            best_scores = np.hstack([best_scores, np.take_along_axis(scores, rows, axis=1)])
+            if best_rows.shape[1] > top_k:
+                keep = np.argpartition(-best_scores, top_k - 1, axis=1)[:, :top_k]
+                best_rows = np.take_along_axis(best_rows, keep, axis=1)
+                best_scores = np.take_along_axis(best_scores, keep, axis=1)
+
+        order = np.argsort(-best_scores, axis=1)
+        return np.take_along_axis(best_rows, order, axis=1), np.take_along_axis(best_scores, order, axis=1)
+
+    def search_hnsw(self, queries, top_k=20, ef=None):
+        """Approximate top-k from the HNSW graph, same return shape as search_exact"""
+        if self.hnsw is None:
+            raise RuntimeError("Index has no HNSW graph (build with --hnsw, needs hnswlib)")
+        if ef:
+            self.hnsw.set_ef(max(ef, top_k))
+        rows, distances = self.hnsw.knn_query(normalize(queries), k=min(top_k, len(self.ids)))
+        # hnswlib's "ip" space returns 1 - dot product
+        return rows.astype(np.int64), 1.0 - distances
+
+    def search(self, queries, top_k=20, mode="exact"):
+        """List of [(id, score), ...] per query; mode is "exact" or "hnsw\""""
+        if mode == "hnsw":
+            rows, scores = self.search_hnsw(queries, top_k)
+        else:
+            rows, scores = self.search_exact(queries, top_k)
+        return [
+            [(self.ids[row], float(score)) for row, score in zip(query_rows, query_scores)]
+            for query_rows, query_scores in zip(rows, scores)
+        ]